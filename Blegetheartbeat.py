@@ -1,49 +1,321 @@
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Callable, TYPE_CHECKING
+import time
 import datetime
+import random
 import asyncio
-from bleak import BleakScanner, BleakClient, BleakError
+from functools import cache
 
 from importlib.metadata import version
 
+# bleak 导入较慢(会加载WinRT), 在首次扫描/连接时才导入
+if TYPE_CHECKING:
+    from bleak import BleakScanner, BleakClient
+    from journal import SessionJournal
+
 from system_utils import logger
+from hrdata import HeartRateStore, HeartRateStats, SPILL_OVERWRITE
+from hrmparse import HeartRateMeasurement, parse_measurement
+from metrics import LatencyHistogram
 # 心率服务UUID
 HEART_RATE_SERVICE_UUID = "0000180d-0000-1000-8000-00805f9b34fb"
 # 心率测量特征UUID
 HEART_RATE_MEASUREMENT_UUID = "00002a37-0000-1000-8000-00805f9b34fb"
 
-if tuple(map(int,version("bleak").split('.'))) < (1, 0, 0):
-    async def check_service(client: BleakClient):
-        services = await client.get_services()
-        return HEART_RATE_SERVICE_UUID in [ser.uuid for ser in services]
-else:
-    async def check_service(client: BleakClient):
-        rtry = 0
-        while rtry <= 10:
+@cache
+def _bleak_legacy() -> bool:
+    """bleak 1.0 之前的版本需要调用 get_services()"""
+    return tuple(map(int,version("bleak").split('.')[:3])) < (1, 0, 0)
+
+# 等待服务发现的超时时间和检查间隔(秒), 间隔从最小值开始倍增
+SERVICE_TIMEOUT = 10.0
+SERVICE_POLL_MIN = 0.01
+SERVICE_POLL_MAX = 0.2
+
+async def wait_services(client: "BleakClient", timeout: float = SERVICE_TIMEOUT):
+    """
+    等待服务发现完成
+
+    bleak 没有提供服务发现完成的事件, 这里以很短的间隔检查, 到期限时抛出 TimeoutError
+
+    Returns:
+        设备的服务集合
+    """
+    if _bleak_legacy():
+        return await client.get_services()
+    from bleak import BleakError
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = SERVICE_POLL_MIN
+    while True:
+        try:
+            return client.services
+        except BleakError as e:
+            if "Service Discovery has not been performed yet" not in str(e):
+                raise
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise TimeoutError("获取设备服务超时")
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * 2, SERVICE_POLL_MAX)
+
+async def check_service(client: "BleakClient", timeout: float = SERVICE_TIMEOUT) -> bool:
+    """设备是否提供心率服务"""
+    services = await wait_services(client, timeout)
+    return any(ser.uuid == HEART_RATE_SERVICE_UUID for ser in services)
+
+# 连接状态
+LINK_IDLE = "idle"                  # 未连接, 未扫描
+LINK_SCANNING = "scanning"          # 未连接, 正在扫描
+LINK_CONNECTING = "connecting"      # 正在连接
+LINK_CONNECTED = "connected"        # 已连接
+LINK_RECONNECTING = "reconnecting"  # 连接意外断开, 正在重连
+
+# 设备表变化事件
+DEVICE_ADDED = "add"
+DEVICE_UPDATED = "update"
+DEVICE_REMOVED = "remove"
+
+class DeviceEntry:
+    """扫描到的设备"""
+    __slots__ = ("address", "name", "rssi", "last_seen", "hr_service", "device")
+
+    def __init__(self, address: str, name: Optional[str], rssi: int, last_seen: float, hr_service: bool, device=None):
+        self.address = address
+        self.name = name
+        self.rssi = rssi
+        # time.monotonic() 时间
+        self.last_seen = last_seen
+        # 广播中是否包含心率服务
+        self.hr_service = hr_service
+        # bleak 的 BLEDevice, 连接时使用可以省去按地址查找设备
+        self.device = device
+
+class DeviceScanner:
+    """持续运行的BLE扫描器
+
+    通过广播回调维护以地址为键的设备表, 只在设备出现、信息变化或超时消失时
+    通过 callback(event, entry) 通知变化
+    """
+    def __init__(self, hr_only: bool = True, ttl: float = 30.0, rssi_step: int = 5):
+        """
+        Args:
+            hr_only: 只扫描广播了心率服务的设备(按服务UUID过滤);
+                部分心率带不在广播中声明心率服务, 这时需要关闭
+            ttl: 设备超过该时间(秒)没有广播则从设备表中移除
+            rssi_step: 信号强度变化达到该值(dBm)时才通知更新
+        """
+        self.hr_only = hr_only
+        self.ttl = ttl
+        self.rssi_step = rssi_step
+        self.devices: Dict[str, DeviceEntry] = {}
+        self.callback: Optional[Callable[[str, DeviceEntry], None]] = None
+        # 扫描启停时调用 running_callback(running)
+        self.running_callback: Optional[Callable[[bool], None]] = None
+        self._scanner: Optional["BleakScanner"] = None
+        self._prune_task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._scanner is not None
+
+    async def start(self):
+        """开始扫描(重复调用无影响)"""
+        if self._scanner is not None:
+            return
+        from bleak import BleakScanner
+        scanner = self._scanner = BleakScanner(
+             detection_callback=self._on_detect
+            ,service_uuids=[HEART_RATE_SERVICE_UUID] if self.hr_only else None
+        )
+        try:
+            await scanner.start()
+        except Exception:
+            self._scanner = None
+            raise
+        self._prune_task = asyncio.ensure_future(self._prune_loop())
+        logger.info("BLE扫描已启动")
+        if self.running_callback:
+            self.running_callback(True)
+
+    async def stop(self):
+        """停止扫描, 设备表保留"""
+        scanner, self._scanner = self._scanner, None
+        if self._prune_task is not None:
+            self._prune_task.cancel()
+            self._prune_task = None
+        if scanner is not None:
             try:
-                return any(ser.uuid == HEART_RATE_SERVICE_UUID for ser in client.services)
-            except BleakError as e:
-                if "Service Discovery has not been performed yet" in str(e):
-                    logger.warning(f"服务发现未完成({rtry}/10秒)")
-                    rtry += 1
-                    await asyncio.sleep(1)
-                else:
-                    raise e
-        raise TimeoutError("获取设备服务超时")
+                await scanner.stop()
+                logger.info("BLE扫描已停止")
+            finally:
+                if self.running_callback:
+                    self.running_callback(False)
+
+    async def restart(self, clear: bool = True):
+        """重新开始扫描
+
+        Args:
+            clear: 是否清空设备表
+        """
+        await self.stop()
+        if clear:
+            self.clear()
+        await self.start()
+
+    def clear(self):
+        """清空设备表"""
+        entries = list(self.devices.values())
+        self.devices.clear()
+        for entry in entries:
+            self._emit(DEVICE_REMOVED, entry)
+
+    def _emit(self, event: str, entry: DeviceEntry):
+        if self.callback:
+            self.callback(event, entry)
+
+    def _on_detect(self, device, adv):
+        now = time.monotonic()
+        name = adv.local_name or device.name
+        hr_service = HEART_RATE_SERVICE_UUID in adv.service_uuids
+        entry = self.devices.get(device.address)
+        if entry is None:
+            entry = DeviceEntry(device.address, name, adv.rssi, now, hr_service, device)
+            self.devices[device.address] = entry
+            self._emit(DEVICE_ADDED, entry)
+            return
+
+        entry.last_seen = now
+        entry.device = device
+        changed = False
+        # 名称和服务信息可能只出现在部分广播包(扫描响应)中
+        if name and name != entry.name:
+            entry.name = name
+            changed = True
+        if hr_service and not entry.hr_service:
+            entry.hr_service = True
+            changed = True
+        if abs(adv.rssi - entry.rssi) >= self.rssi_step:
+            entry.rssi = adv.rssi
+            changed = True
+        if changed:
+            self._emit(DEVICE_UPDATED, entry)
+
+    async def _prune_loop(self):
+        interval = max(self.ttl / 4, 1.0)
+        while True:
+            await asyncio.sleep(interval)
+            deadline = time.monotonic() - self.ttl
+            for address in [a for a, e in self.devices.items() if e.last_seen < deadline]:
+                self._emit(DEVICE_REMOVED, self.devices.pop(address))
 
 
+class ReconnectPolicy:
+    """重连间隔: 带随机抖动的指数退避
+
+    第n次重连前等待 d/2 ~ d 秒, d = min(cap, base * factor^n),
+    抖动避免多个设备/程序同时重试
+    """
+    def __init__(self, base: float = 0.5, factor: float = 2.0, cap: float = 30.0, max_attempts: int = 10):
+        """
+        Args:
+            base: 首次重连的最长等待时间(秒)
+            factor: 每次重连等待时间的增长倍数
+            cap: 最长等待时间(秒)
+            max_attempts: 最多重连次数, 0表示不限
+        """
+        self.base = base
+        self.factor = factor
+        self.cap = cap
+        self.max_attempts = max_attempts
+
+    def delay(self, attempt: int) -> float:
+        d = min(self.cap, self.base * self.factor ** attempt)
+        return d / 2 + random.uniform(0, d / 2)
+
+    def attempts(self):
+        """依次产生每次重连前的等待时间"""
+        attempt = 0
+        while self.max_attempts <= 0 or attempt < self.max_attempts:
+            yield self.delay(attempt)
+            attempt += 1
+
 class BLEHeartRateMonitor:
     """BLE连接和心率数据处理类"""
-    def __init__(self):
+    def __init__(self, capacity: int = 24*3600*4, spill: str = SPILL_OVERWRITE, scanner: Optional[DeviceScanner] = None):
+        """
+        Args:
+            capacity: 心率数据的最大保存数量
+            spill: 数据写满后的处理策略(overwrite/drop/grow)
+            scanner: 与其它会话共用的扫描器, 为None时创建自己的扫描器
+        """
         self.client = None
+        # 主动断开的连接, 其断开回调不视为意外断开
+        self._closed_client = None
         self.devices = []
-        self.heart_rate_data = []
+        self.heart_rate_data = HeartRateStore(capacity, spill)
+        self.stats = HeartRateStats()
         self.heart_rate_callback = None
+        # 连接意外断开时调用(无参数)
+        self.disconnected_callback: Optional[Callable[[], None]] = None
+        # 连接状态, 变化时调用 state_callback(新状态, 旧状态)
+        self.state = LINK_IDLE
+        self.state_callback: Optional[Callable[[str, str], None]] = None
+
+        # 连接意外断开后自动重连
+        self.auto_reconnect = False
+        self.reconnect_policy = ReconnectPolicy()
+        self.reconnect_latency = LatencyHistogram("断开->重新连接")
+        self.recover_latency = LatencyHistogram("断开->首个样本")
+        self.first_beat_latency = LatencyHistogram("开始连接->首个样本")
+        # 已确认提供心率服务的设备地址, 再次连接时跳过服务检查
+        self.service_cache: set[str] = set()
+        # 开始连接的时间(time.monotonic_ns()), 收到首个样本后清除
+        self._connect_ns: Optional[int] = None
+        self._address: Optional[str] = None
+        # 已连接的 BLEDevice, 重连时直接使用
+        self._ble_device = None
+        self._reconnect_task: Optional[asyncio.Task] = None
+        # 意外断开的时间(time.monotonic_ns()), 收到首个样本后清除
+        self._drop_ns: Optional[int] = None
+        # 最近一次收到的完整测量数据(包含接触状态/能量消耗/RR间期)
+        self.last_measurement: Optional[HeartRateMeasurement] = None
+        # 最近一次收到样本的时间(time.monotonic_ns()), 样本被存储丢弃时也会更新
+        self.last_sample_ns: Optional[int] = None
+        # 会话日志, 设置后每个样本同时写入磁盘
+        self.journal: Optional["SessionJournal"] = None
 
         self.filter_empty: bool = True
+        if scanner is None:
+            self.scanner = DeviceScanner()
+            self.scanner.running_callback = self._on_scanner_running
+        else:
+            # 共用的扫描器由所有者转发启停通知
+            self.scanner = scanner
+
+    @property
+    def connected(self) -> bool:
+        return self.client is not None and self.client.is_connected
+
+    def _set_state(self, state: str):
+        """切换连接状态, 状态不变时不通知"""
+        old = self.state
+        if state == old:
+            return
+        self.state = state
+        logger.debug(f"连接状态: {old} -> {state}")
+        if self.state_callback:
+            self.state_callback(state, old)
+
+    def _idle_state(self) -> str:
+        return LINK_SCANNING if self.scanner.running else LINK_IDLE
+
+    def _on_scanner_running(self, running: bool):
+        if self.state in (LINK_IDLE, LINK_SCANNING):
+            self._set_state(self._idle_state())
 
     async def scan_devices(self, timeout: float = 5.0) -> List:
         """
-        扫描BLE设备
+        扫描一次BLE设备(持续扫描请使用 self.scanner)
 
         Args:
             timeout: 扫描超时时间(秒)
@@ -51,7 +323,8 @@ class BLEHeartRateMonitor:
         Returns:
             发现的设备列表
         """
-        self.devices = await BleakScanner.discover()
+        from bleak import BleakScanner
+        self.devices = await BleakScanner.discover(timeout=timeout)
         # 过滤掉名称为None的设备
         return [d for d in self.devices if d.name is not None] if self.filter_empty else self.devices
 
@@ -65,28 +338,121 @@ class BLEHeartRateMonitor:
         Returns:
             连接是否成功
         """
-        self.client = BleakClient(device_address)
-        await self.client.connect()
-        if await check_service(self.client):
-            # 启用心率通知
-            await self.client.start_notify(
-                HEART_RATE_MEASUREMENT_UUID,
-                self._notification_handler
-            )
-            return True, "已连接 {device_address}"
-        else:
-            await self.disconnect_device(False)
-            return False, "{device_address} 不是支持心率服务的设备"
+        from bleak import BleakClient
+        if self.state != LINK_RECONNECTING:
+            self._set_state(LINK_CONNECTING)
+        if self._address != device_address:
+            self._address = device_address
+            self._ble_device = None
+        # 优先使用扫描到的设备对象, 否则由bleak按地址查找
+        entry = self.scanner.devices.get(device_address)
+        target = entry.device if entry is not None and entry.device is not None else (self._ble_device or device_address)
+        self._connect_ns = time.monotonic_ns()
+        try:
+            self.client = BleakClient(target, disconnected_callback=self._on_disconnected)
+            await self.client.connect()
+            if not isinstance(target, str):
+                self._ble_device = target
+            cached = device_address in self.service_cache
+            if cached or await check_service(self.client):
+                try:
+                    # 启用心率通知
+                    await self.client.start_notify(
+                        HEART_RATE_MEASUREMENT_UUID,
+                        self._notification_handler
+                    )
+                except Exception:
+                    # 缓存可能已经失效, 下次连接时重新检查
+                    self.service_cache.discard(device_address)
+                    raise
+                self.service_cache.add(device_address)
+                self._set_state(LINK_CONNECTED)
+                return True, "已连接 {device_address}"
+            else:
+                await self._close_client(self.client, False)
+                self._connect_ns = None
+                return False, "{device_address} 不是支持心率服务的设备"
+        except BaseException:
+            self._connect_ns = None
+            if self.state != LINK_RECONNECTING:
+                self._set_state(self._idle_state())
+            raise
 
     async def disconnect_device(self, stop_notify: bool = True):
-        """断开设备连接"""
-        if self.client and self.client.is_connected:
-            if stop_notify:
-                await self.client.stop_notify(HEART_RATE_MEASUREMENT_UUID)
-            await self.client.disconnect()
+        """断开设备连接(同时取消正在进行的重连)"""
+        self.cancel_reconnect()
+        self._connect_ns = None
+        return await self._close_client(self.client, stop_notify)
+
+    async def _close_client(self, client, stop_notify: bool) -> bool:
+        """断开指定的连接, 其断开回调不视为意外断开"""
+        if client and client.is_connected:
+            self._closed_client = client
+            try:
+                if stop_notify:
+                    await client.stop_notify(HEART_RATE_MEASUREMENT_UUID)
+                await client.disconnect()
+            finally:
+                if self.state != LINK_RECONNECTING:
+                    self._set_state(self._idle_state())
             return True
+        if self.state != LINK_RECONNECTING:
+            self._set_state(self._idle_state())
         return False
 
+    def _on_disconnected(self, client):
+        # 由bleak在事件循环中调用
+        if client is not self.client or client is self._closed_client:
+            return
+        if self._reconnect_task is not None:
+            # 重连过程中的断开由重连循环处理
+            return
+        logger.warning("设备连接意外断开")
+        self._drop_ns = time.monotonic_ns()
+        if self.auto_reconnect and self._address and self._reconnect_task is None:
+            self._set_state(LINK_RECONNECTING)
+            self._reconnect_task = asyncio.ensure_future(self._reconnect_loop(self._address))
+        else:
+            self._set_state(self._idle_state())
+        if self.disconnected_callback:
+            self.disconnected_callback()
+
+    async def _reconnect_loop(self, address: str):
+        """按退避策略直接用地址重连, 不等待扫描"""
+        try:
+            for n, delay in enumerate(self.reconnect_policy.attempts(), 1):
+                logger.info(f"{delay:.1f} 秒后第 {n} 次重连 {address}")
+                await asyncio.sleep(delay)
+                try:
+                    success, text = await self.connect_device(address)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"第 {n} 次重连失败: {e}")
+                    continue
+                if success:
+                    if self._drop_ns is not None:
+                        self.reconnect_latency.record((time.monotonic_ns() - self._drop_ns) / 1e6)
+                    logger.info(f"重连成功(第 {n} 次); {self.reconnect_latency.summary()}")
+                    return
+                # 设备不支持心率服务, 重试没有意义
+                logger.warning(text.format(device_address=address))
+                break
+            logger.warning(f"重连 {address} 失败, 已停止重连")
+            self._drop_ns = None
+            self._set_state(self._idle_state())
+        finally:
+            if self._reconnect_task is asyncio.current_task():
+                self._reconnect_task = None
+
+    def cancel_reconnect(self):
+        """取消正在进行的重连"""
+        task, self._reconnect_task = self._reconnect_task, None
+        if task is not None:
+            task.cancel()
+            self._drop_ns = None
+            self._set_state(self._idle_state())
+
     def _notification_handler(self, sender: str, data: bytearray):
         """
         处理心率通知数据
@@ -95,11 +461,28 @@ class BLEHeartRateMonitor:
             sender: 特征UUID
             data: 接收到的原始数据
         """
-        heart_rate = self._parse_heart_rate(data)
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        measurement = parse_measurement(data)
+        heart_rate = measurement.heart_rate
+        self.last_measurement = measurement
+        now = time.monotonic_ns()
+        self.last_sample_ns = now
+        if self._connect_ns is not None and self.state == LINK_CONNECTED:
+            ms = (now - self._connect_ns) / 1e6
+            self._connect_ns = None
+            self.first_beat_latency.record(ms)
+            logger.info(f"连接后 {ms:.0f} ms 收到首个心率; {self.first_beat_latency.summary()}")
+        if self._drop_ns is not None and self.state == LINK_CONNECTED:
+            self.recover_latency.record((now - self._drop_ns) / 1e6)
+            self._drop_ns = None
+            logger.info(self.recover_latency.summary())
 
         # 保存数据
-        self.heart_rate_data.append((timestamp, heart_rate))
+        self.heart_rate_data.append(heart_rate, now)
+        self.stats.push(now // 1_000_000, heart_rate)
+        if self.journal is not None:
+            # RR间期的单位是1/1024秒
+            self.journal.append(time.time_ns() // 1_000_000, heart_rate, [rr * 1000 // 1024 for rr in measurement.rr])
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         # 调用回调函数通知UI更新
         if self.heart_rate_callback:
@@ -115,34 +498,124 @@ class BLEHeartRateMonitor:
         Returns:
             解析出的心率值
         """
-        flags = data[0]
-        heart_rate_value_format = (flags & 0x01) == 0x01
-
-        if heart_rate_value_format:
-            heart_rate = int.from_bytes(data[1:3], byteorder='little')
-        else:
-            heart_rate = int(data[1])
-
-        return heart_rate
+        return parse_measurement(data).heart_rate
 
     def get_heart_rate_stats(self) -> Optional[Dict[str, float]]:
         """
         获取心率统计数据
 
         Returns:
-            包含最小值、最大值、平均值和数据点数量的字典，如果没有数据则返回None
-        """
-        if not self.heart_rate_data:
-            return None
-
-        hrs = [hr for _, hr in self.heart_rate_data]
-        return {
-            'min': min(hrs),
-            'max': max(hrs),
-            'avg': round(sum(hrs) / len(hrs), 1),
-            'count': len(hrs)
-        }
+            包含最小值、最大值、平均值和数据点数量等数据的字典，如果没有数据则返回None
+        """
+        return self.stats.result()
     
     def clear_heart_rate_data(self):
         """清空心率数据"""
         self.heart_rate_data.clear()
+        self.stats.reset()
+
+class MultiDeviceMonitor:
+    """同时连接多个设备
+
+    每个设备一个 BLEHeartRateMonitor 会话(各自的数据、统计和重连策略), 共用一个扫描器;
+    心率样本由通知回调直接分发给订阅者, 不需要轮询
+    """
+    def __init__(self, capacity: int = 24*3600*4, spill: str = SPILL_OVERWRITE):
+        """
+        Args:
+            capacity: 每个设备的心率数据最大保存数量
+            spill: 数据写满后的处理策略(overwrite/drop/grow)
+        """
+        self.capacity = capacity
+        self.spill = spill
+        self.scanner = DeviceScanner()
+        self.scanner.running_callback = self._on_scanner_running
+        self.sessions: Dict[str, BLEHeartRateMonitor] = {}
+        # 设备地址(None表示所有设备) -> [callback(地址, Unix毫秒, 心率)]
+        self._subscribers: Dict[Optional[str], List[Callable[[str, int, int], None]]] = {}
+        # 会话连接状态变化时调用 state_callback(地址, 新状态, 旧状态)
+        self.state_callback: Optional[Callable[[str, str, str], None]] = None
+        self.auto_reconnect = True
+
+    def session(self, address: str) -> BLEHeartRateMonitor:
+        """获取设备的会话, 不存在时创建"""
+        monitor = self.sessions.get(address)
+        if monitor is None:
+            monitor = BLEHeartRateMonitor(self.capacity, self.spill, scanner=self.scanner)
+            monitor.auto_reconnect = self.auto_reconnect
+            monitor.heart_rate_callback = self._sample_handler(address, monitor)
+            monitor.state_callback = lambda state, old: self._on_state(address, state, old)
+            self.sessions[address] = monitor
+        return monitor
+
+    def _sample_handler(self, address: str, monitor: BLEHeartRateMonitor):
+        store = monitor.heart_rate_data
+
+        def on_sample(timestamp: str, heart_rate: int):
+            # 使用样本自己的时间: 存储写满并丢弃新数据时 store.last() 是之前的样本
+            epoch_ms = store.mono_to_epoch_ms(monitor.last_sample_ns)
+            for callback in self._subscribers.get(address, ()):
+                callback(address, epoch_ms, heart_rate)
+            for callback in self._subscribers.get(None, ()):
+                callback(address, epoch_ms, heart_rate)
+        return on_sample
+
+    def _on_state(self, address: str, state: str, old: str):
+        if self.state_callback:
+            self.state_callback(address, state, old)
+
+    def _on_scanner_running(self, running: bool):
+        for monitor in self.sessions.values():
+            monitor._on_scanner_running(running)
+
+    def subscribe(self, callback: Callable[[str, int, int], None], address: Optional[str] = None):
+        """
+        订阅心率样本
+
+        Args:
+            callback: callback(地址, Unix毫秒, 心率)
+            address: 只订阅该设备, 为None时订阅所有设备
+        """
+        self._subscribers.setdefault(address, []).append(callback)
+
+    def unsubscribe(self, callback: Callable[[str, int, int], None], address: Optional[str] = None):
+        callbacks = self._subscribers.get(address, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    async def connect(self, address: str) -> tuple[bool, str]:
+        """连接设备(已连接时直接返回)"""
+        monitor = self.session(address)
+        if monitor.connected:
+            return True, "已连接 {device_address}"
+        return await monitor.connect_device(address)
+
+    async def connect_all(self, addresses: List[str]) -> Dict[str, tuple[bool, str] | BaseException]:
+        """同时连接多个设备, 返回每个设备的结果或异常"""
+        results = await asyncio.gather(*(self.connect(a) for a in addresses), return_exceptions=True)
+        return dict(zip(addresses, results))
+
+    async def disconnect(self, address: str, remove: bool = False) -> bool:
+        """
+        断开设备(同时取消重连)
+
+        Args:
+            remove: 是否同时删除会话和数据
+        """
+        monitor = self.sessions.get(address)
+        if monitor is None:
+            return False
+        result = await monitor.disconnect_device()
+        if remove:
+            del self.sessions[address]
+        return result
+
+    async def disconnect_all(self):
+        await asyncio.gather(*(m.disconnect_device() for m in self.sessions.values()), return_exceptions=True)
+
+    def connected_addresses(self) -> List[str]:
+        return [a for a, m in self.sessions.items() if m.connected]
+
+    def get_heart_rate_stats(self) -> Dict[str, Optional[Dict[str, float]]]:
+        """每个设备的心率统计"""
+        return {a: m.get_heart_rate_stats() for a, m in self.sessions.items()}
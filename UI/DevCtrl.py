@@ -1,16 +1,25 @@
 from PyQt5.QtWidgets import (QVBoxLayout, QLabel
-    ,QGroupBox, QHBoxLayout, QPushButton, QListWidget
-    ,QSpinBox, QTextEdit, QMessageBox,  QFileDialog, QListWidgetItem)
+    ,QGroupBox, QHBoxLayout, QPushButton, QListView, QComboBox
+    ,QSpinBox, QMessageBox,  QFileDialog, QProgressDialog)
 from PyQt5.QtCore import pyqtSignal, QTimer, Qt
 
-from bleak.exc import BleakDeviceNotFoundError, BleakError
-
 from .basicwidgets import CheackBox_
+from .DevListModel import DeviceListModel, DeviceFilterProxy
+from .HRLogView import HeartRateLogView
+from .HRExport import ExportThread
 from system_utils import logger, try_except, ups, gs
-from Blegetheartbeat import BLEHeartRateMonitor
+from Blegetheartbeat import (BLEHeartRateMonitor, DEVICE_ADDED, DEVICE_REMOVED
+    ,LINK_IDLE, LINK_SCANNING, LINK_CONNECTING, LINK_CONNECTED, LINK_RECONNECTING)
+from metrics import profiler
+from known_devices import KnownDeviceRegistry
+from journal import SessionJournal, export_csv, discard
+from sessionfile import SESSION_EXT
+from catalog import CATALOG_FILE
 
 import os
 import json
+import time
+import asyncio
 import datetime
 
 from qasync import asyncSlot
@@ -22,29 +31,62 @@ class DeviceConnectionUI(QVBoxLayout):
     status_changed = pyqtSignal(str)
     upd_lastST = pyqtSignal(str)
     set_act_Devstatus = pyqtSignal(str)
-    DEVICE_DATA_ROLE = Qt.UserRole + 1
+    # 连接状态变化(新状态, 旧状态)
+    link_state_changed = pyqtSignal(str, str)
+    # 找到上次没有正常关闭的会话日志(段文件列表)
+    journal_recovered = pyqtSignal(list)
 
     @try_except("设备链接界面初始化")
     def __init__(self, status_label):
         super().__init__()
-        self.ble_monitor = BLEHeartRateMonitor()
+        self.ble_monitor = BLEHeartRateMonitor(
+             self._get_set("data_capacity", 24*3600*4, int)
+            ,self._get_set("data_spill", "overwrite", str)
+        )
         self.ble_monitor.heart_rate_callback = self.on_heart_rate_update
+        self.ble_monitor.state_callback = self.link_state_changed.emit
+        self.ble_monitor.auto_reconnect = self._get_set("auto_reconnect", True, bool)
+        # 样本实时写入会话日志, 异常退出后不丢失数据
+        if self._get_set("journal", True, bool):
+            self.ble_monitor.journal = SessionJournal(keep_days=self._get_set("journal_keep_days", 7, float))
+            self.journal_recovered.connect(self.on_journal_recovered)
+            self.ble_monitor.journal.recovered_callback = self.journal_recovered.emit
+            self.ble_monitor.journal.start()
         self.status_label = status_label
         self.linking = False
+        # 为True时表示正在主动断开连接
         self.quit_ = False
-        self.be_timeout = False
         self.usedevlist = True
         self.auto_connect_now = True
         self.start_hr_data = None
+        # 正在进行的数据导出
+        self.export_thread = None
         self.selected_device = self._get_set("last_selected_device", None, json.loads)
+        # 连接过的设备, 启动时可以直接连接
+        self.known_devices = KnownDeviceRegistry()
+        self.ble_monitor.service_cache.update(self.known_devices.hr_addresses())
+        if self.selected_device is None:
+            preferred = self.known_devices.preferred()
+            if preferred is not None:
+                self.selected_device = {"name": preferred.name or preferred.address, "address": preferred.address}
         self.auto_connect = self._get_set("auto_connect", False, bool)
+        self.auto_scan_on = True
+        self.noscanerror_win = False
+        self.device_model = DeviceListModel()
+        self.device_model.selected_address = self.selected_device["address"] if self.selected_device else None
+        self.device_proxy = DeviceFilterProxy(self.device_model)
+        # 默认按心率服务过滤, 不声明心率服务的设备可以在界面中关闭"仅心率设备"
+        self.ble_monitor.scanner.hr_only = self._get_set("hr_only", True, bool)
+        self.ble_monitor.scanner.callback = self.on_device_event
         self.setup_ui()
-        # 扫描一次设备
+        self.link_state_changed.connect(self.on_link_state)
+        self.on_link_state(self.ble_monitor.state, "")
+        # 开始持续扫描设备
         self.scan_devices()
-
-        self.scan_timer = QTimer()
-        self.scan_timer.timeout.connect(self.scan_devices)
-        self.scan_timer.start(10000)
+        # 已知设备不必等待扫描, 与扫描同时直接连接
+        if self.auto_connect and self.selected_device and self.known_devices.get(self.selected_device["address"]):
+            logger.info(f"启动时直接连接已知设备 {self.selected_device['address']}")
+            self.connect_device()
 
     def setup_ui(self):
 
@@ -58,12 +100,19 @@ class DeviceConnectionUI(QVBoxLayout):
         btn_layout.addWidget(self.refresh_button)
 
         CheackBox_(
-            "自动刷新"
+            "持续扫描"
             ,btn_layout
             ,True
             ,self.auto_scan
         )
 
+        CheackBox_(
+            "仅心率设备"
+            ,btn_layout
+            ,self.ble_monitor.scanner.hr_only
+            ,self.toggle_hr_only
+        )
+
         CheackBox_(
             "自动连接"
             ,btn_layout
@@ -80,13 +129,29 @@ class DeviceConnectionUI(QVBoxLayout):
 
         scan_layout.addLayout(btn_layout)
 
-        self.device_list = QListWidget()
-        self.device_list.itemClicked.connect(self.on_device_selected)
+        self.device_proxy.set_hr_only(self.ble_monitor.scanner.hr_only)
+        self.device_list = QListView()
+        self.device_list.setModel(self.device_proxy)
+        self.device_list.setUniformItemSizes(True)
+        self.device_list.clicked.connect(self.on_device_selected)
         device_textlayout = QHBoxLayout()
         self.device_list_status = QLabel()
 
+        # 设备排序方式
+        self.sort_box = QComboBox()
+        for text, key in (("发现顺序", DeviceFilterProxy.SORT_NONE)
+                         ,("信号强度", DeviceFilterProxy.SORT_RSSI)
+                         ,("名称", DeviceFilterProxy.SORT_NAME)):
+            self.sort_box.addItem(text, key)
+        sort_key = self._get_set("device_sort", DeviceFilterProxy.SORT_NONE, str)
+        self.sort_box.setCurrentIndex(max(self.sort_box.findData(sort_key), 0))
+        self.device_proxy.set_sort_key(self.sort_box.currentData())
+        self.sort_box.currentIndexChanged.connect(self.set_device_sort)
+
         device_textlayout.addWidget(QLabel("可用的BLE设备:"))
         device_textlayout.addWidget(self.device_list_status)
+        device_textlayout.addStretch()
+        device_textlayout.addWidget(self.sort_box)
         scan_layout.addLayout(device_textlayout)
         scan_layout.addWidget(self.device_list)
 
@@ -104,6 +169,12 @@ class DeviceConnectionUI(QVBoxLayout):
 
         duration_layout.addWidget(QLabel("自动断开时间:"))
         duration_layout.addWidget(self.duration_spin)
+        CheackBox_(
+            "断开后自动重连"
+            ,duration_layout
+            ,self.ble_monitor.auto_reconnect
+            ,self.toggle_auto_reconnect
+        )
         control_layout.addLayout(duration_layout)
 
         btn_layout = QHBoxLayout()
@@ -123,18 +194,41 @@ class DeviceConnectionUI(QVBoxLayout):
         data_group = QGroupBox("心率数据记录")
         data_layout = QVBoxLayout()
 
-        self.heart_rate_display = QTextEdit()
-        self.heart_rate_display.setReadOnly(True)
+        self.heart_rate_display = HeartRateLogView(self._get_set("log_capacity", 5000, int))
         data_layout.addWidget(self.heart_rate_display)
 
         databutlayout = QHBoxLayout()
         data_layout.addLayout(databutlayout)
 
+        CheackBox_(
+            "暂停滚动"
+            ,databutlayout
+            ,False
+            ,lambda state: self.heart_rate_display.set_autoscroll(state != Qt.Checked)
+        )
+
         # 清空数据按钮
         self.clean_button = QPushButton("清空心率数据")
         self.clean_button.clicked.connect(self.ct_clean_data)
         databutlayout.addWidget(self.clean_button)
 
+        # 保存范围: 最近的分钟数, 0表示全部
+        self.save_range_box = QComboBox()
+        for text, minutes in (("全部数据", 0), ("最近10分钟", 10), ("最近1小时", 60), ("最近24小时", 24*60)):
+            self.save_range_box.addItem(text, minutes)
+        databutlayout.addWidget(self.save_range_box)
+
+        # 保存CSV时的分辨率: 原始样本或某个汇总级别(每个桶一行平均/最低/最高心率)
+        self.save_resolution_box = QComboBox()
+        self.save_resolution_box.addItem("原始数据", 0)
+        rollups = self.ble_monitor.heart_rate_data.rollups
+        for tier in rollups.tiers if rollups is not None else ():
+            span = tier.span_ms
+            text = f"{span // 60_000}分钟" if span % 60_000 == 0 else f"{span // 1000}秒"
+            self.save_resolution_box.addItem(f"每{text}汇总", span)
+        self.save_resolution_box.setToolTip("只对CSV文件有效, 会话文件总是保存原始数据和全部汇总")
+        databutlayout.addWidget(self.save_resolution_box)
+
         # 数据保存按钮
         self.save_button = QPushButton("保存数据到文件")
         self.save_button.clicked.connect(self.ct_save_data)
@@ -146,86 +240,87 @@ class DeviceConnectionUI(QVBoxLayout):
         self.addWidget(control_group)
         self.addWidget(data_group)
 
-        # 定时器用于更新链接信息UI
-        self.update_timer = QTimer()
-        self.update_timer.timeout.connect(self.update_ui)
-        self.update_timer.start(1000)
-
     def on_heart_rate_update(self, timestamp, heart_rate):
         self.heart_rate_display.append(f"[{timestamp}] 心率: {heart_rate} BPM")
         self.heart_rate_updated.emit(heart_rate)
 
     def filter_empty(self, state):
-            self.ble_monitor.filter_empty = state
+        self.ble_monitor.filter_empty = state
+        self.device_proxy.set_hide_unnamed(state == Qt.Checked)
+        self.update_device_count()
+
+    def set_device_sort(self, index):
+        key = self.sort_box.itemData(index)
+        self.device_proxy.set_sort_key(key)
+        self._up_set("device_sort", key)
+
+    def update_device_count(self):
+        if self.usedevlist:
+            self.device_list_status.setText(f"找到 {self.device_proxy.rowCount()} 个设备")
 
     def hrdatalog(self, log: str):
         datatime = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         self.heart_rate_display.append(f"[{datatime}] {log}")
 
-    def on_device_selected(self, item):
+    def on_device_selected(self, index):
         """处理设备选择事件"""
         if not self.usedevlist: return
-        # 清除之前选择的标记
-        for i in range(self.device_list.count()):
-            list_item = self.device_list.item(i)
-            text = list_item.text()
-            if text.startswith("[已选择]"):
-                # 恢复原始名称
-                original_text = list_item.data(self.DEVICE_DATA_ROLE)
-                if original_text:
-                    list_item.setText(original_text)
 
+        self.select_device(index.data(DeviceListModel.AddressRole), index.data(DeviceListModel.NameRole))
+
+    def select_device(self, address: str, name: str | None = None):
+        """选择设备(名称为空时从设备表中查找)"""
+        if name is None:
+            entry = self.ble_monitor.scanner.devices.get(address)
+            name = entry.name if entry is not None else None
         # 存储当前选择的设备信息
-        device_text = item.text()
         self.selected_device = {
-            "name": device_text.split(" (")[0].strip(),
-            "address": device_text[device_text.find("(")+1:device_text.find(")")]
+            "name": name or address,
+            "address": address
         }
+        # 在模型中标记"[已选择]"
+        self.device_model.set_selected(self.selected_device["address"])
 
         self.upd_lastST.emit(self.selected_device["name"])
         self._up_set("last_selected_device", json.dumps(self.selected_device))
 
-        # 添加"[已选择]"标记并更新显示
-        marked_text = f"[已选择]{device_text}"
-        item.setText(marked_text)
-
-        # 保存原始文本到用户数据
-        item.setData(self.DEVICE_DATA_ROLE, device_text)
+    def on_device_event(self, event, entry):
+        """根据设备表的变化增量更新设备列表"""
+        new = event == DEVICE_ADDED and self.device_model.row_of(entry.address) < 0
+        self.device_model.apply(event, entry)
+        if event != DEVICE_REMOVED:
+            self.known_devices.seen(entry.address, entry.name, entry.rssi)
+        if new:
+            profiler.mark("发现首个设备")
+        if new and self.selected_device is not None and entry.address == self.selected_device["address"]:
+            if entry.name:
+                self.selected_device = {
+                    "name": entry.name,
+                    "address": entry.address
+                }
+            # 如果开启了自动连接，则尝试连接
+            if self.usedevlist:
+                self.use_for_auto_connect()
+        self.update_device_count()
 
     @asyncSlot()
     async def scan_devices(self):
-        """扫描BLE设备"""
-        # 保存当前选择状态
+        """重新扫描BLE设备"""
         if not self.usedevlist: return
-        current_address = self.selected_device["address"] if self.selected_device else None
+        await self.start_scan(restart=True)
 
+    async def start_scan(self, restart: bool = False):
+        """启动持续扫描"""
         self.device_list_status.setText("正在扫描设备...")
 
         try:
-            devices = await self.ble_monitor.scan_devices()
-
-            self.device_list.clear()
-
-            for device in devices:
-                item_text = f"{device.name} ({device.address})"
-                item = QListWidgetItem(item_text)
-                item.setData(self.DEVICE_DATA_ROLE, item_text)  # 存储原始文本
-
-                # 如果这是之前选择的设备，添加标记
-                if current_address and device.address == current_address:
-                    item.setText(f"[已选择]{item_text}")
-                    self.selected_device = {
-                        "name": device.name,
-                        "address": device.address
-                    }
-                    # 如果开启了自动连接，则尝试连接
-                    if self.usedevlist:
-                        await self.use_for_auto_connect()
-
-                self.device_list.addItem(item)
-
-            self.device_list_status.setText(f"找到 {len(devices)} 个设备")
+            if restart:
+                await self.ble_monitor.scanner.restart()
+            else:
+                await self.ble_monitor.scanner.start()
+            self.update_device_count()
             self.noscanerror_win = False
+            profiler.mark("扫描已启动")
         except WindowsError as e:
             print(e.winerror)
             if e.winerror == -2147020577:
@@ -238,24 +333,42 @@ class DeviceConnectionUI(QVBoxLayout):
                 logger.error(f"窗口错误: {errortxt}")
 
             if not self.noscanerror_win:
-                QMessageBox.warning(self, "错误", errortxt)
+                QMessageBox.warning(self.device_list, "错误", errortxt)
                 self.noscanerror_win = True
 
         except Exception as e:
             self.device_list_status.setText(f"扫描错误: {str(e)}")
             logger.error(f"扫描BLE设备错误: {e}", exc_info=True)
 
-    async def use_for_auto_connect(self):
+    def set_scanning(self, on: bool):
+        """启停持续扫描"""
+        scanner = self.ble_monitor.scanner
+        if on and not scanner.running:
+            asyncio.ensure_future(self.start_scan())
+        elif not on and scanner.running:
+            asyncio.ensure_future(scanner.stop())
+
+    def use_for_auto_connect(self):
         """自动连接"""
         if self.auto_connect and self.auto_connect_now:
-            await self.connect_device()
+            self.connect_device()
 
     def auto_scan(self, state):
-        """启停自动扫描设备"""
-        if state == Qt.Checked:
-            self.scan_timer.start(10000)
-        else:
-            self.scan_timer.stop()
+        """启停持续扫描设备"""
+        self.auto_scan_on = state == Qt.Checked
+        self.set_scanning(self.auto_scan_on and self.usedevlist)
+
+    @asyncSlot(int)
+    async def toggle_hr_only(self, state):
+        """切换是否只扫描心率设备"""
+        hr_only = state == Qt.Checked
+        self._up_set("hr_only", hr_only)
+        self.ble_monitor.scanner.hr_only = hr_only
+        self.device_proxy.set_hr_only(hr_only)
+        self.update_device_count()
+        if self.ble_monitor.scanner.running:
+            # 保留设备表, 新的过滤条件由代理模型立即生效
+            await self.ble_monitor.scanner.restart(clear=False)
 
     @asyncSlot()
     async def connect_device(self):
@@ -268,12 +381,11 @@ class DeviceConnectionUI(QVBoxLayout):
         # 如果正在连接，则返回
         if self.linking: return
         self.linking = True
+        from bleak.exc import BleakDeviceNotFoundError, BleakError
 
         device_name = self.selected_device["name"]
         device_address = self.selected_device["address"]
 
-        self.connect_button.setEnabled(False)
-        self.clean_button.setEnabled(False)
         self.status_label.setText(f"正在连接 {device_name}...")
         logger.info(f"尝试连接 {device_name} ({device_address})")
 
@@ -282,6 +394,12 @@ class DeviceConnectionUI(QVBoxLayout):
             self.status_label.setText(rtext.format(device_address=device_name))
             logger.info(rtext.format(device_address=f"{device_name} ({device_address})"))
             if success:
+                entry = self.ble_monitor.scanner.devices.get(device_address)
+                self.known_devices.connected(
+                     device_address
+                    ,device_name if device_name != device_address else None
+                    ,entry.rssi if entry is not None else None
+                )
                 self.start_hr_data = datetime.datetime.now().strftime("%Y%m%d%H%M")
                 self.set_act_Devstatus.emit("断开")
                 self.hrdatalog("已连接到设备")
@@ -332,13 +450,12 @@ class DeviceConnectionUI(QVBoxLayout):
         async def disconnect():
             self.disconnect_button.setEnabled(False)
             self.quit_ = True
+            # 重连过程中断开即取消重连
+            reconnecting = self.ble_monitor.state == LINK_RECONNECTING
             success = await self.ble_monitor.disconnect_device()
-            if success:
-                self.set_act_Devstatus.emit("连接")
+            if success or reconnecting:
                 self.auto_connect_now = False
-                self.be_timeout = False
                 self.status_label.setText("已断开连接")
-                self.set_devicelist_use(True)
                 self.device_list_status.setText("...")
                 self.heart_rate_display.append(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 已断开连接")
                 logger.info("已断开连接")
@@ -351,8 +468,12 @@ class DeviceConnectionUI(QVBoxLayout):
                         f"最低: {stats['min']} BPM\n"
                         f"最高: {stats['max']} BPM\n"
                         f"平均: {stats['avg']:.1f} BPM\n"
+                        f"标准差: {stats['std']:.1f} BPM\n"
                         f"共记录 {stats['count']} 条数据"
                     )
+                for hist in (self.ble_monitor.first_beat_latency, self.ble_monitor.reconnect_latency, self.ble_monitor.recover_latency):
+                    if hist.count:
+                        logger.info(hist.summary())
             else:
                 self.status_label.setText("断开连接失败")
             self.quit_ = False
@@ -372,50 +493,124 @@ class DeviceConnectionUI(QVBoxLayout):
             return
 
         filename, _ = QFileDialog.getSaveFileName(
-            self.save_button, "保存心率数据", "", "CSV文件 (*.csv);;所有文件 (*)")
+            self.save_button, "保存心率数据", "",
+            f"CSV文件 (*.csv);;压缩的CSV文件 (*.csv.gz *.csv.xz);;心率会话文件 (*{SESSION_EXT});;所有文件 (*)")
 
         if filename:
-            self.savehrdata(filename)
+            minutes = self.save_range_box.currentData()
+            start_ms = int(time.time() * 1000) - minutes * 60_000 if minutes else None
+            self.savehrdata(filename, start_ms, resolution_ms=self.save_resolution_box.currentData() or None)
+
+    def savehrdata(self, filename, start_ms: int = None, end_ms: int = None, resolution_ms: int = None):
+        """
+        在后台线程中保存心率数据, 按扩展名选择格式(.csv/.csv.gz/.csv.xz/.hrs)
+
+        Args:
+            resolution_ms: CSV按该分辨率的汇总级别输出, None表示输出原始样本
+        """
+        if self.export_thread is not None and self.export_thread.isRunning():
+            QMessageBox.warning(self.save_button, "警告", "正在保存数据, 请稍候")
+            return
+        # 保存的数据同时添加到会话目录
+        catalog = CATALOG_FILE if self._get_set("catalog", True, bool) else None
+        device = self.selected_device["address"] if self.selected_device else ""
+        thread = ExportThread(self.ble_monitor.heart_rate_data, filename, start_ms, end_ms, resolution_ms,
+                              device=device, catalog=catalog)
+        progress = QProgressDialog("正在保存心率数据...", "取消", 0, 100, self.save_button)
+        progress.setWindowTitle("保存数据")
+        progress.setMinimumDuration(500)
+        progress.setAutoClose(False)
+        progress.setAutoReset(False)
+        thread.progress_signal.connect(progress.setValue)
+        progress.canceled.connect(thread.stop)
+
+        def on_error(text):
+            QMessageBox.warning(self.save_button, "错误", f"保存数据时出错: {text}")
+
+        def on_finished(success):
+            progress.close()
+            self.save_button.setEnabled(True)
+            if success:
+                QMessageBox.information(self.save_button, "成功", f"数据已保存({thread.count} 条)")
 
-    def savehrdata(self, filename):
-        try:
-            with open(filename, 'w', encoding='utf-8-sig') as f:
-                f.write("时间,心率(BPM)\n")
-                for timestamp, hr in self.ble_monitor.heart_rate_data:
-                    f.write(f"{timestamp},{hr}\n")
-            logger.info(f"保存心率数据到 {filename}")
-            QMessageBox.information(self.save_button, "成功", "数据已保存")
-        except Exception as e:
-            QMessageBox.warning(self.save_button, "错误", f"保存数据时出错: {str(e)}")
-            logger.error(f"保存数据时出错: {str(e)}")
+        thread.error_signal.connect(on_error)
+        thread.finished_signal.connect(on_finished)
+        self.export_thread = thread
+        self.save_button.setEnabled(False)
+        thread.start()
 
     def auto_savedata(self):
         # 检查目录
         autosavepath = "./autosave"
         pathname = datetime.datetime.now().strftime("%Y%m%d%H%M")
         if not os.path.exists(autosavepath):os.mkdir(autosavepath)
-        path = os.path.join(autosavepath,f"{pathname}.csv")
         n = 0
         while True:
-            edpathname = (path + f"({n})") if n > 0 else path
+            edpathname = os.path.join(autosavepath, f"{pathname}({n}).csv" if n > 0 else f"{pathname}.csv")
             if not os.path.exists(edpathname):
                 self.savehrdata(edpathname)
                 break
-
-    def update_ui(self):
-        """更新UI状态"""
-        if self.quit_ == True or self.linking:pass
-        elif self.ble_monitor.client and self.ble_monitor.client.is_connected:
-            self.be_timeout = True
+            n += 1
+
+    def on_journal_recovered(self, segments: list):
+        """上次程序没有正常退出时, 询问是否导出会话日志中的数据"""
+        sessions = {}
+        for segment in segments:
+            sessions.setdefault(segment.session, []).append(segment)
+        count = sum(s.records for s in segments)
+        answer = QMessageBox.question(
+            self.save_button, "恢复数据",
+            f"上次程序没有正常退出, 会话日志中有 {len(sessions)} 个会话(共 {count} 条记录)\n"
+            "保存: 导出到 autosave 目录\n放弃: 删除这些日志\n忽略: 保留日志, 下次启动时再询问",
+            QMessageBox.Save | QMessageBox.Discard | QMessageBox.Ignore, QMessageBox.Save)
+        if answer == QMessageBox.Discard:
+            discard(segments)
+            self.hrdatalog("已删除上次的会话日志")
+        elif answer == QMessageBox.Save:
+            autosavepath = "./autosave"
+            os.makedirs(autosavepath, exist_ok=True)
+            for session, group in sessions.items():
+                path = os.path.join(autosavepath, f"recovered-{session}.csv")
+                try:
+                    n = export_csv(group, path)
+                except (OSError, ValueError) as e:
+                    logger.error(f"导出会话日志 {session} 失败: {e}")
+                    self.hrdatalog(f"导出上次的会话 {session} 失败: {e}")
+                    continue
+                # 已导出, 不再询问
+                discard(group)
+                self.hrdatalog(f"已导出上次的会话到 {path}, 共 {n} 条数据")
+
+    def on_link_state(self, state: str, old: str):
+        """连接状态变化时更新界面(只在状态切换时调用)"""
+        if state == LINK_CONNECTED:
+            if old == LINK_RECONNECTING:
+                self.status_label.setText("已重新连接")
+                self.hrdatalog("已重新连接到设备")
             self.connect_button.setEnabled(False)
             self.clean_button.setEnabled(False)
             self.disconnect_button.setEnabled(True)
             self.set_devicelist_use(False)
+        elif state == LINK_CONNECTING:
+            self.connect_button.setEnabled(False)
+            self.clean_button.setEnabled(False)
+            self.disconnect_button.setEnabled(False)
+        elif state == LINK_RECONNECTING:
+            self.connect_button.setEnabled(False)
+            self.clean_button.setEnabled(False)
+            # 可以断开以取消重连
+            self.disconnect_button.setEnabled(True)
+            self.status_label.setText("链接被断开, 正在重连...")
+            self.hrdatalog("链接被断开, 正在重连")
+        elif old in (LINK_IDLE, LINK_SCANNING):
+            # 只是扫描启停
+            return
         else:
-            if self.be_timeout:
-                self.status_label.setText("链接被断开")
+            if old in (LINK_CONNECTED, LINK_RECONNECTING):
+                if not self.quit_:
+                    self.status_label.setText("链接被断开")
+                    self.hrdatalog("链接被断开")
                 self.set_act_Devstatus.emit("连接")
-                self.be_timeout = False
                 self.set_devicelist_use(True)
             self.heart_rate_updated.emit(-1)
             self.clean_button.setEnabled(True)
@@ -432,6 +627,12 @@ class DeviceConnectionUI(QVBoxLayout):
             self.device_list_status.setStyleSheet("color: red;")
             self.device_list.setEnabled(False)
             self.usedevlist = False
+        # 连接设备期间暂停扫描
+        self.set_scanning(checked and self.auto_scan_on)
+
+    def toggle_auto_reconnect(self, state):
+        self.ble_monitor.auto_reconnect = state == Qt.Checked
+        self._up_set("auto_reconnect", self.ble_monitor.auto_reconnect)
 
     def check_auto_connect(self, state):
         if state == Qt.Checked:
@@ -0,0 +1,141 @@
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QSortFilterProxyModel
+
+from Blegetheartbeat import DeviceEntry, DEVICE_REMOVED
+
+__all__ = ["DeviceListModel", "DeviceFilterProxy"]
+
+class DeviceListModel(QAbstractListModel):
+    """以设备地址为键的设备列表模型, 按设备表的变化增量更新"""
+    AddressRole = Qt.UserRole + 1
+    NameRole = Qt.UserRole + 2
+    RssiRole = Qt.UserRole + 3
+    HrServiceRole = Qt.UserRole + 4
+    SelectedRole = Qt.UserRole + 5
+    LastSeenRole = Qt.UserRole + 6
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: list[DeviceEntry] = []
+        # 地址 -> 行号
+        self._index: dict[str, int] = {}
+        self.selected_address: str | None = None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            text = f"{entry.name} ({entry.address})"
+            return f"[已选择]{text}" if entry.address == self.selected_address else text
+        if role == self.AddressRole:
+            return entry.address
+        if role == self.NameRole:
+            return entry.name
+        if role == self.RssiRole:
+            return entry.rssi
+        if role == self.HrServiceRole:
+            return entry.hr_service
+        if role == self.SelectedRole:
+            return entry.address == self.selected_address
+        if role == self.LastSeenRole:
+            return entry.last_seen
+        if role == Qt.ToolTipRole:
+            return f"信号强度: {entry.rssi} dBm" + (" | 心率服务" if entry.hr_service else "")
+        return None
+
+    def entry(self, row: int) -> DeviceEntry:
+        return self._rows[row]
+
+    def row_of(self, address: str) -> int:
+        """设备所在行, 不存在时返回-1"""
+        return self._index.get(address, -1)
+
+    def apply(self, event: str, entry: DeviceEntry):
+        """应用设备表的一次变化"""
+        row = self._index.get(entry.address, -1)
+        if event == DEVICE_REMOVED:
+            if row < 0:
+                return
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._rows[row]
+            del self._index[entry.address]
+            for i in range(row, len(self._rows)):
+                self._index[self._rows[i].address] = i
+            self.endRemoveRows()
+        elif row < 0:
+            row = len(self._rows)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._rows.append(entry)
+            self._index[entry.address] = row
+            self.endInsertRows()
+        else:
+            self._rows[row] = entry
+            self._changed(row)
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows.clear()
+        self._index.clear()
+        self.endResetModel()
+
+    def set_selected(self, address: str | None):
+        """设置选中的设备"""
+        old = self._index.get(self.selected_address, -1)
+        self.selected_address = address
+        if old >= 0:
+            self._changed(old)
+        new = self._index.get(address, -1)
+        if new >= 0 and new != old:
+            self._changed(new)
+
+    def _changed(self, row: int):
+        idx = self.index(row)
+        self.dataChanged.emit(idx, idx)
+
+class DeviceFilterProxy(QSortFilterProxyModel):
+    """设备列表的排序/过滤代理"""
+    SORT_NONE = "none"  # 发现顺序
+    SORT_RSSI = "rssi"  # 信号强度
+    SORT_NAME = "name"  # 名称
+
+    def __init__(self, source: DeviceListModel, parent=None):
+        super().__init__(parent)
+        self.hide_unnamed = True
+        self.hr_only = False
+        self.sort_key = self.SORT_NONE
+        self.setSourceModel(source)
+        self.setDynamicSortFilter(True)
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        entry = self.sourceModel().entry(source_row)
+        if self.hide_unnamed and entry.name is None:
+            return False
+        if self.hr_only and not entry.hr_service:
+            return False
+        return True
+
+    def lessThan(self, left, right):
+        a = self.sourceModel().entry(left.row())
+        b = self.sourceModel().entry(right.row())
+        if self.sort_key == self.SORT_RSSI:
+            # 信号强的排在前面
+            return a.rssi > b.rssi
+        if self.sort_key == self.SORT_NAME:
+            return (a.name or "").lower() < (b.name or "").lower()
+        return left.row() < right.row()
+
+    def set_hide_unnamed(self, enabled: bool):
+        self.hide_unnamed = enabled
+        self.invalidateFilter()
+
+    def set_hr_only(self, enabled: bool):
+        self.hr_only = enabled
+        self.invalidateFilter()
+
+    def set_sort_key(self, key: str):
+        self.sort_key = key
+        # 列号为-1时恢复源模型顺序
+        self.sort(-1 if key == self.SORT_NONE else 0)
@@ -0,0 +1,89 @@
+import os
+import sqlite3
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from system_utils import logger
+from hrexport import export_store
+from catalog import SessionCatalog
+
+__all__ = ["ExportThread"]
+
+class ExportThread(QThread):
+    """在后台线程中导出心率数据"""
+    # 进度百分比
+    progress_signal = pyqtSignal(int)
+    # 是否完成(取消或出错时为False)
+    finished_signal = pyqtSignal(bool)
+    error_signal = pyqtSignal(str)
+
+    def __init__(self, store, filename: str, start_ms: int = None, end_ms: int = None, resolution_ms: int = None,
+                 device: str = "", catalog: str = None):
+        """
+        Args:
+            store: HeartRateStore
+            filename: 输出文件, 按扩展名选择格式和压缩方式
+            start_ms / end_ms: 导出的时间范围(Unix毫秒), None表示不限
+            resolution_ms: CSV的时间分辨率(毫秒), 按汇总级别输出, None表示输出原始样本
+            device: 数据来自的设备地址
+            catalog: 会话目录数据库, 保存完成后把这段数据添加为一个会话, None表示不添加
+        """
+        super().__init__()
+        self.store = store
+        self.filename = filename
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.resolution_ms = resolution_ms
+        self.device = device
+        self.catalog = catalog
+        self.count = 0
+        self._is_running = True
+        self._last_progress = -1
+
+    def run(self):
+        try:
+            # 添加到会话目录的是写入文件的那些块, 不再读取仍在写入的存储
+            chunks = []
+            count = export_store(self.store, self.filename, self.start_ms, self.end_ms,
+                                 progress=self._progress, cancelled=lambda: not self._is_running,
+                                 resolution_ms=self.resolution_ms,
+                                 tee=(lambda ts, hr: chunks.append((ts, hr))) if self.catalog else None)
+            if count is None:
+                logger.info(f"已取消导出 {self.filename}")
+                self.finished_signal.emit(False)
+                return
+            self.count = count
+            logger.info(f"保存心率数据到 {self.filename}, 共 {count} 条")
+            if self.catalog:
+                self._add_to_catalog(chunks)
+            self.finished_signal.emit(True)
+        except Exception as e:
+            self.error_signal.emit(str(e))
+            self.finished_signal.emit(False)
+            logger.error(f"保存数据时出错: {str(e)}")
+
+    def _add_to_catalog(self, chunks: list):
+        """
+        把保存的数据添加到会话目录(覆盖同一文件时替换之前的会话), 失败时只记录日志
+
+        Args:
+            chunks: 导出时写入的各块 [(相对 store.start_ms 的毫秒数, 心率), ...]
+        """
+        t0 = self.store.start_ms
+        samples = ((t0 + t, h) for ts, hr in chunks for t, h in zip(ts, hr))
+        try:
+            with SessionCatalog(self.catalog) as catalog:
+                catalog.add_session(samples, self.device, os.path.abspath(self.filename), replace=True)
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"无法添加到会话目录 {self.catalog}: {e}")
+
+    def _progress(self, done: int, total: int):
+        progress = int(done * 100 / total) if total else 100
+        # 只在百分比变化时通知界面
+        if progress != self._last_progress:
+            self._last_progress = progress
+            self.progress_signal.emit(progress)
+
+    def stop(self):
+        """请求取消(不等待线程结束)"""
+        self._is_running = False
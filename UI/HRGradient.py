@@ -0,0 +1,104 @@
+from array import array
+
+from PyQt5.QtGui import QColor
+
+from system_utils import logger
+
+__all__ = ["HeartRateGradient", "DEFAULT_STOPS"]
+
+# 默认的颜色节点: 心率:色相, 色相节点使用设置中的背景纯度和亮度
+DEFAULT_STOPS = "40:240, 55:180, 70:120, 90:120, 105:60, 120:0"
+
+class HeartRateGradient:
+    """心率 -> 背景颜色的查找表
+
+    颜色节点写作 "心率:色相" 或 "心率:#rrggbb", 用逗号分隔;
+    相邻两个色相节点之间按色相插值, 其余情况按RGB插值.
+    节点、纯度或亮度变化时重新生成 0-255 BPM 的颜色表, 查询只需一次索引
+    """
+    SIZE = 256
+
+    def __init__(self, stops: str = DEFAULT_STOPS, saturation: int = 165, brightness: int = 90):
+        self.saturation = saturation
+        self.brightness = brightness
+        self.none_color = QColor.fromHsv(0, 0, 0)  # 无心率时为黑色
+        self.set_stops(stops)
+
+    @staticmethod
+    def parse_stops(text: str) -> list[tuple[int, int | QColor]]:
+        """
+        解析颜色节点
+
+        Returns:
+            [(心率, 色相或QColor), ...], 按心率排序
+        """
+        stops = []
+        for part in text.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            bpm, value = (v.strip() for v in part.split(":", 1))
+            if value.startswith("#"):
+                color = QColor(value)
+                if not color.isValid():
+                    raise ValueError(f"无效的颜色: {value}")
+                stops.append((int(bpm), color))
+            else:
+                stops.append((int(bpm), int(value) % 360))
+        if not stops:
+            raise ValueError("没有颜色节点")
+        stops.sort(key=lambda s: s[0])
+        return stops
+
+    def set_stops(self, text: str):
+        """设置颜色节点, 无效时使用默认节点"""
+        try:
+            self.stops = self.parse_stops(text)
+            self.stops_text = text
+        except ValueError as e:
+            logger.warning(f"颜色节点 {text!r} 无效, 使用默认值: {e}")
+            self.stops = self.parse_stops(DEFAULT_STOPS)
+            self.stops_text = DEFAULT_STOPS
+        self.rebuild()
+
+    def set_hsv(self, saturation: int, brightness: int):
+        """设置纯度和亮度, 有变化时才重新生成颜色表"""
+        if saturation != self.saturation or brightness != self.brightness:
+            self.saturation = saturation
+            self.brightness = brightness
+            self.rebuild()
+
+    def _stop_color(self, value) -> QColor:
+        return value if isinstance(value, QColor) else QColor.fromHsv(value, self.saturation, self.brightness)
+
+    def _interp(self, bpm: int) -> QColor:
+        stops = self.stops
+        if bpm < stops[0][0]:
+            return self._stop_color(stops[0][1])
+        for (b0, v0), (b1, v1) in zip(stops, stops[1:]):
+            if bpm < b1:
+                if b1 == b0:
+                    break
+                if not isinstance(v0, QColor) and not isinstance(v1, QColor):
+                    hue = v0 + int((bpm - b0) * (v1 - v0) / (b1 - b0))
+                    return QColor.fromHsv(hue, self.saturation, self.brightness)
+                c0, c1 = self._stop_color(v0), self._stop_color(v1)
+                t = (bpm - b0) / (b1 - b0)
+                return QColor(
+                     round(c0.red() + (c1.red() - c0.red()) * t)
+                    ,round(c0.green() + (c1.green() - c0.green()) * t)
+                    ,round(c0.blue() + (c1.blue() - c0.blue()) * t)
+                )
+        return self._stop_color(stops[-1][1])
+
+    def rebuild(self):
+        """重新生成颜色表"""
+        self.table = [self._interp(bpm) for bpm in range(self.SIZE)]
+        # 同样的表以0xAARRGGBB整数保存, 方便不使用QColor的地方
+        self.rgba = array('L', (c.rgba() for c in self.table))
+
+    def color(self, rate) -> QColor:
+        """查询心率对应的颜色(返回的对象是共享的, 请勿修改)"""
+        if not isinstance(rate, int):
+            return self.none_color
+        return self.table[min(max(rate, 0), self.SIZE - 1)]
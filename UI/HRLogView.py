@@ -0,0 +1,96 @@
+from collections import deque
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QTimer
+from PyQt5.QtWidgets import QListView, QAbstractItemView
+
+__all__ = ["HeartRateLogModel", "HeartRateLogView"]
+
+class HeartRateLogModel(QAbstractListModel):
+    """定长的心率记录模型
+
+    追加的文本先放入待处理队列, 每帧最多合并刷新一次;
+    超出容量时丢弃最旧的行
+    """
+    def __init__(self, capacity: int = 5000, interval: int = 16, parent=None):
+        """
+        Args:
+            capacity: 最多保留的行数
+            interval: 合并刷新的间隔(毫秒)
+        """
+        super().__init__(parent)
+        self.capacity = max(1, capacity)
+        self._rows: deque[str] = deque()
+        self._pending: list[str] = []
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self.flush)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self._rows[index.row()]
+        return None
+
+    def append(self, text: str):
+        """追加文本(可包含多行)"""
+        self._pending.extend(text.split("\n"))
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        """把待处理的行写入模型"""
+        lines, self._pending = self._pending, []
+        if not lines:
+            return
+        if len(lines) > self.capacity:
+            lines = lines[-self.capacity:]
+
+        overflow = len(self._rows) + len(lines) - self.capacity
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow):
+                self._rows.popleft()
+            self.endRemoveRows()
+
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(lines) - 1)
+        self._rows.extend(lines)
+        self.endInsertRows()
+
+    def clear(self):
+        self._timer.stop()
+        self._pending.clear()
+        self.beginResetModel()
+        self._rows.clear()
+        self.endResetModel()
+
+class HeartRateLogView(QListView):
+    """心率记录显示控件, 提供与 QTextEdit 相同的 append/clear 接口"""
+    def __init__(self, capacity: int = 5000, parent=None):
+        super().__init__(parent)
+        self.log_model = HeartRateLogModel(capacity, parent=self)
+        self.setModel(self.log_model)
+        self.setUniformItemSizes(True)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.autoscroll = True
+        self.log_model.rowsInserted.connect(self._on_rows_inserted)
+
+    def append(self, text: str):
+        self.log_model.append(text)
+
+    def clear(self):
+        self.log_model.clear()
+
+    def set_autoscroll(self, enabled: bool):
+        """启停自动滚动"""
+        self.autoscroll = enabled
+        if enabled:
+            self.scrollToBottom()
+
+    def _on_rows_inserted(self, parent, first, last):
+        if self.autoscroll:
+            self.scrollToBottom()
@@ -12,16 +12,18 @@ import threading
 from .DevCtrl import *
 from .basicwidgets import *
 from .heartratepng import *
-from .UpDownloadwin import UpdWindow as DownloadWindow
-from system_utils import check_run, AppisRunning, logger, try_except, ups, gs, checkupdate, add_to_startup, remove_from_startup, check_startup
+from system_utils import logger, try_except, ups, gs, flush_settings, checkupdate, add_to_startup, remove_from_startup, check_startup
 from version import __version__ as vname
+from instance import app_instance, CMD_SHOW, CMD_CONNECT
 
-from .Floatingwin_old import *
+from .Floatingwin import *
 
 # 主窗口类
 class MainWindow(QMainWindow):
     updata_window_show_ = pyqtSignal(str, str, str, str)
     errorwinopen = pyqtSignal(str, bool, bool)
+    # 其它实例转发的命令(在后台线程中发出)
+    instance_command = pyqtSignal(str)
     iserror = False
     @try_except("主窗口初始化")
     def __init__(self):
@@ -40,14 +42,11 @@ class MainWindow(QMainWindow):
         # 启动后台线程检查更新
         if self.settings_ui._get_set("update_check", False, bool):
             self.start_update_check()
-        
-        try:
-            check_run()
-        except AppisRunning as e:
-            self.verylarge_error("程序已经在运行了!!!")
-            import sys
-            sys.exit(1)
-        
+
+        # 接收后启动的实例转发的命令
+        self.instance_command.connect(self.on_instance_command)
+        app_instance.serve(self.instance_command.emit)
+
         self.settings_ui.check_startup()
 
     def auto_FixedSize(self):
@@ -126,6 +125,21 @@ class MainWindow(QMainWindow):
         self.show()
         self.activateWindow()
 
+    def on_instance_command(self, command: str):
+        """处理其它实例转发的命令"""
+        logger.info(f"收到其它实例的命令: {command}")
+        name, _, arg = command.partition(" ")
+        if name == CMD_SHOW:
+            self.showNormal()
+            self.raise_()
+            self.activateWindow()
+        elif name == CMD_CONNECT:
+            if arg:
+                self.device_ui.select_device(arg)
+            self.device_ui.connect_device()
+        else:
+            logger.warning(f"未知的命令: {command}")
+
     def closeEvent(self, a0):
         """窗口关闭事件"""
         if self.settings_ui._get_set("use_bg", False, bool):
@@ -173,6 +187,11 @@ class MainWindow(QMainWindow):
         if self.settings_ui.tray_icon:
             self.settings_ui.tray_icon.hide()
         self.float_ui.floating_window.close()
+        # 写入剩余的样本并标记会话日志已正常关闭
+        if self.device_ui.ble_monitor.journal is not None:
+            self.device_ui.ble_monitor.journal.close()
+        flush_settings()
+        app_instance.release()
         QApplication.quit()
 
     def start_update_check(self):
@@ -228,6 +247,7 @@ class MainWindow(QMainWindow):
         reply = self.updmsg_box.exec()
         logger.debug(f"reply: {reply} (-2)")
         if reply == 0:
+            from .UpDownloadwin import UpdWindow as DownloadWindow
             self.updwin = DownloadWindow(self)
             self.updwin.set_url(down_url,index)
             self.updwin.show()
@@ -1,5 +1,5 @@
-from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import QSlider, QCheckBox, QBoxLayout
+from PyQt5.QtCore import Qt, QObject, QEvent
+from PyQt5.QtWidgets import QSlider, QCheckBox, QBoxLayout, QWidget, QApplication
 
 class Slider_(QSlider):
     def __init__(self, initial_value, value_changed_callback, Range = (0, 255)):
@@ -23,4 +23,29 @@ class CheackBox_(QCheckBox):
         super().__init__(text)
         self.setChecked(setC)
         self.stateChanged.connect(Ch_slot)
-        f_layout.addWidget(self)
\ No newline at end of file
+        f_layout.addWidget(self)
+
+class FirstPaintMarker(QObject):
+    """指定的窗口(或其中的控件)收到第一个绘制事件时调用回调, 之后自动移除
+
+    安装在 QApplication 上, 只在首次绘制之前过滤事件
+    """
+    def __init__(self, windows, callback):
+        """
+        Args:
+            windows: 要监视的顶层窗口
+            callback: callback(), 只调用一次
+        """
+        super().__init__()
+        self.windows = tuple(windows)
+        self.callback = callback
+        self.done = False
+        QApplication.instance().installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if (not self.done and event.type() == QEvent.Paint
+                and isinstance(obj, QWidget) and obj.window() in self.windows):
+            self.done = True
+            QApplication.instance().removeEventFilter(self)
+            self.callback()
+        return False
@@ -1,14 +1,34 @@
+# 启动耗时从这里开始计算
+from metrics import profiler, FIRST_PAINT
+
+import os
 import sys
 import asyncio
 import argparse
+import threading
+
+# 打包后进程池(导入CSV到会话目录)的子进程也从这里启动
+if getattr(sys, "frozen", False) and "--multiprocessing-fork" in sys.argv:
+    import multiprocessing
+    multiprocessing.freeze_support()
+
+# 无界面模式(记录/会话目录), 不导入Qt.
+# 以 headless 作为主模块运行: spawn 方式启动的进程池子进程会以 __mp_main__ 的名义重新执行主模块,
+# 主模块不能是这个界面程序(否则子进程会解析命令行并启动界面)
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] in ("record", "catalog"):
+    import runpy
+    runpy.run_module("headless", run_name="__main__", alter_sys=True)
+    sys.exit(0)
 
 from version import IS_FROZEN, IS_NUITKA
+from instance import app_instance, CMD_SHOW, CMD_CONNECT
 
-from system_utils import (check_run,AppisRunning,
-     getlogger, upmod_logger, add_errorfunc, handle_exception
-    ,init_config, pip_install_models
-    ,handle_update_mode,handle_end_update, try_except
-)
+with profiler.phase("导入system_utils"):
+    from system_utils import (
+         getlogger, upmod_logger, add_errorfunc, handle_exception
+        ,init_config, pip_install_models, require_module
+        ,handle_update_mode,handle_end_update, try_except, basefile
+    )
 
 # 解析命令行参数
 parser = argparse.ArgumentParser()
@@ -16,7 +36,11 @@ parser.add_argument('-updatemode', action='store_true', help='更新模式标志
 parser.add_argument('-endup', action='store_true', help='更新结束标志')
 parser.add_argument('-startup', action='store_true', help='用于测试应用能否通过start.bat脚本正常启动')
 parser.add_argument('-start_', action='store_true', help='开机启动标志')
+parser.add_argument('-connect', nargs='?', const='', metavar='ADDRESS', help='连接设备(默认为上次选择的设备), 程序已运行时转发给已运行的程序')
+parser.add_argument('-profile-startup', action='store_true', help='记录启动各阶段的耗时')
+parser.add_argument('-startup-budget', type=float, default=0, help='启动到首次绘制的耗时预算(毫秒), 启动完成后退出, 超出预算时返回值为3')
 args = parser.parse_args()
+profiler.enabled = args.profile_startup or args.startup_budget > 0
 
 if args.start_:pass
 
@@ -25,24 +49,34 @@ if args.startup:
     sys.exit(0)
 
 def _cr():
-    # 检查软件是否已经运行
-    try:
-        check_run()
-    except AppisRunning:
-        from PyQt5.QtWidgets import QMessageBox, QApplication
-        app = QApplication(sys.argv)
-        QMessageBox.critical(None, "程序正在运行", "错误：程序正在运行，无法再次启动。", QMessageBox.Ok)
-        sys.exit(1)
+    # 检查软件是否已经运行, 已运行时把命令转发给已运行的程序
+    if args.updatemode:
+        # 更新程序(upd.exe)不占用单实例锁
+        return
+    # 更新结束时旧程序可能还未完全退出
+    if app_instance.acquire(wait=5 if args.endup else 0):
+        return
+    if args.connect is not None:
+        command = f"{CMD_CONNECT} {args.connect}".strip()
+    else:
+        command = CMD_SHOW
+    if app_instance.send(command):
+        sys.exit(0)
+    from PyQt5.QtWidgets import QMessageBox, QApplication
+    app = QApplication(sys.argv)
+    QMessageBox.critical(None, "程序正在运行", "错误：程序正在运行，无法再次启动。", QMessageBox.Ok)
+    sys.exit(1)
 
 _cr()
 
 del _cr
 
 # 如果是更新模式，使用简单日志输出
-if args.updatemode:
-    logger = upmod_logger()
-else:
-    logger = getlogger()
+with profiler.phase("日志"):
+    if args.updatemode:
+        logger = upmod_logger()
+    else:
+        logger = getlogger()
 
 # 设置全局异常钩子
 sys.excepthook = handle_exception
@@ -58,7 +92,8 @@ if IS_FROZEN:
         logger.info("进入更新结束模式...")
         handle_end_update()
 
-init_config()
+with profiler.phase("配置"):
+    init_config()
 
 def import_pyqt5():
     global QApplication, QtWin
@@ -70,62 +105,51 @@ def import_qasync():
     from qasync import QEventLoop
 
 def import_models():
-    import bleak
-
-pip_install_models(import_pyqt5, "pyqt5")
-pip_install_models(import_qasync, "qasync")
-pip_install_models(import_models, "bleak")
-
-from importlib.metadata import metadata as get_metadata, distributions, distribution, Distribution, PackageNotFoundError
-packages: list[dict[str, str|int]] = []
-packages.append({"nameandversion": "包名 == 版本号", "len": 10, "license":"开源许可证", "name":""})
-if not IS_NUITKA: # 避免nuitka编译后无法运行
-    for entry in distributions():
-        nameandversion = f"{entry.name} == {entry.version}"
-        packages.append({"name": entry.name, "nameandversion": nameandversion, "len": len(nameandversion)})
-
-def add_pak(name:Distribution):
-    @try_except(f"手动获取依赖包名{name}", exit_ = False, exc_info=False)
-    def add_pak_():
-        NaVer = f"{name.name} == {name.version}"
-        packages.append({"name": name.name, "nameandversion": NaVer, "len": len(NaVer)})
-    if name.name not in [x["name"] for x in packages]:
-        add_pak_()
-
-def get_license(name:str):
-    try:
-        return get_metadata(name).get('License')
-    except Exception as e:
-        logger.warning(f"无法获取依赖包 {name} 的授权信息: {e}")
-        return "Unknown"
-
-# pyinstaller编译的应用必须直接使用`distribution`函数获取模块信息, 否则会报错
-data = [
-     distribution('bleak'),
-     distribution('PyQt5'),distribution('PyQt5-Qt5'),distribution('PyQt5_sip')
-    ,distribution('qasync'),distribution('winrt-runtime')
-]
-[add_pak(d_) if d_ else None for d_ in data]
-try:
-    add_pak(distribution('pyinstaller') if not IS_NUITKA else None)
-except PackageNotFoundError: pass
-
-max_len = max(map(lambda x: x["len"], packages))
-
-packageslogtext = "\n  ".join(
-    map(
-    lambda x: f"{x["nameandversion"]:<{max_len+2}}-{get_metadata(x["name"]).get('License') if "license" not in x else x["license"]}"
-    , packages
-    )
-)
-
-logger.info("[项目依赖包清单:\n  "+packageslogtext + "\n]")
-
-from UI import MainWindow
+    # bleak 在首次扫描时才导入, 这里只检查是否已安装
+    require_module("bleak")
+
+with profiler.phase("导入PyQt5/qasync"):
+    pip_install_models(import_pyqt5, "pyqt5")
+    pip_install_models(import_qasync, "qasync")
+    pip_install_models(import_models, "bleak")
+
+def log_packages():
+    """在后台线程中记录依赖包清单"""
+    @try_except("记录依赖包清单", exit_ = False, exc_info=False)
+    def log_packages_():
+        from deps import load_packages, packages_logtext
+        logger.info("[项目依赖包清单:\n  " + packages_logtext(load_packages()) + "\n]")
+    threading.Thread(target=log_packages_, daemon=True).start()
+
+with profiler.phase("导入界面模块"):
+    from UI import MainWindow
+    from UI.basicwidgets import FirstPaintMarker
 import ctypes 
 
+profile_exit_code = None
+
+def finish_profile():
+    """输出启动耗时报告, 设置了预算时检查后退出"""
+    global profile_exit_code
+    if not profiler.enabled or profile_exit_code is not None:
+        return
+    profile_exit_code = 0
+    report = profiler.report()
+    logger.info(report)
+    print(report)
+    try:
+        profiler.save(os.path.join(basefile, 'log/startup_profile.json'))
+    except OSError as e:
+        logger.warning(f"保存启动耗时报告失败: {e}")
+    if args.startup_budget > 0:
+        profile_exit_code = profiler.check_budget(args.startup_budget, FIRST_PAINT)
+        if profile_exit_code:
+            logger.warning(f"启动到首次绘制的耗时超出预算 {args.startup_budget:.1f} ms")
+        QApplication.exit(profile_exit_code)
+
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    with profiler.phase("创建QApplication"):
+        app = QApplication(sys.argv)
 
     app_id = 'Zerolinofe.HRMLink.Main.1'
     QtWin.setCurrentProcessExplicitAppUserModelID(app_id)
@@ -135,9 +159,21 @@ if __name__ == "__main__":
     loop = QEventLoop(app)
     asyncio.set_event_loop(loop)
 
-    window = MainWindow()
+    with profiler.phase("创建主窗口"):
+        window = MainWindow()
     window.show()
     hwnd = window.winId()
+    profiler.mark("显示主窗口")
+    # 在主窗口或浮窗的第一个绘制事件中记录
+    first_paint = FirstPaintMarker((window, window.float_ui.floating_window), lambda: profiler.mark(FIRST_PAINT))
+    if profiler.enabled:
+        # 扫描启动后结束统计, 蓝牙不可用时等待超时
+        profiler.callback = lambda name: finish_profile() if name == "扫描已启动" else None
+        loop.call_later(15, finish_profile)
+    if args.connect is not None:
+        loop.call_soon(window.on_instance_command, f"{CMD_CONNECT} {args.connect}".strip())
+    # 窗口显示后再记录依赖包清单
+    loop.call_soon(log_packages)
 
     def errwin(exc_type, exc_value, exit_ = True, setiserror = True):
         window.verylarge_error(f"{exc_type.__name__}: {exc_value}", exit_, setiserror)
@@ -147,4 +183,7 @@ if __name__ == "__main__":
     screen.logicalDotsPerInchChanged.connect(window.auto_FixedSize)
 
     with loop:
-        loop.run_forever()
\ No newline at end of file
+        loop.run_forever()
+
+    if profile_exit_code is not None:
+        sys.exit(profile_exit_code)
\ No newline at end of file
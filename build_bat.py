@@ -1,7 +1,10 @@
 import os
+from deps import write_manifest
 
 def main(VER2, vname=None):
     if not vname: vname = ".".join(map(str, VER2))
+    # 生成依赖包清单, 编译后的程序启动时不再遍历所有已安装的包
+    write_manifest()
     if os.path.exists("build.bat"):
         with open("build.bat", "w", encoding="utf-8") as f:
             f.write(f"pyinstaller HRMLink.spec --clean --distpath=./_dist/{vname}")
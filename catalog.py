@@ -0,0 +1,350 @@
+# 会话目录: 保存在 SQLite 数据库中的会话列表和样本, 可以按时间范围和统计值查找
+#
+# 样本按块保存: 每块一行, 时间(相对块起点的uint32毫秒)和心率(uint16)各为一个BLOB,
+# 块的起止时间有索引, 按时间范围读取时只解码相关的块
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import multiprocessing
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Iterable, Iterator, Optional
+
+from system_utils import logger, basefile
+
+__all__ = ["SessionCatalog", "CatalogSink", "import_csv", "device_from_name", "CATALOG_FILE"]
+
+CATALOG_FILE = os.path.join(basefile, 'sessions.db')
+
+# 每块的样本数
+BLOCK_SIZE = 4096
+# 每个事务写入的块数
+BATCH_BLOCKS = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+     id INTEGER PRIMARY KEY
+    ,device TEXT NOT NULL DEFAULT ''
+    ,source TEXT UNIQUE
+    ,start_ms INTEGER NOT NULL
+    ,end_ms INTEGER NOT NULL
+    ,count INTEGER NOT NULL
+    ,hr_min INTEGER
+    ,hr_max INTEGER
+    ,hr_avg REAL
+    ,created_ms INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_time ON sessions(start_ms, end_ms);
+CREATE INDEX IF NOT EXISTS sessions_hr_max ON sessions(hr_max);
+CREATE TABLE IF NOT EXISTS blocks (
+     session_id INTEGER NOT NULL
+    ,start_ms INTEGER NOT NULL
+    ,end_ms INTEGER NOT NULL
+    ,count INTEGER NOT NULL
+    ,hr_min INTEGER NOT NULL
+    ,hr_max INTEGER NOT NULL
+    ,ts BLOB NOT NULL
+    ,hr BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blocks_time ON blocks(session_id, start_ms);
+"""
+
+SESSION_COLUMNS = ("id", "device", "source", "start_ms", "end_ms", "count", "hr_min", "hr_max", "hr_avg", "created_ms")
+
+# uint32 在部分平台上是 'I', 在部分平台上是 'L'
+_U32 = 'I' if array('I').itemsize == 4 else 'L'
+
+def _to_blob(a: array) -> bytes:
+    """按小端字节序保存"""
+    if sys.byteorder == "big":
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a.tobytes()
+
+def _from_blob(code: str, blob: bytes) -> array:
+    a = array(code)
+    a.frombytes(blob)
+    if sys.byteorder == "big":
+        a.byteswap()
+    return a
+
+def _blocks(samples: Iterable[tuple[int, int]], block_size: int = BLOCK_SIZE) -> Iterator[tuple]:
+    """
+    把样本分块编码
+
+    Yields:
+        (起始毫秒, 结束毫秒, 样本数, 最小心率, 最大心率, 心率之和, 时间BLOB, 心率BLOB)
+
+    Raises:
+        ValueError: 样本的时间早于前一个样本
+    """
+    ts = array(_U32)
+    hr = array('H')
+    start = 0
+    last = None
+    for i, (t, h) in enumerate(samples):
+        if last is not None and t < last:
+            raise ValueError(f"第 {i} 个样本的时间早于前一个样本")
+        last = t
+        if not ts:
+            start = t
+        ts.append(t - start)
+        hr.append(h)
+        if len(ts) == block_size:
+            yield start, start + ts[-1], len(ts), min(hr), max(hr), sum(hr), _to_blob(ts), _to_blob(hr)
+            ts = array(_U32)
+            hr = array('H')
+    if ts:
+        yield start, start + ts[-1], len(ts), min(hr), max(hr), sum(hr), _to_blob(ts), _to_blob(hr)
+
+class SessionCatalog:
+    """会话目录(只在创建它的线程中使用)"""
+    def __init__(self, path: str = CATALOG_FILE):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        # WAL模式下读取不阻塞写入, 写入只追加日志
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def add_session(self, samples: Iterable[tuple[int, int]], device: str = "", source: Optional[str] = None,
+                    block_size: int = BLOCK_SIZE, replace: bool = False) -> Optional[int]:
+        """
+        添加一个会话, 样本按时间顺序流式写入
+
+        Args:
+            samples: (Unix毫秒, 心率), 例如 HeartRateStore.samples()
+            device: 设备地址
+            source: 来源文件, 同一来源只能添加一次
+            replace: 先删除同一来源的会话(来源文件被覆盖时)
+
+        Returns:
+            会话ID, 没有样本时为None
+        """
+        return self.add_blocks(_blocks(samples, block_size), device, source, replace=replace)
+
+    def add_blocks(self, blocks: Iterable[tuple], device: str = "", source: Optional[str] = None,
+                   batch: int = BATCH_BLOCKS, replace: bool = False) -> Optional[int]:
+        """添加已分块编码的会话, 每 batch 块提交一次事务"""
+        if replace and source is not None:
+            for (session_id,) in self.conn.execute("SELECT id FROM sessions WHERE source=?", (source,)).fetchall():
+                self.remove(session_id)
+        with self.conn:
+            session_id = self.conn.execute(
+                "INSERT INTO sessions (device, source, start_ms, end_ms, count, created_ms) VALUES (?, ?, 0, 0, 0, ?)"
+                ,(device, source, int(time.time() * 1000))).lastrowid
+        start_ms = end_ms = None
+        count = hr_sum = 0
+        hr_min = hr_max = None
+        pending = []
+        try:
+            for block in blocks:
+                b_start, b_end, b_count, b_min, b_max, b_sum, ts, hr = block
+                pending.append((session_id, b_start, b_end, b_count, b_min, b_max, ts, hr))
+                start_ms = b_start if start_ms is None else start_ms
+                end_ms = b_end
+                count += b_count
+                hr_sum += b_sum
+                hr_min = b_min if hr_min is None else min(hr_min, b_min)
+                hr_max = b_max if hr_max is None else max(hr_max, b_max)
+                if len(pending) >= batch:
+                    self._insert_blocks(pending)
+                    pending = []
+            self._insert_blocks(pending)
+            if not count:
+                self.remove(session_id)
+                return None
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE sessions SET start_ms=?, end_ms=?, count=?, hr_min=?, hr_max=?, hr_avg=? WHERE id=?"
+                    ,(start_ms, end_ms, count, hr_min, hr_max, hr_sum / count, session_id))
+        except BaseException:
+            # 不保留写了一半的会话
+            self.remove(session_id)
+            raise
+        return session_id
+
+    def _insert_blocks(self, rows: list):
+        if rows:
+            with self.conn:
+                self.conn.executemany("INSERT INTO blocks VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def remove(self, session_id: int):
+        with self.conn:
+            self.conn.execute("DELETE FROM blocks WHERE session_id=?", (session_id,))
+            self.conn.execute("DELETE FROM sessions WHERE id=?", (session_id,))
+
+    def has_source(self, source: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM sessions WHERE source=?", (source,)).fetchone() is not None
+
+    def sources(self) -> set[str]:
+        return {row[0] for row in self.conn.execute("SELECT source FROM sessions WHERE source IS NOT NULL")}
+
+    def find_sessions(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+                      device: Optional[str] = None, min_hr_max: Optional[int] = None,
+                      limit: int = 0) -> list[dict]:
+        """
+        查找与时间范围重叠的会话, 按开始时间排序
+
+        Args:
+            start_ms / end_ms: 时间范围(Unix毫秒), None表示不限
+            device: 设备地址
+            min_hr_max: 最大心率不低于该值
+            limit: 最多返回的数量, 0表示不限
+        """
+        where = ["count > 0"]
+        params = []
+        if end_ms is not None:
+            where.append("start_ms < ?")
+            params.append(end_ms)
+        if start_ms is not None:
+            where.append("end_ms >= ?")
+            params.append(start_ms)
+        if device is not None:
+            where.append("device = ?")
+            params.append(device)
+        if min_hr_max is not None:
+            where.append("hr_max >= ?")
+            params.append(min_hr_max)
+        sql = f"SELECT {', '.join(SESSION_COLUMNS)} FROM sessions WHERE {' AND '.join(where)} ORDER BY start_ms"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def samples(self, session_id: int, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> Iterator[tuple[int, int]]:
+        """
+        读取会话中时间范围内的样本(只读取与范围重叠的块)
+
+        Yields:
+            (Unix毫秒, 心率)
+        """
+        sql = "SELECT start_ms, ts, hr FROM blocks WHERE session_id=?"
+        params = [session_id]
+        if end_ms is not None:
+            sql += " AND start_ms < ?"
+            params.append(end_ms)
+        if start_ms is not None:
+            sql += " AND end_ms >= ?"
+            params.append(start_ms)
+        for b_start, ts, hr in self.conn.execute(sql + " ORDER BY start_ms", params).fetchall():
+            for t, h in zip(_from_blob(_U32, ts), _from_blob('H', hr)):
+                t += b_start
+                if (start_ms is None or t >= start_ms) and (end_ms is None or t < end_ms):
+                    yield t, h
+
+class CatalogSink:
+    """
+    记录时收集样本, 关闭时作为一个会话写入会话目录
+
+    样本保存在紧凑数组中(每个样本10字节), 与 headless 中的输出有相同的 write/close 接口
+    """
+    def __init__(self, path: str = CATALOG_FILE, device: str = "", source: Optional[str] = None):
+        self.path = path
+        self.device = device
+        self.source = source
+        self.session_id: Optional[int] = None
+        self._ts = array('q')
+        self._hr = array('H')
+
+    def write(self, epoch_ms: int, heart_rate: int):
+        self._ts.append(epoch_ms)
+        self._hr.append(heart_rate)
+
+    def close(self):
+        if not self._ts:
+            return
+        try:
+            with SessionCatalog(self.path) as catalog:
+                self.session_id = catalog.add_session(zip(self._ts, self._hr), self.device, self.source)
+            logger.info(f"已添加到会话目录: {self.device} 共 {len(self._ts)} 个样本")
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"无法添加到会话目录 {self.path}: {e}")
+        self._ts = array('q')
+        self._hr = array('H')
+
+# headless 为多个设备分别输出时加在文件名后的设备地址: data_AABBCCDDEEFF.csv
+_NAME_ADDRESS = re.compile(r"_([0-9A-Fa-f]{12})$")
+
+def device_from_name(path: str) -> str:
+    """从文件名中取设备地址, 没有时为空字符串"""
+    match = _NAME_ADDRESS.search(os.path.splitext(os.path.basename(path))[0])
+    if not match:
+        return ""
+    text = match.group(1).upper()
+    return ":".join(text[i:i + 2] for i in range(0, 12, 2))
+
+def _load_csv(path: str, block_size: int) -> tuple[str, list[tuple]]:
+    """在子进程中读取并编码CSV文件"""
+    from sessionfile import read_csv
+    timestamps, heart_rates = read_csv(path)
+    return path, list(_blocks(zip(timestamps, heart_rates), block_size))
+
+def _expand(paths: Iterable[str]) -> list[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if name.lower().endswith(".csv"))
+        else:
+            files.append(path)
+    return [os.path.abspath(f) for f in files]
+
+def import_csv(paths: Iterable[str], catalog_path: str = CATALOG_FILE, workers: Optional[int] = None,
+               progress: Optional[Callable[[str, Optional[int]], None]] = None, device: str = "") -> int:
+    """
+    把界面保存的CSV文件导入会话目录, 已导入的文件会被跳过
+
+    文件在进程池中并行解析和编码, 由当前进程统一写入数据库(SQLite只允许一个写入者).
+    所有平台都用 spawn 方式启动子进程, 与 Windows 上的行为一致
+
+    Args:
+        paths: CSV文件或包含CSV文件的目录
+        workers: 进程数, 默认为CPU核心数
+        progress: progress(文件, 会话ID), 每处理完一个文件调用一次, 失败时会话ID为None
+        device: 设备地址, 为空时从文件名中取(见 device_from_name)
+
+    Returns:
+        导入的会话数
+    """
+    imported = 0
+    with SessionCatalog(catalog_path) as catalog:
+        known = catalog.sources()
+        files = [f for f in dict.fromkeys(_expand(paths)) if f not in known]
+        if not files:
+            return 0
+        # spawn 的子进程不继承日志, 先创建日志再导入本模块(本模块导入时需要 system_utils.logger)
+        from system_utils import console_logger
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=console_logger) as pool:
+            futures = {pool.submit(_load_csv, f, BLOCK_SIZE): f for f in files}
+            for future in as_completed(futures):
+                path = futures[future]
+                session_id = None
+                try:
+                    _, blocks = future.result()
+                except Exception as e:
+                    # 子进程中的错误(包括子进程异常退出导致进程池不可用)只影响这个文件
+                    logger.warning(f"无法导入 {path}: {e!r}")
+                else:
+                    try:
+                        session_id = catalog.add_blocks(blocks, device or device_from_name(path), path)
+                        if session_id is not None:
+                            imported += 1
+                    except sqlite3.Error as e:
+                        logger.warning(f"无法导入 {path}: {e}")
+                if progress:
+                    progress(path, session_id)
+    return imported
@@ -0,0 +1,76 @@
+# 依赖包清单: 编译时生成 depmanifest.py, 运行时直接读取
+
+import re
+from importlib.metadata import distribution, PackageNotFoundError
+
+__all__ = ["collect_packages", "load_packages", "packages_logtext", "write_manifest"]
+
+# 程序直接使用的依赖包, 清单中还会包含它们依赖的包
+ROOT_PACKAGES = ("bleak", "PyQt5", "PyQt5-Qt5", "PyQt5_sip", "qasync", "winrt-runtime", "numpy", "pyinstaller")
+
+_REQ_NAME = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
+
+def _license(meta) -> str:
+    text = (meta.get('License-Expression') or meta.get('License') or "").strip()
+    if text:
+        # 部分包会把整篇许可证写在这里
+        return text.splitlines()[0][:60]
+    for classifier in meta.get_all('Classifier') or []:
+        if classifier.startswith("License ::"):
+            return classifier.split("::")[-1].strip()
+    return "Unknown"
+
+def collect_packages(roots=ROOT_PACKAGES) -> list[tuple[str, str, str]]:
+    """
+    收集依赖包信息(会读取已安装包的元数据, 较慢)
+
+    Returns:
+        [(包名, 版本号, 开源许可证), ...]
+    """
+    result = {}
+    pending = list(roots)
+    while pending:
+        name = pending.pop()
+        key = name.lower().replace("_", "-")
+        if key in result:
+            continue
+        try:
+            dist = distribution(name)
+        except PackageNotFoundError:
+            continue
+        result[key] = (dist.name, dist.version, _license(dist.metadata))
+        for req in dist.requires or []:
+            # 跳过可选依赖
+            if "extra ==" in req:
+                continue
+            m = _REQ_NAME.match(req)
+            if m:
+                pending.append(m.group(1))
+    return sorted(result.values(), key=lambda p: p[0].lower())
+
+def load_packages() -> list[tuple[str, str, str]]:
+    """读取编译时生成的依赖包清单, 不存在时现场收集"""
+    try:
+        from depmanifest import PACKAGES
+        return list(PACKAGES)
+    except ImportError:
+        return collect_packages()
+
+def packages_logtext(packages: list[tuple[str, str, str]]) -> str:
+    rows = [("包名 == 版本号", "开源许可证")] + [(f"{n} == {v}", lic) for n, v, lic in packages]
+    max_len = max(len(r[0]) for r in rows)
+    return "\n  ".join(f"{nv:<{max_len+2}}-{lic}" for nv, lic in rows)
+
+def write_manifest(path: str = "depmanifest.py"):
+    """生成依赖包清单模块(编译前运行)"""
+    packages = collect_packages()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# 由 deps.write_manifest 自动生成, 请勿手动修改\n")
+        f.write("PACKAGES = [\n")
+        for p in packages:
+            f.write(f"    {p!r},\n")
+        f.write("]\n")
+    return packages
+
+if __name__ == "__main__":
+    print(packages_logtext(write_manifest()))
@@ -0,0 +1,291 @@
+# 无界面记录模式: python -m HRMLink record --address XX:XX:XX:XX:XX:XX [--address ...] [--out 文件]
+# 记录结束时每个设备的数据作为一个会话添加到会话目录(--no-catalog 不添加)
+# 会话目录: python -m HRMLink catalog import [CSV文件或目录 ...] / catalog query [--since 日期] [--min-max-hr 170]
+# 只使用 asyncio, 不导入 Qt
+
+import os
+import sys
+import time
+import struct
+import asyncio
+import logging
+import argparse
+import datetime
+
+__all__ = ["main", "record", "catalog_main", "open_sink", "open_sinks", "StdoutSink", "CsvSink", "BinarySink"]
+
+FORMAT_STDOUT = "stdout"
+FORMAT_CSV = "csv"
+FORMAT_BIN = "bin"
+
+class StdoutSink:
+    """每个样本输出一行: 时间<TAB>心率, 多个设备时为 时间<TAB>设备地址<TAB>心率"""
+    def __init__(self, stream=None, tagged: bool = False):
+        self.stream = stream or sys.stdout
+        self.tagged = tagged
+
+    def write(self, epoch_ms: int, heart_rate: int, address: str = ""):
+        t = datetime.datetime.fromtimestamp(epoch_ms / 1000).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+        if self.tagged:
+            self.stream.write(f"{t}\t{address}\t{heart_rate}\n")
+        else:
+            self.stream.write(f"{t}\t{heart_rate}\n")
+        self.stream.flush()
+
+    def close(self):
+        pass
+
+class CsvSink:
+    """与界面中保存的文件格式相同: 时间,心率(BPM)"""
+    def __init__(self, path: str):
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", encoding="utf-8-sig" if new else "utf-8", newline="")
+        if new:
+            self.file.write("时间,心率(BPM)\n")
+        self._last_s = None
+        self._text = ""
+
+    def write(self, epoch_ms: int, heart_rate: int):
+        s = epoch_ms // 1000
+        if s != self._last_s:
+            self._text = datetime.datetime.fromtimestamp(s).strftime("%Y-%m-%d %H:%M:%S")
+            self._last_s = s
+        self.file.write(f"{self._text},{heart_rate}\n")
+
+    def close(self):
+        self.file.close()
+
+class BinarySink:
+    """定长记录: <int64 Unix毫秒, uint16 心率> 小端"""
+    RECORD = struct.Struct("<qH")
+
+    def __init__(self, path: str):
+        self.file = open(path, "ab")
+
+    def write(self, epoch_ms: int, heart_rate: int):
+        self.file.write(self.RECORD.pack(epoch_ms, heart_rate))
+
+    def close(self):
+        self.file.close()
+
+def open_sink(fmt: str, out: str | None):
+    """根据格式创建输出; 未指定格式时按文件扩展名判断"""
+    if fmt is None:
+        if out is None or out == "-":
+            fmt = FORMAT_STDOUT
+        else:
+            fmt = FORMAT_BIN if out.lower().endswith(".bin") else FORMAT_CSV
+    if fmt == FORMAT_STDOUT:
+        return StdoutSink()
+    if out is None or out == "-":
+        raise ValueError(f"{fmt} 格式需要指定 --out 文件")
+    return CsvSink(out) if fmt == FORMAT_CSV else BinarySink(out)
+
+async def record(addresses: list[str], sinks: dict, retry: float = 5.0, duration: float = 0, flush_interval: float = 1.0,
+                 catalog: str | None = None) -> int:
+    """
+    同时连接多个设备并持续记录, 断开后自动重连
+
+    Args:
+        addresses: 设备地址
+        sinks: 设备地址 -> 输出(write/close), 多个设备可以共用一个输出
+        retry: 重连的最长等待时间(秒), 按指数退避增长到该值
+        duration: 记录时长(秒), 0表示一直记录
+        flush_interval: 写入文件的间隔(秒)
+        catalog: 会话目录数据库, 结束时每个设备的记录作为一个会话写入, None表示不写入
+
+    Returns:
+        记录的样本数
+    """
+    from system_utils import logger
+    from Blegetheartbeat import MultiDeviceMonitor, ReconnectPolicy, LINK_RECONNECTING, LINK_CONNECTED
+
+    # 无界面模式只需要保留最近的数据, 样本实时写入输出
+    monitor = MultiDeviceMonitor(capacity=3600)
+    count = 0
+    # 所有设备都停止记录时结束
+    active = set(addresses)
+    stopped = asyncio.Event()
+    outputs = list({id(sink): sink for sink in sinks.values()}.values())
+    catalog_sinks = {}
+    if catalog:
+        from catalog import CatalogSink
+        catalog_sinks = {a: CatalogSink(catalog, a) for a in addresses}
+
+    def on_sample(address: str, epoch_ms: int, heart_rate: int):
+        nonlocal count
+        sink = sinks[address]
+        if isinstance(sink, StdoutSink):
+            sink.write(epoch_ms, heart_rate, address)
+        else:
+            sink.write(epoch_ms, heart_rate)
+        if catalog_sinks:
+            catalog_sinks[address].write(epoch_ms, heart_rate)
+        count += 1
+
+    def on_state(address: str, state: str, old: str):
+        # 放弃重连(例如设备不再提供心率服务)时该设备停止记录
+        if old == LINK_RECONNECTING and state != LINK_CONNECTED:
+            finish(address)
+
+    def finish(address: str):
+        active.discard(address)
+        if not active:
+            stopped.set()
+
+    monitor.subscribe(on_sample)
+    monitor.state_callback = on_state
+
+    async def flush_loop():
+        files = [f for f in (getattr(sink, "file", None) for sink in outputs) if f is not None]
+        while files:
+            await asyncio.sleep(flush_interval)
+            for f in files:
+                f.flush()
+
+    async def start(address: str):
+        session = monitor.session(address)
+        # 断开后由会话自动重连, 不限次数
+        session.reconnect_policy = ReconnectPolicy(cap=retry, max_attempts=0)
+        # 首次连接同样按退避策略重试
+        for delay in session.reconnect_policy.attempts():
+            try:
+                success, text = await monitor.connect(address)
+            except Exception as e:
+                logger.warning(f"连接 {address} 失败: {e}, {delay:.1f} 秒后重试")
+                await asyncio.sleep(delay)
+                continue
+            logger.info(text.format(device_address=address))
+            if not success:
+                finish(address)
+            return
+
+    async def run():
+        await asyncio.gather(*(start(a) for a in addresses))
+        await stopped.wait()
+
+    flusher = asyncio.ensure_future(flush_loop())
+    try:
+        if duration > 0:
+            try:
+                await asyncio.wait_for(run(), duration)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await run()
+    finally:
+        flusher.cancel()
+        try:
+            await monitor.disconnect_all()
+        except Exception as e:
+            logger.warning(f"断开连接时出错: {e}")
+        for sink in outputs:
+            sink.close()
+        for sink in catalog_sinks.values():
+            sink.close()
+        for address, session in monitor.sessions.items():
+            for hist in (session.first_beat_latency, session.reconnect_latency, session.recover_latency):
+                if hist.count:
+                    logger.info(f"[{address}] {hist.summary()}")
+    return count
+
+def open_sinks(fmt: str | None, out: str | None, addresses: list[str]) -> dict:
+    """
+    为每个设备创建输出
+
+    多个设备输出到文件时每个设备一个文件, 文件名后加上设备地址; 输出到标准输出时每行带上设备地址
+    """
+    if len(addresses) == 1:
+        return {addresses[0]: open_sink(fmt, out)}
+    if fmt == FORMAT_STDOUT or (fmt is None and (out is None or out == "-")):
+        sink = StdoutSink(tagged=True)
+        return {a: sink for a in addresses}
+    if out is None or out == "-":
+        raise ValueError(f"{fmt} 格式需要指定 --out 文件")
+    stem, ext = os.path.splitext(out)
+    return {a: open_sink(fmt, f"{stem}_{a.replace(':', '')}{ext}") for a in addresses}
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="HRMLink", description="无界面心率记录")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="连接设备并记录心率")
+    rec.add_argument("--address", required=True, action="append", help="设备地址, 可以指定多次以同时记录多个设备")
+    rec.add_argument("--out", default=None, help="输出文件, 不指定或为 - 时输出到标准输出; 多个设备时每个设备一个文件")
+    rec.add_argument("--format", choices=(FORMAT_STDOUT, FORMAT_CSV, FORMAT_BIN), default=None, help="输出格式, 默认按 --out 的扩展名判断")
+    rec.add_argument("--retry", type=float, default=5.0, help="重连的最长等待时间(秒)")
+    rec.add_argument("--duration", type=float, default=0, help="记录时长(秒), 0表示一直记录")
+    rec.add_argument("--db", default=None, help="会话目录数据库, 默认为程序目录下的 sessions.db")
+    rec.add_argument("--no-catalog", action="store_true", help="不把记录添加到会话目录")
+    rec.add_argument("-v", "--verbose", action="store_true", help="输出调试日志")
+
+    cat = sub.add_parser("catalog", help="管理会话目录")
+    cat.add_argument("--db", default=None, help="会话目录数据库, 默认为程序目录下的 sessions.db")
+    cat.add_argument("-v", "--verbose", action="store_true", help="输出调试日志")
+    action = cat.add_subparsers(dest="action", required=True)
+    imp = action.add_parser("import", help="导入保存的CSV文件")
+    imp.add_argument("paths", nargs="*", default=["./autosave"], help="CSV文件或目录, 默认为 ./autosave")
+    imp.add_argument("--workers", type=int, default=None, help="并行解析的进程数, 默认为CPU核心数")
+    imp.add_argument("--device", default="", help="设备地址, 默认从文件名中取(多设备记录时文件名后的地址)")
+    query = action.add_parser("query", help="查找会话")
+    query.add_argument("--since", type=_parse_time, default=None, help="开始时间, 例如 2024-01-01 或 \"2024-01-01 08:00\"")
+    query.add_argument("--until", type=_parse_time, default=None, help="结束时间")
+    query.add_argument("--device", default=None, help="设备地址")
+    query.add_argument("--min-max-hr", type=int, default=None, help="最大心率不低于该值")
+    return parser
+
+def _parse_time(text: str) -> int:
+    """日期时间文本转换为Unix毫秒"""
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return int(datetime.datetime.strptime(text, fmt).timestamp() * 1000)
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"无法识别的时间: {text}")
+
+def catalog_main(args, logger) -> int:
+    from catalog import SessionCatalog, import_csv, CATALOG_FILE
+    db = args.db or CATALOG_FILE
+    if args.action == "import":
+        start = time.perf_counter()
+        count = import_csv(args.paths, db, args.workers,
+                           progress=lambda path, sid: logger.debug(f"{path} -> {sid}"), device=args.device)
+        logger.info(f"导入了 {count} 个会话, 用时 {time.perf_counter() - start:.1f} 秒")
+        return 0
+    with SessionCatalog(db) as catalog:
+        sessions = catalog.find_sessions(args.since, args.until, args.device, args.min_max_hr)
+    fmt = lambda ms: datetime.datetime.fromtimestamp(ms / 1000).strftime("%Y-%m-%d %H:%M:%S")
+    for s in sessions:
+        print(f"{s['id']}\t{fmt(s['start_ms'])}\t{fmt(s['end_ms'])}\t{s['device']}\t{s['count']}\t"
+              f"{s['hr_min']}/{s['hr_avg']:.0f}/{s['hr_max']}\t{s['source'] or ''}")
+    logger.info(f"共 {len(sessions)} 个会话")
+    return 0
+
+def main(argv: list[str] | None = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    from system_utils import console_logger
+    logger = console_logger(logging.DEBUG if args.verbose else logging.INFO)
+
+    if args.command == "catalog":
+        return catalog_main(args, logger)
+
+    try:
+        # 去掉重复的地址, 保持顺序
+        addresses = list(dict.fromkeys(args.address))
+        sinks = open_sinks(args.format, args.out, addresses)
+    except (ValueError, OSError) as e:
+        logger.error(f"无法打开输出: {e}")
+        return 2
+
+    try:
+        from catalog import CATALOG_FILE
+        catalog = None if args.no_catalog else args.db or CATALOG_FILE
+        count = asyncio.run(record(addresses, sinks, args.retry, args.duration, catalog=catalog))
+    except KeyboardInterrupt:
+        logger.info("已停止记录")
+        return 0
+    logger.info(f"共记录 {count} 个样本")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,485 @@
+import time
+import math
+import datetime
+from array import array
+from collections import deque
+from typing import Iterator
+
+__all__ = ["HeartRateStore", "HeartRateStats", "WindowStats", "HeartRateRollups", "RollupTier"
+    ,"SPILL_OVERWRITE", "SPILL_DROP", "SPILL_GROW", "ROLLUP_SPANS", "SAMPLE_INTERVAL_MS"]
+
+# 存储写满后的处理策略
+SPILL_OVERWRITE = "overwrite" # 覆盖最旧的数据(环形缓冲)
+SPILL_DROP = "drop"           # 丢弃新数据
+SPILL_GROW = "grow"           # 容量翻倍后继续写入
+SPILL_POLICIES = (SPILL_OVERWRITE, SPILL_DROP, SPILL_GROW)
+
+# 汇总级别的桶宽(毫秒): 1秒, 10秒, 1分钟, 10分钟
+ROLLUP_SPANS = (1000, 10_000, 60_000, 600_000)
+# 预计的采样间隔(毫秒): 心率设备通常每秒通知一次
+SAMPLE_INTERVAL_MS = 1000
+
+# uint32 在部分平台上是 'I', 在部分平台上是 'L'
+_U32 = 'I' if array('I').itemsize == 4 else 'L'
+
+class HeartRateStore:
+    """定长心率样本存储
+
+    时间戳保存为相对会话起点的单调时钟毫秒数(uint32), 心率保存为uint16,
+    每个样本占用6字节. 底层数组只会被整体替换而不会原地改变大小,
+    所以通过 segments() 拿到的内存视图在之后的写入中始终有效
+    """
+    def __init__(self, capacity: int = 24*3600*4, spill: str = SPILL_OVERWRITE, chunk: int = 4096,
+                 rollup_spans: tuple[int, ...] = ROLLUP_SPANS, sample_interval_ms: int = SAMPLE_INTERVAL_MS):
+        """
+        Args:
+            capacity: 最大样本数量
+            spill: 写满后的处理策略(overwrite/drop/grow)
+            chunk: 初始分配的样本数量, 之后按需翻倍直到 capacity
+            rollup_spans: 同时维护的汇总级别(桶宽毫秒), 为空时不汇总
+            sample_interval_ms: 预计的采样间隔(毫秒), 用于计算各汇总级别的桶数, 见 HeartRateRollups
+        """
+        if spill not in SPILL_POLICIES:
+            raise ValueError(f"未知的溢出策略: {spill}")
+        if capacity <= 0:
+            raise ValueError("容量必须大于0")
+        self.capacity = capacity
+        self.spill = spill
+        self._chunk = max(1, min(chunk, capacity))
+        self.dropped = 0
+        # 汇总与原始样本覆盖同样的时间, 容量可增长时不限制
+        self.rollups = HeartRateRollups(rollup_spans, 0 if spill == SPILL_GROW else capacity,
+                                        sample_interval_ms) if rollup_spans else None
+        self.clear()
+
+    def clear(self):
+        """清空数据并重置会话起点"""
+        self._ts = array(_U32, bytes(4 * self._chunk))
+        self._hr = array('H', bytes(2 * self._chunk))
+        self._alloc = self._chunk
+        self._head = 0
+        self._len = 0
+        self.dropped = 0
+        self._t0_mono = time.monotonic_ns()
+        self._t0_wall = time.time_ns() // 1_000_000
+        if self.rollups is not None:
+            self.rollups.clear()
+
+    def _reserve(self, size: int):
+        """换用更大的数组, 旧数组(和它的视图)保持不变"""
+        ts = array(_U32, bytes(4 * size))
+        hr = array('H', bytes(2 * size))
+        n = self._len
+        ts[0:n] = self._ts[0:n]
+        hr[0:n] = self._hr[0:n]
+        self._ts, self._hr, self._alloc = ts, hr, size
+
+    def append(self, heart_rate: int, mono_ns: int = None) -> bool:
+        """
+        写入一个样本
+
+        Args:
+            heart_rate: 心率值
+            mono_ns: 单调时钟时间(纳秒), 默认为当前时间
+
+        Returns:
+            样本是否被保存
+        """
+        if mono_ns is None:
+            mono_ns = time.monotonic_ns()
+        offset = (mono_ns - self._t0_mono) // 1_000_000
+        n = self._len
+        if n == self._alloc:
+            if n < self.capacity:
+                self._reserve(min(n * 2, self.capacity))
+            elif self.spill == SPILL_GROW:
+                self.capacity *= 2
+                self._reserve(self.capacity)
+            elif self.spill == SPILL_DROP:
+                # 丢弃的样本不计入汇总
+                self.dropped += 1
+                return False
+            else:
+                # 环形覆盖: 写到最旧的位置上
+                i = self._head
+                self._ts[i] = offset
+                self._hr[i] = heart_rate
+                self._head = (i + 1) % n
+                self.dropped += 1
+                if self.rollups is not None:
+                    self.rollups.push(offset, heart_rate)
+                return True
+        if self.rollups is not None:
+            self.rollups.push(offset, heart_rate)
+        self._ts[n] = offset
+        self._hr[n] = heart_rate
+        self._len = n + 1
+        return True
+
+    def __len__(self) -> int:
+        return self._len
+
+    @property
+    def start_ms(self) -> int:
+        """会话起点的时间(Unix毫秒)"""
+        return self._t0_wall
+
+    @property
+    def nbytes(self) -> int:
+        """已分配的内存大小(字节)"""
+        return self._alloc * 6
+
+    def segments(self) -> list[tuple[memoryview, memoryview]]:
+        """
+        按时间顺序返回数据的零拷贝视图
+
+        Returns:
+            [(时间戳视图, 心率视图), ...], 环形缓冲回绕时为两段
+        """
+        n, h = self._len, self._head
+        ts, hr = memoryview(self._ts), memoryview(self._hr)
+        if h == 0:
+            return [(ts[0:n], hr[0:n])] if n else []
+        return [(ts[h:n], hr[h:n]), (ts[0:h], hr[0:h])]
+
+    def last(self) -> tuple[int, int] | None:
+        """最新的样本(相对毫秒, 心率)"""
+        if not self._len:
+            return None
+        i = (self._head + self._len - 1) % self._alloc
+        return self._ts[i], self._hr[i]
+
+    def epoch_ms(self, offset: int) -> int:
+        """相对毫秒转换为Unix毫秒"""
+        return self._t0_wall + offset
+
+    def mono_to_epoch_ms(self, mono_ns: int) -> int:
+        """单调时钟时间(纳秒)转换为Unix毫秒, 与 append() 中的换算一致"""
+        return self._t0_wall + (mono_ns - self._t0_mono) // 1_000_000
+
+    def samples(self) -> Iterator[tuple[int, int]]:
+        """按时间顺序遍历(Unix毫秒, 心率)"""
+        t0 = self._t0_wall
+        for ts, hr in self.segments():
+            for i in range(len(ts)):
+                yield t0 + ts[i], hr[i]
+
+    def rows(self, fmt: str = "%Y-%m-%d %H:%M:%S") -> Iterator[tuple[str, int]]:
+        """按时间顺序遍历(格式化时间, 心率)"""
+        last_s = None
+        text = ""
+        for ms, hr in self.samples():
+            s = ms // 1000
+            if s != last_s:
+                # 同一秒内的样本复用格式化结果
+                text = datetime.datetime.fromtimestamp(s).strftime(fmt)
+                last_s = s
+            yield text, hr
+
+    def __iter__(self) -> Iterator[tuple[str, int]]:
+        return self.rows()
+
+class RollupTier:
+    """一个汇总级别: 每 span_ms 毫秒一个桶, 保存桶内的最小/最大值, 总和与样本数
+
+    桶按时间顺序追加, 每个样本只更新最新的桶, 开销为O(1);
+    桶数达到容量后覆盖最旧的桶(与 HeartRateStore 的环形覆盖一致)
+    """
+    def __init__(self, span_ms: int, capacity: int = 0):
+        """
+        Args:
+            span_ms: 桶宽(毫秒)
+            capacity: 最大桶数, 0表示不限
+        """
+        self.span_ms = span_ms
+        self.capacity = capacity
+        self.clear()
+
+    def clear(self):
+        # 桶序号(相对会话起点的毫秒数 // span_ms)
+        self._bucket = array(_U32)
+        self._min = array('H')
+        self._max = array('H')
+        self._sum = array(_U32)
+        self._count = array(_U32)
+        # 环形覆盖后最旧的桶的位置
+        self._head = 0
+        # 最新的桶的位置
+        self._last = -1
+
+    def __len__(self) -> int:
+        return len(self._bucket)
+
+    def push(self, offset: int, heart_rate: int):
+        """
+        加入一个样本
+
+        Args:
+            offset: 相对会话起点的毫秒数
+            heart_rate: 心率值
+        """
+        b = offset // self.span_ms
+        i = self._last
+        if i >= 0 and b <= self._bucket[i]:
+            # 同一个桶(时间回退的样本也计入最新的桶)
+            if heart_rate < self._min[i]:
+                self._min[i] = heart_rate
+            if heart_rate > self._max[i]:
+                self._max[i] = heart_rate
+            self._sum[i] += heart_rate
+            self._count[i] += 1
+            return
+        n = len(self._bucket)
+        if not self.capacity or n < self.capacity:
+            self._bucket.append(b)
+            self._min.append(heart_rate)
+            self._max.append(heart_rate)
+            self._sum.append(heart_rate)
+            self._count.append(1)
+            self._last = n
+        else:
+            i = self._head
+            self._bucket[i] = b
+            self._min[i] = self._max[i] = self._sum[i] = heart_rate
+            self._count[i] = 1
+            self._last = i
+            self._head = (i + 1) % n
+
+    def _physical(self, k: int) -> int:
+        return (self._head + k) % len(self._bucket)
+
+    def _find(self, offset: int) -> int:
+        """第一个结束时间晚于 offset 的桶(按时间顺序的序号)"""
+        b = offset // self.span_ms
+        lo, hi = 0, len(self._bucket)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._bucket[self._physical(mid)] < b:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def rows(self, start: int = None, end: int = None) -> Iterator[tuple[int, int, int, float, int]]:
+        """
+        按时间顺序遍历与范围重叠的桶
+
+        Args:
+            start / end: 时间范围(相对会话起点的毫秒数, 含起点不含终点), None表示不限
+
+        Yields:
+            (桶起点毫秒, 最小值, 最大值, 平均值, 样本数)
+        """
+        n = len(self._bucket)
+        lo = 0 if start is None else self._find(start)
+        hi = n if end is None else self._find(end + self.span_ms - 1)
+        for k in range(lo, hi):
+            i = self._physical(k)
+            count = self._count[i]
+            yield self._bucket[i] * self.span_ms, self._min[i], self._max[i], self._sum[i] / count, count
+
+    def columns(self) -> tuple[array, array, array, array, array]:
+        """按时间顺序复制各列: (桶序号, 最小值, 最大值, 总和, 样本数)"""
+        h = self._head
+        columns = [a[h:] + a[:h] for a in (self._bucket, self._min, self._max, self._sum, self._count)]
+        # 在其它线程中复制时, 各列之间可能新增了桶
+        n = min(len(c) for c in columns)
+        return tuple(c[:n] for c in columns)
+
+class HeartRateRollups:
+    """多级汇总(默认1秒/10秒/1分钟/10分钟, 桶宽不超过采样间隔的级别不保留)
+
+    显示或分析长时间的记录时, 选择满足分辨率的最粗的级别,
+    需要处理的桶数只取决于时间范围和分辨率, 与会话长度和采样率无关
+    """
+    def __init__(self, spans: tuple[int, ...] = ROLLUP_SPANS, capacity: int = 0, sample_interval_ms: int = 0):
+        """
+        Args:
+            spans: 各级别的桶宽(毫秒)
+            capacity: 原始样本的容量, 各级别的桶数按覆盖同样的时间计算
+                (capacity * sample_interval_ms / 桶宽), 0表示不限
+            sample_interval_ms: 预计的采样间隔(毫秒). 桶宽不超过采样间隔的级别每个桶只有约一个样本,
+                比原始样本还大, 不保留; 0表示未知, 保留所有级别, 桶数不超过 capacity
+        """
+        self.tiers = []
+        for span in sorted(spans):
+            if span <= sample_interval_ms:
+                continue
+            if capacity and sample_interval_ms:
+                # 多留一个桶: 覆盖的时间跨过桶边界时首尾各占一个桶
+                size = -(-capacity * sample_interval_ms // span) + 1
+            else:
+                size = capacity
+            self.tiers.append(RollupTier(span, size))
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+    def push(self, offset: int, heart_rate: int):
+        for tier in self.tiers:
+            tier.push(offset, heart_rate)
+
+    def pick_tier(self, resolution_ms: int) -> RollupTier | None:
+        """
+        选择桶宽不超过 resolution_ms 的最粗的级别
+
+        Returns:
+            汇总级别, 要求的分辨率比最细的级别还细时为None(应使用原始样本)
+        """
+        chosen = None
+        for tier in self.tiers:
+            if tier.span_ms > resolution_ms:
+                break
+            chosen = tier
+        return chosen
+
+    def tier(self, span_ms: int) -> RollupTier | None:
+        for tier in self.tiers:
+            if tier.span_ms == span_ms:
+                return tier
+        return None
+
+
+class WindowStats:
+    """滑动窗口统计
+
+    用单调队列维护窗口内的最小/最大值, 用整数和/平方和维护均值与方差,
+    每个样本的均摊开销为O(1)
+    """
+    def __init__(self, span_ms: int):
+        self.span = span_ms
+        self.reset()
+
+    def reset(self):
+        self._q = deque()
+        self._min = deque()
+        self._max = deque()
+        self._sum = 0
+        self._sumsq = 0
+        self._now = None
+
+    def push(self, t_ms: int, heart_rate: int):
+        item = (t_ms, heart_rate)
+        self._q.append(item)
+        self._sum += heart_rate
+        self._sumsq += heart_rate * heart_rate
+        while self._min and self._min[-1][1] >= heart_rate:
+            self._min.pop()
+        self._min.append(item)
+        while self._max and self._max[-1][1] <= heart_rate:
+            self._max.pop()
+        self._max.append(item)
+        self._expire(t_ms)
+
+    def _expire(self, now_ms: int):
+        self._now = now_ms
+        cutoff = now_ms - self.span
+        q = self._q
+        while q and q[0][0] <= cutoff:
+            item = q.popleft()
+            self._sum -= item[1]
+            self._sumsq -= item[1] * item[1]
+            if self._min and self._min[0] is item:
+                self._min.popleft()
+            if self._max and self._max[0] is item:
+                self._max.popleft()
+
+    def result(self, now_ms: int = None) -> dict[str, float] | None:
+        """
+        Args:
+            now_ms: 窗口的结束时间, 默认为最后一个样本的时间
+
+        Returns:
+            窗口内的统计数据, 窗口为空时返回None
+        """
+        if now_ms is not None and (self._now is None or now_ms > self._now):
+            self._expire(now_ms)
+        n = len(self._q)
+        if not n:
+            return None
+        mean = self._sum / n
+        return {
+            'min': self._min[0][1],
+            'max': self._max[0][1],
+            'avg': round(mean, 1),
+            'std': round(math.sqrt(max(self._sumsq / n - mean * mean, 0.0)), 2),
+            'count': n
+        }
+
+class HeartRateStats:
+    """会话心率统计
+
+    在每个样本到达时增量更新, 查询开销与会话长度无关.
+    方差使用Welford算法, 时间加权平均把每个心率值持续到下一个样本为止
+    (超过 max_gap_ms 的间隔视为断连, 只计入 max_gap_ms)
+    """
+    WINDOWS = {'1min': 60_000, '5min': 300_000, '15min': 900_000}
+
+    def __init__(self, windows: dict[str, int] = None, max_gap_ms: int = 5000):
+        """
+        Args:
+            windows: 滑动窗口 {名称: 时长(毫秒)}, 传入空字典则不统计窗口
+            max_gap_ms: 时间加权平均中单个样本的最长持续时间
+        """
+        self.max_gap_ms = max_gap_ms
+        self.windows = {name: WindowStats(span) for name, span in (self.WINDOWS if windows is None else windows).items()}
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.min = None
+        self.max = None
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._tw_sum = 0.0
+        self._tw_dur = 0
+        self._last = None
+        for w in self.windows.values():
+            w.reset()
+
+    def push(self, t_ms: int, heart_rate: int):
+        """
+        加入一个样本
+
+        Args:
+            t_ms: 单调时钟毫秒
+            heart_rate: 心率值
+        """
+        self.count += 1
+        if self.min is None or heart_rate < self.min:
+            self.min = heart_rate
+        if self.max is None or heart_rate > self.max:
+            self.max = heart_rate
+        delta = heart_rate - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (heart_rate - self._mean)
+
+        if self._last is not None:
+            lt, lhr = self._last
+            dt = min(max(t_ms - lt, 0), self.max_gap_ms)
+            self._tw_sum += lhr * dt
+            self._tw_dur += dt
+        self._last = (t_ms, heart_rate)
+
+        for w in self.windows.values():
+            w.push(t_ms, heart_rate)
+
+    def result(self) -> dict | None:
+        """
+        Returns:
+            包含最小值、最大值、平均值、标准差、时间加权平均值、数据点数量
+            以及各滑动窗口统计的字典, 如果没有数据则返回None
+        """
+        if not self.count:
+            return None
+        var = self._m2 / (self.count - 1) if self.count > 1 else 0.0
+        return {
+            'min': self.min,
+            'max': self.max,
+            'avg': round(self._mean, 1),
+            'std': round(math.sqrt(var), 2),
+            'tw_avg': round(self._tw_sum / self._tw_dur, 1) if self._tw_dur else round(self._mean, 1),
+            'count': self.count,
+            'windows': {name: w.result() for name, w in self.windows.items()}
+        }
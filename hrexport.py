@@ -0,0 +1,218 @@
+# 心率数据导出: 分块读取存储中的数据并写入文件, 可以在后台线程中运行
+#
+# 按扩展名选择格式: .csv(时间,心率(BPM)) 或 .hrs(会话文件),
+# 再加上 .gz / .xz / .lzma 时写入压缩的CSV, 例如 data.csv.gz;
+# 指定分辨率时CSV按汇总级别输出每个桶的平均/最低/最高心率
+
+import os
+import gzip
+import lzma
+import datetime
+from array import array
+from bisect import bisect_left
+from typing import Callable, Iterator, Optional
+
+from hrdata import SPILL_OVERWRITE
+from sessionfile import SessionWriter, SESSION_EXT, CSV_HEADER, CSV_TIME_FORMAT
+
+ROLLUP_CSV_HEADER = "时间,心率(BPM),最低心率,最高心率,样本数"
+
+__all__ = ["export_store", "store_chunks", "count_range", "open_output", "COMPRESSION_EXTS"]
+
+# 每次处理的样本数
+CHUNK = 65536
+
+# 压缩格式: 扩展名 -> 打开函数
+COMPRESSION_EXTS = {
+     ".gz": lambda path: gzip.open(path, "wb", compresslevel=6)
+    ,".xz": lambda path: lzma.open(path, "wb")
+    ,".lzma": lambda path: lzma.open(path, "wb", format=lzma.FORMAT_ALONE)
+}
+
+# uint32 在部分平台上是 'I', 在部分平台上是 'L'
+_U32 = 'I' if array('I').itemsize == 4 else 'L'
+
+def open_output(path: str, ext: Optional[str] = None):
+    """
+    按扩展名打开(压缩的)二进制输出
+
+    Args:
+        ext: 按该扩展名选择压缩方式, 默认取 path 的扩展名
+    """
+    ext = (ext or os.path.splitext(path)[1]).lower()
+    if ext in COMPRESSION_EXTS:
+        return COMPRESSION_EXTS[ext](path)
+    return open(path, "wb", buffering=1 << 20)
+
+def _ranges(store, start_ms: Optional[int], end_ms: Optional[int]) -> list[tuple[memoryview, memoryview, int, int, int]]:
+    """
+    截取存储当前数据的视图并按时间范围裁剪
+
+    Returns:
+        [(时间戳视图, 心率视图, 起始下标, 结束下标, 该段在存储中的起始序号), ...]
+    """
+    t0 = store.start_ms
+    result = []
+    base = 0
+    for ts, hr in store.segments():
+        n = len(ts)
+        # 时间戳不递减, 可以二分
+        i = 0 if start_ms is None else bisect_left(ts, start_ms - t0)
+        j = n if end_ms is None else bisect_left(ts, end_ms - t0)
+        if i < j:
+            result.append((ts, hr, i, j, base))
+        base += n
+    return result
+
+def count_range(store, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> int:
+    """时间范围内的样本数"""
+    return sum(j - i for _, _, i, j, _ in _ranges(store, start_ms, end_ms))
+
+def store_chunks(store, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+                 chunk: int = CHUNK) -> Iterator[tuple[array, array]]:
+    """
+    分块复制存储中的数据, 每次只复制一块, 不会复制整个存储
+
+    存储可以在遍历时继续写入: 新数据不在本次导出的范围内;
+    环形覆盖时被新数据覆盖的最旧样本会被跳过
+
+    Args:
+        start_ms / end_ms: 时间范围(Unix毫秒, 含起点不含终点), None表示不限
+
+    Yields:
+        (相对 store.start_ms 的毫秒数, 心率)
+    """
+    overwrite = store.spill == SPILL_OVERWRITE
+    dropped = store.dropped
+    for ts, hr, i, j, base in _ranges(store, start_ms, end_ms):
+        while i < j:
+            if overwrite:
+                # 自截取视图以来被覆盖的样本数, 覆盖从最旧的样本开始
+                lost = store.dropped - dropped - base
+                if lost >= j:
+                    break
+                i = max(i, lost)
+            k = min(i + chunk, j)
+            t = array(_U32)
+            h = array('H')
+            # 整块内存复制期间不会释放GIL, 不会读到写了一半的数据
+            t.frombytes(ts[i:k].cast('B'))
+            h.frombytes(hr[i:k].cast('B'))
+            if overwrite:
+                # 检查和复制之间记录线程可能继续覆盖, 复制后再检查一次, 去掉已被新数据覆盖的开头部分
+                lost = store.dropped - dropped - base
+                if lost > i:
+                    del t[:lost - i]
+                    del h[:lost - i]
+            if t:
+                yield t, h
+            i = k
+
+def _csv_lines(t0: int, ts: array, hr: array, cache: list) -> str:
+    last_s, text = cache
+    lines = []
+    for t, h in zip(ts, hr):
+        s = (t0 + t) // 1000
+        if s != last_s:
+            # 同一秒内的样本复用格式化结果
+            text = datetime.datetime.fromtimestamp(s).strftime(CSV_TIME_FORMAT)
+            last_s = s
+        lines.append(f"{text},{h}\n")
+    cache[0], cache[1] = last_s, text
+    return "".join(lines)
+
+def _rollup_lines(t0: int, rows: list) -> str:
+    return "".join(
+        f"{datetime.datetime.fromtimestamp((t0 + t) // 1000).strftime(CSV_TIME_FORMAT)},{mean:.1f},{lo},{hi},{n}\n"
+        for t, lo, hi, mean, n in rows)
+
+def export_store(store, path: str, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+                 progress: Optional[Callable[[int, int], None]] = None,
+                 cancelled: Optional[Callable[[], bool]] = None, chunk: int = CHUNK,
+                 resolution_ms: Optional[int] = None,
+                 tee: Optional[Callable[[array, array], None]] = None) -> Optional[int]:
+    """
+    导出存储中的数据(先写临时文件, 完成后替换)
+
+    Args:
+        store: HeartRateStore
+        path: 输出文件, 按扩展名选择格式和压缩方式
+        start_ms / end_ms: 时间范围(Unix毫秒, 含起点不含终点), None表示不限
+        progress: progress(已写入样本数, 总样本数), 每块调用一次
+        cancelled: 返回True时停止导出并删除临时文件
+        resolution_ms: CSV的时间分辨率(毫秒), 按满足分辨率的最粗的汇总级别输出, None表示输出原始样本
+        tee: tee(相对 store.start_ms 的毫秒数, 心率), 每写入一块原始样本调用一次, 得到的正是导出的样本
+            (记录线程同时写入或覆盖存储时, 再次读取存储得到的数据会不同);
+            按汇总输出时为汇总所覆盖时间范围内的原始样本
+
+    Returns:
+        写入的样本数(按汇总输出时为桶数), 取消时为None
+    """
+    stem, ext = os.path.splitext(path.lower())
+    compression = ext if ext in COMPRESSION_EXTS else ""
+    compressed = bool(compression)
+    if compressed:
+        ext = os.path.splitext(stem)[1]
+    if ext == SESSION_EXT and compressed:
+        raise ValueError("会话文件需要内存映射读取, 不能压缩")
+
+    total = count_range(store, start_ms, end_ms)
+    t0 = store.start_ms
+    done = 0
+    tmp = path + ".tmp"
+    try:
+        if ext == SESSION_EXT:
+            # 会话文件按块写入, 内存中只保留块索引; SessionWriter 自己先写临时文件
+            tmp = None
+            with SessionWriter(path, t0) as writer:
+                for ts, hr in store_chunks(store, start_ms, end_ms, chunk):
+                    if cancelled and cancelled():
+                        return None
+                    writer.write(ts, hr)
+                    if tee:
+                        tee(ts, hr)
+                    done += len(ts)
+                    if progress:
+                        progress(done, total)
+                # 导出全部数据时同时保存汇总
+                rollups = None
+                if store.rollups is not None and start_ms is None and end_ms is None:
+                    rollups = [(tier.span_ms, tier.columns()) for tier in store.rollups.tiers]
+                return writer.finish(rollups)
+        tier = store.rollups.pick_tier(resolution_ms) if resolution_ms and store.rollups is not None else None
+        if tier is not None:
+            # 不限终点时固定到当前最新的样本, 汇总和 tee 使用同样的范围
+            if end_ms is None:
+                last = store.last()
+                end_ms = None if last is None else t0 + last[0] + 1
+            # 桶数只取决于时间范围和分辨率, 一次写入
+            rows = list(tier.rows(None if start_ms is None else start_ms - t0, None if end_ms is None else end_ms - t0))
+            with open_output(tmp, compression or ".csv") as f:
+                f.write((ROLLUP_CSV_HEADER + "\n").encode("utf-8-sig"))
+                f.write(_rollup_lines(t0, rows).encode("utf-8"))
+            if tee:
+                for ts, hr in store_chunks(store, start_ms, end_ms, chunk):
+                    tee(ts, hr)
+            if progress:
+                progress(len(rows), len(rows))
+            os.replace(tmp, path)
+            tmp = None
+            return len(rows)
+        cache = [None, ""]
+        with open_output(tmp, compression or ".csv") as f:
+            f.write((CSV_HEADER + "\n").encode("utf-8-sig"))
+            for ts, hr in store_chunks(store, start_ms, end_ms, chunk):
+                if cancelled and cancelled():
+                    return None
+                f.write(_csv_lines(t0, ts, hr, cache).encode("utf-8"))
+                if tee:
+                    tee(ts, hr)
+                done += len(ts)
+                if progress:
+                    progress(done, total)
+        os.replace(tmp, path)
+        tmp = None
+        return done
+    finally:
+        if tmp is not None and os.path.exists(tmp):
+            os.remove(tmp)
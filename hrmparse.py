@@ -0,0 +1,187 @@
+"""心率测量(0x2A37)数据解析"""
+import struct
+from array import array
+from typing import Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+__all__ = ["HeartRateMeasurement", "MeasurementBatch", "parse_measurement", "parse_batch"]
+
+# 标志位
+FLAG_HR_UINT16 = 0x01         # 心率值为uint16
+FLAG_CONTACT_DETECTED = 0x02  # 检测到皮肤接触
+FLAG_CONTACT_SUPPORTED = 0x04 # 支持皮肤接触检测
+FLAG_ENERGY = 0x08            # 包含能量消耗字段
+FLAG_RR = 0x10                # 包含RR间期
+
+_U16 = struct.Struct('<H')
+
+class HeartRateMeasurement:
+    """一条心率测量数据"""
+    __slots__ = ("flags", "heart_rate", "contact", "energy", "rr")
+
+    def __init__(self, flags: int, heart_rate: int, contact: bool | None, energy: int | None, rr: tuple[int, ...]):
+        self.flags = flags
+        # 心率(BPM)
+        self.heart_rate = heart_rate
+        # 皮肤接触状态, 设备不支持时为None
+        self.contact = contact
+        # 累计能量消耗(千焦), 不存在时为None
+        self.energy = energy
+        # RR间期, 单位为1/1024秒
+        self.rr = rr
+
+    @property
+    def rr_ms(self) -> list[float]:
+        """RR间期(毫秒)"""
+        return [v * 1000 / 1024 for v in self.rr]
+
+    def __repr__(self):
+        return (f"HeartRateMeasurement(heart_rate={self.heart_rate}, contact={self.contact}, "
+                f"energy={self.energy}, rr={self.rr})")
+
+def parse_measurement(data) -> HeartRateMeasurement:
+    """
+    解析一条心率测量数据
+
+    Args:
+        data: 原始数据(bytes/bytearray/memoryview)
+
+    Returns:
+        解析结果
+    """
+    mv = memoryview(data)
+    size = len(mv)
+    if size < 2:
+        raise ValueError(f"心率数据长度不足: {size}")
+    flags = mv[0]
+    if flags & FLAG_HR_UINT16:
+        if size < 3:
+            raise ValueError(f"心率数据长度不足: {size}")
+        heart_rate = _U16.unpack_from(mv, 1)[0]
+        pos = 3
+    else:
+        heart_rate = mv[1]
+        pos = 2
+
+    if flags & FLAG_CONTACT_SUPPORTED:
+        contact = bool(flags & FLAG_CONTACT_DETECTED)
+    else:
+        contact = None
+
+    energy = None
+    if flags & FLAG_ENERGY:
+        if size < pos + 2:
+            raise ValueError(f"心率数据长度不足: {size}")
+        energy = _U16.unpack_from(mv, pos)[0]
+        pos += 2
+
+    rr = ()
+    if flags & FLAG_RR:
+        n = (size - pos) // 2
+        if n:
+            rr = struct.unpack_from(f'<{n}H', mv, pos)
+
+    return HeartRateMeasurement(flags, heart_rate, contact, energy, rr)
+
+class MeasurementBatch:
+    """批量解析结果, 每个字段为一列(有numpy时为ndarray, 否则为array)
+
+    contact 中 -1 表示不支持接触检测, energy 中 -1 表示不存在该字段,
+    rr 为所有数据包的RR间期依次拼接, 每个数据包的数量见 rr_count
+    """
+    __slots__ = ("flags", "heart_rate", "contact", "energy", "rr", "rr_count")
+
+    def __init__(self, flags, heart_rate, contact, energy, rr, rr_count):
+        self.flags = flags
+        self.heart_rate = heart_rate
+        self.contact = contact
+        self.energy = energy
+        self.rr = rr
+        self.rr_count = rr_count
+
+    def __len__(self):
+        return len(self.heart_rate)
+
+def parse_batch(buffer, lengths: Sequence[int]) -> MeasurementBatch:
+    """
+    批量解析首尾相接的多条心率测量数据
+
+    Args:
+        buffer: 包含所有数据包的缓冲区
+        lengths: 每个数据包的长度
+
+    Returns:
+        按列保存的解析结果
+    """
+    if np is not None:
+        return _parse_batch_numpy(buffer, lengths)
+    return _parse_batch_py(buffer, lengths)
+
+def _parse_batch_numpy(buffer, lengths) -> MeasurementBatch:
+    buf = np.frombuffer(buffer, dtype=np.uint8)
+    lens = np.asarray(lengths, dtype=np.int64)
+    end = np.cumsum(lens)
+    start = end - lens
+    # 先检查长度再按下标读取, 与逐条解析一样抛出ValueError
+    if np.any(lens < 2):
+        raise ValueError(f"第 {int(np.argmax(lens < 2))} 个心率数据长度不足")
+    if len(lens) and end[-1] > len(buf):
+        raise ValueError("数据包长度之和超过缓冲区大小")
+
+    flags = buf[start]
+    wide = (flags & FLAG_HR_UINT16).astype(bool)
+    has_energy = (flags & FLAG_ENERGY).astype(bool)
+    need = 2 + wide + 2 * has_energy
+    if np.any(lens < need):
+        raise ValueError(f"第 {int(np.argmax(lens < need))} 个心率数据长度不足")
+
+    hi = np.where(wide, buf[np.where(wide, start + 2, start)], 0).astype(np.uint16)
+    heart_rate = buf[start + 1].astype(np.uint16) | (hi << 8)
+
+    # 先转换为有符号类型, NumPy 2 中 uint8 与 -1 不能直接混用
+    contact = np.where(flags & FLAG_CONTACT_SUPPORTED, ((flags & FLAG_CONTACT_DETECTED) >> 1).astype(np.int8), np.int8(-1))
+
+    pos = start + 2 + wide
+    epos = np.where(has_energy, pos, start)
+    energy = np.where(
+        has_energy,
+        buf[epos].astype(np.int32) | (buf[np.where(has_energy, epos + 1, start)].astype(np.int32) << 8),
+        -1
+    )
+    pos = pos + 2 * has_energy
+
+    rr_count = np.where(flags & FLAG_RR, (end - pos) // 2, 0)
+    total = int(rr_count.sum())
+    # 把每个RR间期映射到它在缓冲区中的位置
+    first = np.repeat(pos, rr_count)
+    k = np.arange(total) - np.repeat(np.cumsum(rr_count) - rr_count, rr_count)
+    idx = first + 2 * k
+    rr = buf[idx].astype(np.uint16) | (buf[idx + 1].astype(np.uint16) << 8)
+
+    return MeasurementBatch(flags, heart_rate, contact, energy, rr, rr_count)
+
+def _parse_batch_py(buffer, lengths) -> MeasurementBatch:
+    mv = memoryview(buffer)
+    flags = array('B')
+    heart_rate = array('H')
+    contact = array('b')
+    energy = array('l')
+    rr = array('H')
+    rr_count = array('l')
+    pos = 0
+    for n in lengths:
+        m = parse_measurement(mv[pos:pos + n])
+        pos += n
+        flags.append(m.flags)
+        heart_rate.append(m.heart_rate)
+        contact.append(-1 if m.contact is None else int(m.contact))
+        energy.append(-1 if m.energy is None else m.energy)
+        rr.extend(m.rr)
+        rr_count.append(len(m.rr))
+    if pos > len(mv):
+        raise ValueError("数据包长度之和超过缓冲区大小")
+    return MeasurementBatch(flags, heart_rate, contact, energy, rr, rr_count)
@@ -0,0 +1,192 @@
+# 单实例检测: 独占锁文件 + 本地回环套接字转发命令
+
+import os
+import sys
+import socket
+import secrets
+import tempfile
+import threading
+import time
+from typing import Callable
+
+__all__ = ["SingleInstance", "app_instance", "CMD_SHOW", "CMD_CONNECT"]
+
+# 转发给已运行实例的命令
+CMD_SHOW = "show"       # 显示主窗口
+CMD_CONNECT = "connect" # 连接设备, 可带设备地址: "connect AA:BB:CC:DD:EE:FF"
+
+if sys.platform == "win32":
+    import msvcrt
+
+    def _lock(fd: int) -> bool:
+        try:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(fd: int):
+        try:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        except OSError:
+            pass
+else:
+    import fcntl
+
+    def _lock(fd: int) -> bool:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(fd: int):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+class SingleInstance:
+    """单实例服务
+
+    首个实例独占锁文件(进程退出时由系统释放, 不会残留), 并在 127.0.0.1 的随机端口上
+    接收命令, 端口和令牌写在地址文件中; 后启动的实例取锁失败后通过该端口转发命令.
+    (Windows 版 Python 不支持 AF_UNIX, 所以使用回环TCP, 令牌防止发到其它程序)
+    """
+    def __init__(self, name: str = "HRMLink", directory: str | None = None):
+        directory = directory or tempfile.gettempdir()
+        if hasattr(os, "getuid"):
+            # /tmp 为所有用户共用
+            name = f"{name}-{os.getuid()}"
+        self.lock_path = os.path.join(directory, f"{name}.lock")
+        self.addr_path = os.path.join(directory, f"{name}.addr")
+        self.primary = False
+        self._fd: int | None = None
+        self._server: socket.socket | None = None
+        self._token = ""
+
+    def acquire(self, wait: float = 0) -> bool:
+        """
+        尝试成为唯一实例
+
+        Args:
+            wait: 取锁失败时继续重试的时间(秒), 用于等待旧实例退出
+
+        Returns:
+            是否为首个实例
+        """
+        if self.primary:
+            return True
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        deadline = time.monotonic() + wait
+        while not _lock(fd):
+            if time.monotonic() >= deadline:
+                os.close(fd)
+                return False
+            time.sleep(0.05)
+        self._fd = fd
+        self.primary = True
+        return True
+
+    def serve(self, handler: Callable[[str], None]):
+        """
+        开始接收其它实例转发的命令
+
+        Args:
+            handler: handler(command), 在后台线程中调用
+        """
+        if not self.primary or self._server is not None:
+            return
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(("127.0.0.1", 0))
+        server.listen(4)
+        self._server = server
+        self._token = secrets.token_hex(16)
+        tmp = self.addr_path + ".tmp"
+        # 地址文件中有令牌, 和锁文件一样只允许当前用户读写
+        # (先删除残留的临时文件, 否则 O_CREAT 不会修改已有文件的权限)
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(f"{server.getsockname()[1]} {self._token}")
+        os.replace(tmp, self.addr_path)
+        threading.Thread(target=self._serve_loop, args=(server, handler), name="SingleInstance", daemon=True).start()
+
+    def _serve_loop(self, server: socket.socket, handler: Callable[[str], None]):
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                # 已关闭
+                return
+            with conn:
+                try:
+                    conn.settimeout(1.0)
+                    token, _, command = self._readline(conn).partition(" ")
+                    if not secrets.compare_digest(token, self._token):
+                        continue
+                    conn.sendall(b"ok\n")
+                except OSError:
+                    continue
+            try:
+                handler(command)
+            except Exception:
+                # 本模块在创建日志之前导入(启动时先检查单实例), 用到时再取日志
+                from system_utils import logger
+                logger.exception(f"处理其它实例转发的命令 {command!r} 时出错")
+
+    @staticmethod
+    def _readline(conn: socket.socket, limit: int = 4096) -> str:
+        data = b""
+        while not data.endswith(b"\n") and len(data) < limit:
+            chunk = conn.recv(limit)
+            if not chunk:
+                break
+            data += chunk
+        return data.decode("utf-8", "replace").strip()
+
+    def send(self, command: str, timeout: float = 1.0) -> bool:
+        """
+        把命令转发给已运行的实例
+
+        Returns:
+            对方是否已接收
+        """
+        # 对方刚启动时可能还没写入地址文件
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                with open(self.addr_path, encoding="utf-8") as f:
+                    port, token = f.read().split()
+                with socket.create_connection(("127.0.0.1", int(port)), timeout=timeout) as conn:
+                    conn.sendall(f"{token} {command}\n".encode("utf-8"))
+                    return self._readline(conn) == "ok"
+            except (OSError, ValueError):
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.05)
+
+    def release(self):
+        """停止服务并释放锁"""
+        if self._server is not None:
+            try:
+                # 唤醒阻塞在 accept() 上的线程
+                self._server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._server.close()
+            self._server = None
+            try:
+                os.remove(self.addr_path)
+            except OSError:
+                pass
+        if self._fd is not None:
+            _unlock(self._fd)
+            os.close(self._fd)
+            self._fd = None
+        self.primary = False
+
+# 程序的单实例服务, 在 __main__ 中取锁, 由主窗口接收命令
+app_instance = SingleInstance()
@@ -0,0 +1,429 @@
+# 会话日志: 收到的样本实时追加写入磁盘, 程序崩溃或断电后仍可找回
+#
+# 文件位于 basefile/journal/, 每个会话按记录数切分为多个段文件:
+#   <会话开始时间>-<序号>.hrj
+# 段文件 = 16字节文件头 + 若干16字节定长记录, 记录带CRC,
+# 写到一半的尾部记录在下次启动时截掉.
+# 一个样本有多个RR间期时每个RR间期写一条记录, 后续记录的RR字段带 RR_MORE 标记;
+# 正常关闭的会话留下 <会话>.done 标记, 启动时只恢复没有标记的会话
+
+import os
+import time
+import zlib
+import struct
+import atexit
+import datetime
+import threading
+from collections import deque
+from typing import Iterable, Iterator, Optional, Sequence
+
+from system_utils import logger, basefile
+
+__all__ = ["SessionJournal", "JournalSegment", "JOURNAL_DIR", "recover", "read_records", "read_samples"
+    ,"list_segments", "prune", "export_csv", "discard"]
+
+JOURNAL_DIR = os.path.join(basefile, 'journal')
+SEGMENT_EXT = ".hrj"
+CLOSED_EXT = ".done"
+
+MAGIC = b"HRJ1"
+VERSION = 2
+# 可以读取的版本(版本1的每个样本只有一条记录)
+VERSIONS = (1, 2)
+# 文件头: 魔数, 版本, 记录长度, 创建时间(Unix毫秒)
+HEADER = struct.Struct("<4sHHq")
+# 记录: Unix毫秒, 心率, RR间期(毫秒, 没有时为0), 前12字节的CRC32
+RECORD = struct.Struct("<qHHI")
+_BODY = struct.Struct("<qHH")
+# RR字段的最高位: 这条记录是上一条记录所属样本的后续RR间期
+RR_MORE = 0x8000
+RR_MASK = RR_MORE - 1
+
+class JournalSegment:
+    """一个段文件的概要"""
+    __slots__ = ("path", "session", "index", "records", "first_ms", "last_ms")
+
+    def __init__(self, path: str, session: str, index: int, records: int = 0,
+                 first_ms: Optional[int] = None, last_ms: Optional[int] = None):
+        self.path = path
+        # 会话名(会话开始时间)
+        self.session = session
+        self.index = index
+        self.records = records
+        self.first_ms = first_ms
+        self.last_ms = last_ms
+
+    def __repr__(self):
+        return f"JournalSegment({os.path.basename(self.path)!r}, records={self.records})"
+
+def _pack(epoch_ms: int, heart_rate: int, rr_ms: int) -> bytes:
+    body = _BODY.pack(epoch_ms, heart_rate, rr_ms)
+    return body + struct.pack("<I", zlib.crc32(body))
+
+def _unpack(buf, offset: int = 0) -> Optional[tuple[int, int, int]]:
+    """解析一条记录, CRC不符时返回None"""
+    epoch_ms, heart_rate, rr_ms, crc = RECORD.unpack_from(buf, offset)
+    if zlib.crc32(memoryview(buf)[offset:offset + _BODY.size]) != crc:
+        return None
+    return epoch_ms, heart_rate, rr_ms
+
+def _pack_sample(epoch_ms: int, heart_rate: int, rr_ms: Sequence[int]) -> list[bytes]:
+    """一个样本的记录, 每个RR间期一条"""
+    if not rr_ms:
+        return [_pack(epoch_ms, heart_rate, 0)]
+    records = [_pack(epoch_ms, heart_rate, min(rr_ms[0], RR_MASK))]
+    for rr in rr_ms[1:]:
+        records.append(_pack(epoch_ms, heart_rate, RR_MORE | min(rr, RR_MASK)))
+    return records
+
+def _parse_name(path: str) -> Optional[tuple[str, int]]:
+    stem, ext = os.path.splitext(os.path.basename(path))
+    session, _, index = stem.rpartition("-")
+    if ext != SEGMENT_EXT or not session or not index.isdigit():
+        return None
+    return session, int(index)
+
+def list_segments(directory: str = JOURNAL_DIR) -> list[JournalSegment]:
+    """按会话和序号排列的段文件(只读文件名, 不读取内容)"""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    segments = []
+    for name in names:
+        parsed = _parse_name(name)
+        if parsed:
+            segments.append(JournalSegment(os.path.join(directory, name), *parsed))
+    segments.sort(key=lambda s: (s.session, s.index))
+    return segments
+
+def _repair(segment: JournalSegment) -> bool:
+    """
+    截掉段文件尾部不完整或CRC不符的记录, 并读取首尾时间
+
+    Returns:
+        文件是否有效
+    """
+    with open(segment.path, "r+b") as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return False
+        magic, version, size, _ = HEADER.unpack(header)
+        if magic != MAGIC or version not in VERSIONS or size != RECORD.size:
+            return False
+        end = f.seek(0, os.SEEK_END)
+        n = (end - HEADER.size) // RECORD.size
+        # 断电时尾部可能是半条记录或填充的0, 从后往前找到最后一条有效记录
+        last = None
+        while n > 0:
+            f.seek(HEADER.size + (n - 1) * RECORD.size)
+            last = _unpack(f.read(RECORD.size))
+            if last is not None:
+                break
+            n -= 1
+        valid_end = HEADER.size + n * RECORD.size
+        if valid_end != end:
+            f.truncate(valid_end)
+            f.flush()
+            os.fsync(f.fileno())
+            logger.warning(f"会话日志 {os.path.basename(segment.path)} 尾部有 {end - valid_end} 字节不完整, 已截断")
+        segment.records = n
+        if n:
+            f.seek(HEADER.size)
+            first = _unpack(f.read(RECORD.size))
+            segment.first_ms = first[0] if first else None
+            segment.last_ms = last[0]
+    return True
+
+def _closed_path(directory: str, session: str) -> str:
+    return os.path.join(directory, session + CLOSED_EXT)
+
+def recover(directory: str = JOURNAL_DIR, exclude: str = "") -> list[JournalSegment]:
+    """
+    启动时检查之前没有正常关闭的会话日志, 修复断电或崩溃留下的尾部
+
+    Args:
+        directory: 日志目录
+        exclude: 跳过的会话(当前正在写入的会话)
+
+    Returns:
+        有效的段文件
+    """
+    result = []
+    for segment in list_segments(directory):
+        if segment.session == exclude or os.path.exists(_closed_path(directory, segment.session)):
+            continue
+        try:
+            if _repair(segment):
+                result.append(segment)
+            else:
+                logger.warning(f"无法识别的会话日志: {segment.path}")
+        except OSError as e:
+            logger.warning(f"无法检查会话日志 {segment.path}: {e}")
+    return result
+
+def read_records(path: str) -> Iterator[tuple[int, int, int]]:
+    """
+    读取段文件中的记录, 遇到损坏的记录时停止
+
+    Yields:
+        (Unix毫秒, 心率, RR间期毫秒)
+    """
+    with open(path, "rb") as f:
+        magic, version, size, _ = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version not in VERSIONS or size != RECORD.size:
+            raise ValueError(f"不是会话日志文件: {path}")
+        while True:
+            chunk = f.read(RECORD.size * 4096)
+            for offset in range(0, len(chunk) - RECORD.size + 1, RECORD.size):
+                record = _unpack(chunk, offset)
+                if record is None:
+                    return
+                yield record
+            if len(chunk) < RECORD.size * 4096:
+                return
+
+def read_samples(paths: Iterable[str]) -> Iterator[tuple[int, int, tuple[int, ...]]]:
+    """
+    按顺序读取一个会话的段文件, 把同一样本的多条记录合并
+
+    Yields:
+        (Unix毫秒, 心率, RR间期毫秒)
+    """
+    sample = None
+    for path in paths:
+        for epoch_ms, heart_rate, rr_ms in read_records(path):
+            if rr_ms & RR_MORE and sample is not None:
+                sample[2].append(rr_ms & RR_MASK)
+                continue
+            if sample is not None:
+                yield sample[0], sample[1], tuple(sample[2])
+            sample = (epoch_ms, heart_rate, [rr_ms & RR_MASK] if rr_ms else [])
+    if sample is not None:
+        yield sample[0], sample[1], tuple(sample[2])
+
+def export_csv(segments: Iterable[JournalSegment], path: str) -> int:
+    """
+    把一个会话的段文件导出为界面保存的CSV格式(时间,心率(BPM))
+
+    Returns:
+        样本数
+    """
+    from sessionfile import CSV_HEADER, CSV_TIME_FORMAT
+    count = 0
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8-sig", newline="") as f:
+        f.write(CSV_HEADER + "\n")
+        for epoch_ms, heart_rate, _ in read_samples(s.path for s in segments):
+            f.write(f"{datetime.datetime.fromtimestamp(epoch_ms // 1000).strftime(CSV_TIME_FORMAT)},{heart_rate}\n")
+            count += 1
+    os.replace(tmp, path)
+    return count
+
+def discard(segments: Iterable[JournalSegment]):
+    """删除(已导出或不再需要的)段文件"""
+    for segment in segments:
+        try:
+            os.remove(segment.path)
+        except OSError as e:
+            logger.warning(f"无法删除会话日志 {segment.path}: {e}")
+
+def prune(directory: str = JOURNAL_DIR, keep_days: float = 7, exclude: str = "") -> int:
+    """
+    删除超过保留天数的会话日志
+
+    Returns:
+        删除的文件数
+    """
+    deadline = time.time() - keep_days * 86400
+    removed = 0
+    for segment in list_segments(directory):
+        if segment.session == exclude:
+            continue
+        try:
+            if os.path.getmtime(segment.path) < deadline:
+                os.remove(segment.path)
+                removed += 1
+        except OSError as e:
+            logger.warning(f"无法删除会话日志 {segment.path}: {e}")
+    # 没有段文件的关闭标记
+    sessions = {s.session for s in list_segments(directory)}
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        if ext == CLOSED_EXT and stem not in sessions:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+    return removed
+
+class SessionJournal:
+    """会话日志写入器
+
+    append() 只把样本放入队列(由回调所在的线程调用, 不做任何IO),
+    后台线程定时批量写入, 每隔 fsync_interval 秒落盘一次, 按记录数切分段文件.
+    第一个样本到达时才创建文件, 没有数据的会话不留下文件
+
+    recovered_callback(段文件列表) 在后台线程中检查完之前的日志后调用,
+    只在找到没有正常关闭的会话时调用
+    """
+    def __init__(self, directory: str = JOURNAL_DIR, segment_records: int = 65536,
+                 flush_interval: float = 1.0, fsync_interval: float = 5.0, keep_days: float = 7):
+        """
+        Args:
+            directory: 日志目录
+            segment_records: 每个段文件的记录数(默认约1MB)
+            flush_interval: 批量写入的间隔(秒)
+            fsync_interval: 落盘的间隔(秒), 断电时最多丢失这段时间的数据
+            keep_days: 启动时删除超过该天数的旧日志, 0表示不删除
+        """
+        self.directory = directory
+        self.segment_records = segment_records
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.keep_days = keep_days
+        self.session = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        # 启动时检查到的之前的会话日志
+        self.recovered: list[JournalSegment] = []
+        self.recovered_callback = None
+        self.records = 0
+        self._pending: deque = deque()
+        self._wakeup = threading.Event()
+        self._stop = False
+        self._clean = False
+        self._file = None
+        self._index = 0
+        self._segment_count = 0
+        self._last_sync = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def path(self) -> Optional[str]:
+        """当前写入的段文件"""
+        return self._file.name if self._file else None
+
+    def start(self):
+        """启动后台线程(同时检查并清理之前的日志)"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="SessionJournal", daemon=True)
+        self._thread.start()
+        # 程序异常退出时也写入剩余的样本, 但不标记为正常关闭
+        atexit.register(self.close, False)
+
+    def append(self, epoch_ms: int, heart_rate: int, rr_ms: Sequence[int] = ()):
+        """
+        写入一个样本(只入队, 可在任意线程调用)
+
+        Args:
+            rr_ms: 样本中的全部RR间期(毫秒), 每个写一条记录
+        """
+        self._pending.append((epoch_ms, heart_rate, rr_ms))
+
+    def flush(self):
+        """唤醒后台线程立即写入"""
+        self._wakeup.set()
+
+    def close(self, clean: bool = True):
+        """
+        写入剩余的样本并关闭文件
+
+        Args:
+            clean: 标记会话已正常关闭, 下次启动时不再恢复
+        """
+        if self._thread is None:
+            return
+        self._clean = clean
+        self._stop = True
+        self._wakeup.set()
+        self._thread.join(5)
+        self._thread = None
+
+    def _run(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.recovered = recover(self.directory, exclude=self.session)
+            if self.recovered:
+                count = sum(s.records for s in self.recovered)
+                logger.info(f"找到没有正常关闭的会话日志 {len({s.session for s in self.recovered})} 个会话, 共 {count} 条记录")
+                if self.recovered_callback:
+                    self.recovered_callback(self.recovered)
+            if self.keep_days > 0:
+                removed = prune(self.directory, self.keep_days, exclude=self.session)
+                if removed:
+                    logger.info(f"删除了 {removed} 个过期的会话日志")
+        except OSError as e:
+            logger.warning(f"无法检查会话日志目录 {self.directory}: {e}")
+
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            stop = self._stop
+            try:
+                self._write_pending()
+                if stop or time.monotonic() - self._last_sync >= self.fsync_interval:
+                    self._sync()
+            except OSError as e:
+                # 磁盘满等错误时丢弃这一批, 不影响数据采集
+                logger.error(f"写入会话日志失败: {e}")
+                self._close_file()
+            if stop:
+                self._close_file()
+                if self._clean:
+                    self._mark_closed()
+                return
+
+    def _write_pending(self):
+        pending = self._pending
+        while pending:
+            if self._file is None:
+                self._open_segment()
+            room = self.segment_records - self._segment_count
+            buf = bytearray()
+            # 一个样本的记录写在同一段中, 段文件可能略多于 segment_records 条记录
+            while pending and room > 0:
+                records = _pack_sample(*pending.popleft())
+                buf += b"".join(records)
+                room -= len(records)
+            self._file.write(buf)
+            n = len(buf) // RECORD.size
+            self._segment_count += n
+            self.records += n
+            if self._segment_count >= self.segment_records:
+                # 段文件写满, 落盘后换下一个
+                self._sync()
+                self._close_file()
+
+    def _open_segment(self):
+        self._index += 1
+        path = os.path.join(self.directory, f"{self.session}-{self._index:04d}{SEGMENT_EXT}")
+        f = open(path, "wb")
+        f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, time.time_ns() // 1_000_000))
+        self._file = f
+        self._segment_count = 0
+
+    def _sync(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def _mark_closed(self):
+        if self._index:
+            try:
+                with open(_closed_path(self.directory, self.session), "wb"):
+                    pass
+            except OSError as e:
+                logger.warning(f"无法标记会话日志已关闭: {e}")
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
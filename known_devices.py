@@ -0,0 +1,145 @@
+# 已知设备表: 连接过的设备保存在 config.ini 旁的 known_devices.json 中,
+# 启动时可以直接连接, 不必等待扫描
+
+import os
+import json
+import time
+import atexit
+import threading
+from typing import Dict, Optional
+
+from system_utils import logger, basefile
+
+__all__ = ["KnownDevice", "KnownDeviceRegistry", "KNOWN_DEVICES_FILE"]
+
+KNOWN_DEVICES_FILE = os.path.join(basefile, 'known_devices.json')
+
+class KnownDevice:
+    """连接过的设备"""
+    __slots__ = ("address", "name", "rssi", "last_seen", "last_connected", "hr_service")
+
+    def __init__(self, address: str, name: Optional[str] = None, rssi: Optional[int] = None,
+                 last_seen: float = 0.0, last_connected: float = 0.0, hr_service: bool = False):
+        self.address = address
+        self.name = name
+        self.rssi = rssi
+        # Unix时间(秒)
+        self.last_seen = last_seen
+        self.last_connected = last_connected
+        # 是否确认提供心率服务
+        self.hr_service = hr_service
+
+    def to_dict(self) -> dict:
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "KnownDevice":
+        return cls(**{key: data[key] for key in cls.__slots__ if key in data})
+
+class KnownDeviceRegistry:
+    """已知设备表
+
+    连接成功时立即保存; 扫描时的信号强度等信息只在内存中更新, 退出时保存
+    """
+    def __init__(self, path: str = KNOWN_DEVICES_FILE, limit: int = 32):
+        """
+        Args:
+            path: 保存的文件
+            limit: 最多保存的设备数, 超出时删除最久未连接的设备
+        """
+        self.path = path
+        self.limit = limit
+        self.devices: Dict[str, KnownDevice] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.load()
+        atexit.register(self.flush)
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            self.devices = {d["address"]: KnownDevice.from_dict(d) for d in data.get("devices", [])}
+        except FileNotFoundError:
+            self.devices = {}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"无法读取已知设备表 {self.path}: {e}")
+            self.devices = {}
+
+    def save(self):
+        """立即写入文件(先写临时文件再替换)"""
+        with self._lock:
+            text = json.dumps({"version": 1, "devices": [d.to_dict() for d in self.devices.values()]},
+                              ensure_ascii=False, indent=2)
+            self._dirty = False
+        tmpfile = self.path + ".tmp"
+        try:
+            with open(tmpfile, 'w', encoding='utf-8') as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmpfile, self.path)
+        except OSError as e:
+            logger.error(f"保存已知设备表失败: {e}")
+
+    def flush(self):
+        """保存尚未写入的修改"""
+        if self._dirty:
+            self.save()
+
+    def get(self, address: str) -> Optional[KnownDevice]:
+        return self.devices.get(address)
+
+    def preferred(self, address: Optional[str] = None) -> Optional[KnownDevice]:
+        """
+        启动时要连接的设备
+
+        Args:
+            address: 用户选择的设备地址, 是已知设备时优先使用
+
+        Returns:
+            指定的已知设备, 没有时为最近连接的设备
+        """
+        if address is not None and address in self.devices:
+            return self.devices[address]
+        return max(self.devices.values(), key=lambda d: d.last_connected, default=None)
+
+    def hr_addresses(self) -> set[str]:
+        """确认提供心率服务的设备地址"""
+        return {a for a, d in self.devices.items() if d.hr_service}
+
+    def seen(self, address: str, name: Optional[str], rssi: int):
+        """扫描到设备时更新(只更新已知设备)"""
+        device = self.devices.get(address)
+        if device is None:
+            return
+        with self._lock:
+            if name:
+                device.name = name
+            device.rssi = rssi
+            device.last_seen = time.time()
+            self._dirty = True
+
+    def connected(self, address: str, name: Optional[str], rssi: Optional[int] = None, hr_service: bool = True):
+        """连接成功时记录并立即保存"""
+        now = time.time()
+        with self._lock:
+            device = self.devices.get(address)
+            if device is None:
+                device = self.devices[address] = KnownDevice(address)
+            if name:
+                device.name = name
+            if rssi is not None:
+                device.rssi = rssi
+            device.last_seen = device.last_connected = now
+            device.hr_service = hr_service
+            if len(self.devices) > self.limit:
+                oldest = min(self.devices.values(), key=lambda d: d.last_connected)
+                del self.devices[oldest.address]
+        self.save()
+
+    def forget(self, address: str):
+        with self._lock:
+            if self.devices.pop(address, None) is None:
+                return
+        self.save()
@@ -0,0 +1,142 @@
+# 性能统计
+
+import json
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable
+
+__all__ = ["StartupProfiler", "profiler", "LatencyHistogram", "FIRST_PAINT", "BUDGET_EXIT_CODE"]
+
+# 主窗口或浮窗第一次绘制的时间点
+FIRST_PAINT = "首次绘制"
+# 启动耗时超出预算时的返回值
+BUDGET_EXIT_CODE = 3
+
+class StartupProfiler:
+    """记录启动过程中各阶段的耗时"""
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.enabled = False
+        # [(名称, 开始时间(毫秒), 耗时(毫秒))], 时间点的耗时为None
+        self.records: list[tuple[str, float, float | None]] = []
+        self.callback: Callable[[str], None] | None = None
+
+    def _now_ms(self) -> float:
+        return (time.perf_counter() - self.t0) * 1000
+
+    @contextmanager
+    def phase(self, name: str):
+        """记录一个阶段的耗时"""
+        start = self._now_ms()
+        try:
+            yield
+        finally:
+            self.records.append((name, start, self._now_ms() - start))
+
+    def add(self, name: str, start_ms: float, duration_ms: float):
+        """记录在其它线程中测得的阶段"""
+        self.records.append((name, start_ms, duration_ms))
+
+    def mark(self, name: str):
+        """记录一个时间点(同名时间点只记录第一次)"""
+        if any(r[0] == name and r[2] is None for r in self.records):
+            return
+        self.records.append((name, self._now_ms(), None))
+        if self.callback:
+            self.callback(name)
+
+    def elapsed_ms(self) -> float:
+        return self._now_ms()
+
+    def check_budget(self, budget_ms: float, name: str = FIRST_PAINT) -> int:
+        """
+        检查时间点是否在预算内
+
+        Args:
+            budget_ms: 预算(毫秒)
+            name: 时间点名称, 还未记录时按当前时间计算
+
+        Returns:
+            在预算内为0, 超出时为 BUDGET_EXIT_CODE
+        """
+        at = next((r[1] for r in self.records if r[0] == name and r[2] is None), self._now_ms())
+        return BUDGET_EXIT_CODE if at > budget_ms else 0
+
+    def report(self) -> str:
+        lines = ["启动耗时:"]
+        for name, start, duration in sorted(self.records, key=lambda r: r[1]):
+            if duration is None:
+                lines.append(f"  {start:9.1f} ms  * {name}")
+            else:
+                lines.append(f"  {start:9.1f} ms  {name}: {duration:.1f} ms")
+        return "\n".join(lines)
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                 [{"name": n, "start_ms": round(s, 3), "duration_ms": None if d is None else round(d, 3)} for n, s, d in self.records]
+                ,f, ensure_ascii=False, indent=2
+            )
+
+# 程序启动时创建, 时间从导入本模块时开始计算
+profiler = StartupProfiler()
+
+class LatencyHistogram:
+    """延迟直方图(毫秒)
+
+    桶的上界按 1-2-5 序列递增, 记录一次为O(log 桶数), 百分位数按桶上界估计
+    """
+    BOUNDS = (10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000)
+
+    def __init__(self, name: str, bounds: tuple[float, ...] = BOUNDS):
+        self.name = name
+        self.bounds = tuple(bounds)
+        self.reset()
+
+    def reset(self):
+        # 最后一个桶存放超出最大上界的值
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: float | None = None
+        self.max: float | None = None
+
+    def record(self, ms: float):
+        self.counts[bisect_left(self.bounds, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+
+    def percentile(self, p: float) -> float | None:
+        """估计第p百分位数(取所在桶的上界, 不超过最大值)"""
+        if not self.count:
+            return None
+        rank = max(1, round(self.count * p / 100))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+             "name": self.name
+            ,"count": self.count
+            ,"avg_ms": self.total / self.count if self.count else None
+            ,"min_ms": self.min
+            ,"max_ms": self.max
+            ,"p50_ms": self.percentile(50)
+            ,"p90_ms": self.percentile(90)
+            ,"p99_ms": self.percentile(99)
+            ,"buckets": {(f"<={b}" if i < len(self.bounds) else f">{self.bounds[-1]}"): n
+                         for i, (b, n) in enumerate(zip(self.bounds + (self.bounds[-1],), self.counts)) if n}
+        }
+
+    def summary(self) -> str:
+        if not self.count:
+            return f"{self.name}: 无数据"
+        return (f"{self.name}: {self.count} 次, 平均 {self.total / self.count:.0f} ms, "
+                f"p50 {self.percentile(50):.0f} ms, p90 {self.percentile(90):.0f} ms, 最大 {self.max:.0f} ms")
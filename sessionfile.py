@@ -0,0 +1,496 @@
+# 心率会话文件(.hrs): 按列存储的二进制格式, 读取时内存映射, 不需要解析文本
+#
+# 文件布局(小端, 各部分按8字节对齐):
+#   文件头(64字节)
+#   时间列: uint32, 相对会话起点的毫秒数
+#   心率列: uint16
+#   RR列:   uint16, 首个RR间期(毫秒), 可选
+#   块索引: 每 block_size 个样本一项 <int64 首个样本的Unix毫秒, int64 末个样本的Unix毫秒, uint64 首个样本序号>
+#   汇总:   可选, <uint32 级别数>, 每个级别 <uint32 桶宽毫秒, uint32 桶数> 后接
+#           桶序号(uint32), 最小值(uint16), 最大值(uint16), 总和(uint32), 样本数(uint32) 五列
+
+import os
+import mmap
+import shutil
+import struct
+import tempfile
+import datetime
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+__all__ = ["SessionFile", "SessionWriter", "write_session", "write_store", "write_columns", "read_csv", "csv_to_session", "session_to_csv", "SESSION_EXT"]
+
+SESSION_EXT = ".hrs"
+MAGIC = b"HRS1"
+VERSION = 1
+FLAG_RR = 0x01
+FLAG_ROLLUP = 0x02
+
+# 魔数, 版本, 标志, 起点(Unix毫秒), 样本数, 块大小, 块数, 块索引位置
+HEADER = struct.Struct("<4sHHqQIIQ")
+# 文件头的剩余部分: 汇总的位置
+HEADER_EXT = struct.Struct("<Q")
+HEADER_SIZE = 64
+INDEX_ENTRY = struct.Struct("<qqQ")
+ROLLUP_COUNT = struct.Struct("<I")
+ROLLUP_ENTRY = struct.Struct("<II")
+# 汇总各列的类型码和大小
+_ROLLUP_COLUMNS = (("I", "<u4", 4), ("H", "<u2", 2), ("H", "<u2", 2), ("I", "<u4", 4), ("I", "<u4", 4))
+
+CSV_HEADER = "时间,心率(BPM)"
+CSV_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# uint32 在部分平台上是 'I', 在部分平台上是 'L'
+_U32 = 'I' if array('I').itemsize == 4 else 'L'
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+def _layout(count: int, has_rr: bool) -> tuple[int, int, int, int]:
+    """各列的位置: (时间列, 心率列, RR列, 块索引)"""
+    ts = HEADER_SIZE
+    hr = _align(ts + 4 * count)
+    rr = _align(hr + 2 * count)
+    index = _align(rr + 2 * count) if has_rr else rr
+    return ts, hr, rr, index
+
+def _pad(f, offset: int):
+    pos = f.tell()
+    if pos < offset:
+        f.write(bytes(offset - pos))
+
+class SessionWriter:
+    """分块写入会话文件(先写临时文件, finish() 时替换)
+
+    时间列直接写入临时文件, 心率列和RR列先写入旁路的临时文件, 完成时拼接到时间列之后,
+    所以不需要事先知道样本数, 内存中只保留块索引. 可以作为上下文管理器使用, 没有完成时删除临时文件
+    """
+    def __init__(self, path: str, start_ms: int, has_rr: bool = False, block_size: int = 4096):
+        """
+        Args:
+            start_ms: 会话起点(Unix毫秒)
+            has_rr: 是否写入RR列
+            block_size: 块索引的间隔(样本数)
+        """
+        if block_size <= 0:
+            raise ValueError("块大小必须大于0")
+        self.path = path
+        self.start_ms = start_ms
+        self.has_rr = has_rr
+        self.block_size = block_size
+        self.count = 0
+        # 块索引: 逐块记录首末样本的时间, 按时间查找范围时只需要二分索引
+        self._index: list[list[int]] = []
+        self._last = -1
+        self._tmp = path + ".tmp"
+        directory = os.path.dirname(os.path.abspath(path))
+        self._f = open(self._tmp, "w+b")
+        self._hr = tempfile.TemporaryFile(dir=directory)
+        self._rr = tempfile.TemporaryFile(dir=directory) if has_rr else None
+        self._f.write(bytes(HEADER_SIZE))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.abort()
+
+    def write(self, offsets, heart_rates, rr=None):
+        """
+        追加一块样本
+
+        Args:
+            offsets / heart_rates / rr: 支持缓冲区协议的uint32/uint16数组, 时间为相对 start_ms 的毫秒数
+        """
+        n = len(offsets)
+        if len(heart_rates) != n or (rr is None) == self.has_rr or (rr is not None and len(rr) != n):
+            raise ValueError("各列的长度不一致")
+        start_ms, block_size, index, last = self.start_ms, self.block_size, self._index, self._last
+        for i, t in enumerate(offsets, self.count):
+            if t < last:
+                raise ValueError(f"第 {i} 个样本的时间早于前一个样本")
+            if i % block_size == 0:
+                if index:
+                    # 上一块的末样本
+                    index[-1][1] = start_ms + last
+                index.append([start_ms + t, start_ms + t, i])
+            last = t
+        if n:
+            index[-1][1] = start_ms + last
+        self._last = last
+        self._f.write(_little(offsets))
+        self._hr.write(_little(heart_rates))
+        if rr is not None:
+            self._rr.write(_little(rr))
+        self.count += n
+
+    def finish(self, rollups: Optional[list] = None) -> int:
+        """
+        写入块索引和汇总并替换目标文件
+
+        Args:
+            rollups: [(桶宽毫秒, (桶序号, 最小值, 最大值, 总和, 样本数)), ...], 见 RollupTier.columns()
+
+        Returns:
+            样本数
+        """
+        f, index = self._f, self._index
+        _, hr_pos, rr_pos, index_pos = _layout(self.count, self.has_rr)
+        _pad(f, hr_pos)
+        self._hr.seek(0)
+        shutil.copyfileobj(self._hr, f, 1 << 20)
+        if self._rr is not None:
+            _pad(f, rr_pos)
+            self._rr.seek(0)
+            shutil.copyfileobj(self._rr, f, 1 << 20)
+        _pad(f, index_pos)
+        f.write(b"".join(INDEX_ENTRY.pack(*entry) for entry in index))
+        rollup_pos = _align(index_pos + len(index) * INDEX_ENTRY.size) if rollups else 0
+        if rollups:
+            _pad(f, rollup_pos)
+            f.write(ROLLUP_COUNT.pack(len(rollups)))
+            for span_ms, columns in rollups:
+                _pad(f, _align(f.tell()))
+                f.write(ROLLUP_ENTRY.pack(span_ms, len(columns[0])))
+                for column in columns:
+                    _pad(f, _align(f.tell()))
+                    f.write(_little(column))
+        flags = (FLAG_RR if self.has_rr else 0) | (FLAG_ROLLUP if rollups else 0)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, flags, self.start_ms, self.count, self.block_size, len(index), index_pos))
+        f.write(HEADER_EXT.pack(rollup_pos))
+        f.flush()
+        os.fsync(f.fileno())
+        self._close()
+        os.replace(self._tmp, self.path)
+        self._tmp = None
+        return self.count
+
+    def abort(self):
+        """放弃写入, 删除临时文件"""
+        self._close()
+        if self._tmp is not None:
+            try:
+                os.remove(self._tmp)
+            except FileNotFoundError:
+                pass
+            self._tmp = None
+
+    def _close(self):
+        for f in (self._f, self._hr, self._rr):
+            if f is not None:
+                f.close()
+
+def write_columns(path: str, start_ms: int, offsets: list, heart_rates: list,
+                  rr: Optional[list] = None, block_size: int = 4096, rollups: Optional[list] = None) -> int:
+    """
+    写入会话文件(先写临时文件再替换)
+
+    Args:
+        start_ms: 会话起点(Unix毫秒)
+        offsets / heart_rates / rr: 各列的数据块(支持缓冲区协议的uint32/uint16数组), 按顺序拼接,
+            时间为相对 start_ms 的毫秒数
+        rollups: [(桶宽毫秒, (桶序号, 最小值, 最大值, 总和, 样本数)), ...], 见 RollupTier.columns()
+
+    Returns:
+        样本数
+    """
+    count = sum(len(c) for c in offsets)
+    if sum(len(c) for c in heart_rates) != count or (rr is not None and sum(len(c) for c in rr) != count):
+        raise ValueError("各列的长度不一致")
+    with SessionWriter(path, start_ms, rr is not None, block_size) as writer:
+        # 各列的分块方式可以不同, 按时间列的分块切分其它列
+        hr_all = _concat(heart_rates, 'H')
+        rr_all = None if rr is None else _concat(rr, 'H')
+        pos = 0
+        for chunk in offsets:
+            n = len(chunk)
+            writer.write(chunk, hr_all[pos:pos + n], None if rr_all is None else rr_all[pos:pos + n])
+            pos += n
+        return writer.finish(rollups)
+
+def _concat(chunks: list, code: str):
+    """只有一块时直接返回, 否则拼接为一个数组"""
+    if len(chunks) == 1:
+        return memoryview(chunks[0])
+    a = array(code)
+    for chunk in chunks:
+        a.frombytes(memoryview(chunk).cast('B'))
+    return a
+
+def _little(chunk):
+    """按小端字节序输出"""
+    if struct.pack("=H", 1) == b"\x01\x00":
+        return chunk
+    a = array(chunk.typecode if hasattr(chunk, "typecode") else chunk.format, chunk)
+    a.byteswap()
+    return a
+
+def write_session(path: str, timestamps_ms: Iterable[int], heart_rates: Iterable[int],
+                  rr_ms: Optional[Iterable[int]] = None, block_size: int = 4096) -> int:
+    """
+    写入会话文件
+
+    Args:
+        path: 文件路径
+        timestamps_ms: Unix毫秒时间戳, 不能递减
+        heart_rates: 心率
+        rr_ms: 首个RR间期(毫秒), 没有时为None
+        block_size: 块索引的间隔(样本数)
+
+    Returns:
+        样本数
+    """
+    timestamps_ms = list(timestamps_ms)
+    start_ms = timestamps_ms[0] if timestamps_ms else 0
+    offsets = array(_U32, (t - start_ms for t in timestamps_ms))
+    return write_columns(path, start_ms, [offsets], [array('H', heart_rates)],
+                  None if rr_ms is None else [array('H', rr_ms)], block_size)
+
+def write_store(path: str, store, block_size: int = 4096) -> int:
+    """
+    把 HeartRateStore 中的数据写入会话文件(直接写入存储的内存视图, 不复制)
+
+    Returns:
+        样本数
+    """
+    segments = store.segments()
+    rollups = [(tier.span_ms, tier.columns()) for tier in store.rollups.tiers] if store.rollups else None
+    return write_columns(path, store.start_ms, [ts for ts, _ in segments], [hr for _, hr in segments],
+                         None, block_size, rollups)
+
+class SessionFile:
+    """会话文件读取器
+
+    打开时内存映射整个文件, 各列以零拷贝视图返回(有NumPy时为ndarray, 否则为memoryview),
+    视图在 close() 之前有效. 可以作为上下文管理器使用
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            if size < HEADER_SIZE:
+                raise ValueError(f"不是心率会话文件: {path}")
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, self.flags, self.start_ms, self.count, self.block_size, blocks, index_pos = \
+                HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC:
+                raise ValueError(f"不是心率会话文件: {path}")
+            if version != VERSION:
+                raise ValueError(f"不支持的会话文件版本: {version}")
+            self._ts_pos, self._hr_pos, self._rr_pos, expected = _layout(self.count, self.has_rr)
+            if index_pos != expected or index_pos + blocks * INDEX_ENTRY.size > size:
+                raise ValueError(f"会话文件不完整: {path}")
+            # 块索引很小, 读入列表便于二分查找
+            entries = [INDEX_ENTRY.unpack_from(self._mm, index_pos + k * INDEX_ENTRY.size) for k in range(blocks)]
+            self._block_first = [e[0] for e in entries]
+            self._block_last = [e[1] for e in entries]
+            self._block_start = [e[2] for e in entries]
+            # 汇总级别: 桶宽 -> (桶数, 各列的位置)
+            self._rollups: dict[int, tuple[int, list[int]]] = {}
+            if self.flags & FLAG_ROLLUP:
+                pos, = HEADER_EXT.unpack_from(self._mm, HEADER.size)
+                tiers, = ROLLUP_COUNT.unpack_from(self._mm, pos)
+                pos += ROLLUP_COUNT.size
+                for _ in range(tiers):
+                    pos = _align(pos)
+                    span_ms, n = ROLLUP_ENTRY.unpack_from(self._mm, pos)
+                    pos += ROLLUP_ENTRY.size
+                    positions = []
+                    for _, _, itemsize in _ROLLUP_COLUMNS:
+                        pos = _align(pos)
+                        positions.append(pos)
+                        pos += n * itemsize
+                    if pos > size:
+                        raise ValueError(f"会话文件不完整: {path}")
+                    self._rollups[span_ms] = (n, positions)
+        except BaseException:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def has_rr(self) -> bool:
+        return bool(self.flags & FLAG_RR)
+
+    @property
+    def end_ms(self) -> Optional[int]:
+        """末个样本的时间(Unix毫秒)"""
+        return self._block_last[-1] if self._block_last else None
+
+    def _column(self, pos: int, code: str, dtype: str, start: int, stop: int):
+        size = array(code).itemsize
+        if np is not None:
+            return np.frombuffer(self._mm, dtype=dtype, count=stop - start, offset=pos + start * size)
+        return memoryview(self._mm)[pos + start * size:pos + stop * size].cast(code)
+
+    def offsets(self, start: int = 0, stop: Optional[int] = None):
+        """时间列: 相对 start_ms 的毫秒数(uint32)"""
+        stop = self.count if stop is None else stop
+        return self._column(self._ts_pos, _U32, "<u4", start, stop)
+
+    def heart_rates(self, start: int = 0, stop: Optional[int] = None):
+        """心率列(uint16)"""
+        stop = self.count if stop is None else stop
+        return self._column(self._hr_pos, 'H', "<u2", start, stop)
+
+    def rr(self, start: int = 0, stop: Optional[int] = None):
+        """RR列(uint16毫秒), 文件中没有时为None"""
+        if not self.has_rr:
+            return None
+        stop = self.count if stop is None else stop
+        return self._column(self._rr_pos, 'H', "<u2", start, stop)
+
+    def timestamps_ms(self, start: int = 0, stop: Optional[int] = None):
+        """Unix毫秒时间戳(需要计算, 有NumPy时为int64数组, 否则为列表)"""
+        offsets = self.offsets(start, stop)
+        if np is not None:
+            return offsets.astype(np.int64) + self.start_ms
+        return [self.start_ms + t for t in offsets]
+
+    def rollup_spans(self) -> list[int]:
+        """文件中保存的汇总级别(桶宽毫秒)"""
+        return sorted(self._rollups)
+
+    def pick_rollup(self, resolution_ms: int) -> Optional[int]:
+        """桶宽不超过 resolution_ms 的最粗的汇总级别, 没有时为None(应使用原始样本)"""
+        spans = [span for span in self._rollups if span <= resolution_ms]
+        return max(spans) if spans else None
+
+    def rollup(self, span_ms: int) -> tuple:
+        """
+        一个汇总级别的各列(零拷贝视图)
+
+        Returns:
+            (桶序号, 最小值, 最大值, 总和, 样本数), 桶起点为 start_ms + 桶序号 * span_ms
+        """
+        n, positions = self._rollups[span_ms]
+        return tuple(self._column(pos, _U32 if code == "I" else code, dtype, 0, n)
+                     for pos, (code, dtype, _) in zip(positions, _ROLLUP_COLUMNS))
+
+    def find_range(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> tuple[int, int]:
+        """
+        查找时间范围内的样本(先二分块索引, 再在块内二分)
+
+        Args:
+            start_ms: 起始时间(Unix毫秒, 包含), None表示从头开始
+            end_ms: 结束时间(Unix毫秒, 不包含), None表示到末尾
+
+        Returns:
+            (起始序号, 结束序号), 配合各列方法的 start/stop 参数使用
+        """
+        lo = 0 if start_ms is None else self._locate(start_ms)
+        hi = self.count if end_ms is None else self._locate(end_ms)
+        return lo, max(lo, hi)
+
+    def _locate(self, t_ms: int) -> int:
+        # 第一个末样本时间 >= t_ms 的块
+        k = bisect_left(self._block_last, t_ms)
+        if k >= len(self._block_start):
+            return self.count
+        first = self._block_start[k]
+        last = self._block_start[k + 1] if k + 1 < len(self._block_start) else self.count
+        block = self.offsets(first, last)
+        return first + bisect_left(block, t_ms - self.start_ms)
+
+    def samples(self, start: int = 0, stop: Optional[int] = None) -> Iterator[tuple[int, int]]:
+        """遍历(Unix毫秒, 心率)"""
+        t0 = self.start_ms
+        for t, hr in zip(self.offsets(start, stop), self.heart_rates(start, stop)):
+            yield t0 + int(t), int(hr)
+
+    def rows(self, start: int = 0, stop: Optional[int] = None, fmt: str = CSV_TIME_FORMAT) -> Iterator[tuple[str, int]]:
+        """遍历(格式化时间, 心率)"""
+        last_s = None
+        text = ""
+        for ms, hr in self.samples(start, stop):
+            s = ms // 1000
+            if s != last_s:
+                # 同一秒内的样本复用格式化结果
+                text = datetime.datetime.fromtimestamp(s).strftime(fmt)
+                last_s = s
+            yield text, hr
+
+    def close(self):
+        mm = getattr(self, "_mm", None)
+        if mm is not None:
+            try:
+                mm.close()
+            except BufferError:
+                # 还有视图在使用, 映射随最后一个视图释放
+                pass
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def read_csv(csv_path: str) -> tuple[list[int], array]:
+    """
+    读取界面保存的CSV文件(时间,心率(BPM))
+
+    Returns:
+        (Unix毫秒时间戳列表, 心率数组)
+    """
+    timestamps = []
+    heart_rates = array('H')
+    last_text = None
+    last_ms = 0
+    with open(csv_path, encoding="utf-8-sig", newline="") as f:
+        header = f.readline().strip()
+        if header != CSV_HEADER:
+            raise ValueError(f"不是心率数据文件: {csv_path}")
+        for line_no, line in enumerate(f, 2):
+            line = line.strip()
+            if not line:
+                continue
+            text, _, hr = line.rpartition(",")
+            if text != last_text:
+                # 同一秒内的样本时间相同, 只解析一次
+                try:
+                    last_ms = int(datetime.datetime.strptime(text, CSV_TIME_FORMAT).timestamp() * 1000)
+                except ValueError:
+                    raise ValueError(f"{csv_path} 第 {line_no} 行的时间格式错误: {text}") from None
+                last_text = text
+            timestamps.append(last_ms)
+            heart_rates.append(int(hr))
+    return timestamps, heart_rates
+
+def csv_to_session(csv_path: str, path: str, block_size: int = 4096) -> int:
+    """
+    把界面保存的CSV文件(时间,心率(BPM))转换为会话文件
+
+    Returns:
+        样本数
+    """
+    timestamps, heart_rates = read_csv(csv_path)
+    return write_session(path, timestamps, heart_rates, block_size=block_size)
+
+def session_to_csv(path: str, csv_path: str) -> int:
+    """
+    把会话文件转换为界面保存的CSV格式
+
+    Returns:
+        样本数
+    """
+    count = 0
+    with SessionFile(path) as session, open(csv_path, "w", encoding="utf-8-sig", newline="") as f:
+        f.write(CSV_HEADER + "\n")
+        for text, hr in session.rows():
+            f.write(f"{text},{hr}\n")
+            count += 1
+    return count
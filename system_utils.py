@@ -1,38 +1,25 @@
+import io
 import os
 import sys
 import time
 import json
+import queue
+import atexit
 import shutil
+import threading
 import logging
 import datetime
 import subprocess
-import urllib.error
-import urllib.request
+from collections import deque
 from typing import Any
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
 from version import vname, IS_FROZEN, VER2
+from metrics import profiler
 
 # 采用绝对路径避免开机自启时向c盘写入数据
 basefile = os.path.dirname(sys.executable) if IS_FROZEN else os.path.dirname(__file__)
-print(basefile)
 strlog = ""
-class AppisRunning(Exception):pass
-
-# --------进程检测--------
-def check_run():
-    cmd = 'tasklist'
-    if IS_FROZEN:
-        cmd += ' /fi "imagename eq HRMLink.exe" /nh'
-    else:
-        return False
-    result = subprocess.check_output(cmd, shell=True)
-    if 'HRMLink.exe' in result.decode('utf-8'):
-        dete = len(result.decode('utf-8').split('HRMLink.exe'))
-        if dete > 3:
-            print("程序已运行")
-            raise AppisRunning
-    return False
 
 # --------日志处理--------
 class CanNotSaveLogFile(Exception):
@@ -40,15 +27,229 @@ class CanNotSaveLogFile(Exception):
     level = 0
 
 class MyHandler(RotatingFileHandler):
+    # 为False时由 BatchQueueListener 在一批日志写完后统一刷新
+    autoflush = True
+
     def doRollover(self):
         try:
             super().doRollover()
             # 在每一个日志文件前添加环境信息
-            logger.info(f"运行程序 -{vname} " + " ".join(argv for argv in sys.argv if argv))
-            logger.info(f"Python版本: {sys.version}; 运行位置：{sys.executable}")
+            # (直接写入新文件, 而不是排到日志队列的末尾)
+            self._header(f"运行程序 -{vname} " + " ".join(argv for argv in sys.argv if argv))
+            self._header(f"Python版本: {sys.version}; 运行位置：{sys.executable}")
         except Exception as e:
             raise CanNotSaveLogFile("日志保存失败: %s" % e)
 
+    def _header(self, msg: str):
+        self.emit(logging.makeLogRecord({"name": "__main__", "levelno": logging.INFO, "levelname": "INFO", "msg": msg}))
+
+    def flush(self):
+        if self.autoflush:
+            super().flush()
+
+# 日志队列溢出时的处理策略
+LOG_DROP_OLDEST = "drop_oldest" # 丢弃队列中最旧的日志
+LOG_DROP_NEW = "drop_new"       # 丢弃新日志
+LOG_BLOCK = "block"             # 等待队列有空位
+LOG_QUEUE_SIZE = 10000
+LOG_OVERFLOW = LOG_DROP_OLDEST
+
+class BoundedQueueHandler(QueueHandler):
+    """把日志放入有界队列, 由后台线程写入文件"""
+    def __init__(self, queue_: queue.Queue, policy: str = LOG_DROP_OLDEST):
+        super().__init__(queue_)
+        self.policy = policy
+        self.dropped = 0
+
+    def enqueue(self, record):
+        if self.policy == LOG_BLOCK:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if self.policy == LOG_DROP_OLDEST:
+                try:
+                    self.queue.get_nowait()
+                    self.queue.put_nowait(record)
+                except (queue.Empty, queue.Full):
+                    pass
+
+class PendingLogHandler(logging.Handler):
+    """日志文件准备好之前暂存日志, 超出容量时丢弃最旧的记录"""
+    def __init__(self, capacity: int = LOG_QUEUE_SIZE):
+        super().__init__(logging.DEBUG)
+        self.buffer: deque[logging.LogRecord] = deque(maxlen=capacity)
+
+    def emit(self, record):
+        self.buffer.append(record)
+
+class BatchQueueListener(QueueListener):
+    """批量处理日志队列, 一批日志写完后只刷新一次文件"""
+    # 只用于唤醒后台线程的空记录
+    _wakeup = object()
+
+    def __init__(self, queue_, *handlers, qhandler: BoundedQueueHandler = None, batch: int = 256):
+        super().__init__(queue_, *handlers, respect_handler_level=True)
+        self.qhandler = qhandler
+        self.batch = batch
+        self._reported = 0
+        self._next_handlers = None
+
+    def enqueue_sentinel(self):
+        # 队列已满时也要保证能停止
+        self.queue.put(self._sentinel)
+
+    def set_handlers(self, *handlers):
+        """替换处理器, 在后台线程中生效; 暂存的日志会写入新的处理器"""
+        self._next_handlers = handlers
+        try:
+            self.queue.put_nowait(self._wakeup)
+        except queue.Full:
+            # 队列已满说明后台线程马上会处理
+            pass
+
+    def _swap_handlers(self):
+        handlers, self._next_handlers = self._next_handlers, None
+        if handlers is None:
+            return
+        old, self.handlers = self.handlers, handlers
+        for h in old:
+            if isinstance(h, PendingLogHandler):
+                for record in h.buffer:
+                    self.handle(record)
+                h.buffer.clear()
+            h.close()
+
+    def _monitor(self):
+        q = self.queue
+        while True:
+            batch = [q.get()]
+            while len(batch) < self.batch:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            self._swap_handlers()
+            stop = False
+            for h in self.handlers:
+                if hasattr(h, "autoflush"):
+                    h.autoflush = False
+            try:
+                self._report_dropped()
+                for record in batch:
+                    if record is self._sentinel:
+                        stop = True
+                        continue
+                    if record is self._wakeup:
+                        continue
+                    self.handle(record)
+            finally:
+                for h in self.handlers:
+                    if hasattr(h, "autoflush"):
+                        h.autoflush = True
+                    h.flush()
+                for _ in batch:
+                    q.task_done()
+            if stop:
+                return
+
+    def _report_dropped(self):
+        if self.qhandler is None or self.qhandler.dropped == self._reported:
+            return
+        n = self.qhandler.dropped - self._reported
+        self._reported = self.qhandler.dropped
+        self.handle(logging.makeLogRecord({"name": "__main__", "levelno": logging.WARNING, "levelname": "WARNING",
+                                           "msg": f"日志队列已满, 丢弃了 {n} 条日志"}))
+
+class LogfilePreparer:
+    """在后台准备日志文件
+
+    旧日志文件被占用而无法删除时由定时器稍后重试, 不会阻塞启动;
+    准备完成前的日志暂存在 PendingLogHandler 中
+    """
+    RETRY_DELAY = 5
+    RETRY_MAX = 20
+
+    def __init__(self, logfile: str, listener: BatchQueueListener, formatter: logging.Formatter):
+        self.logfile = logfile
+        self.listener = listener
+        self.formatter = formatter
+        self.done = False
+        self.start_ms = profiler.elapsed_ms()
+        self._timer: threading.Timer | None = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        threading.Thread(target=self._attempt, args=(0,), name="LogfilePreparer", daemon=True).start()
+
+    def _attempt(self, rt: int):
+        with self._lock:
+            if self.done:
+                return
+            try:
+                set_logfile()
+            except Exception as e:
+                print(f"错误: {e}")
+                if rt + 1 < self.RETRY_MAX:
+                    self._timer = threading.Timer(self.RETRY_DELAY, self._attempt, args=(rt + 1,))
+                    self._timer.daemon = True
+                    self._timer.start()
+                    return
+            self._finish()
+
+    def finish_now(self):
+        """停止重试, 直接使用现有的日志文件"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self.done:
+                self._finish()
+
+    def _finish(self):
+        self.done = True
+        error = None
+        try:
+            handler = MyHandler(
+                 self.logfile
+                ,maxBytes=5*1024*1024
+                ,backupCount=3
+                ,encoding='utf-8'
+            )
+            handler.setLevel(logging.DEBUG)
+            handler.setFormatter(self.formatter)
+            handler.doRollover()
+        except Exception as e:
+            # 无法使用日志文件时使用一般的日志记录器
+            error = e
+            handler = logging.StreamHandler()
+            handler.setLevel(logging.DEBUG)
+            handler.setFormatter(self.formatter)
+        self.listener.set_handlers(handler)
+
+        duration = profiler.elapsed_ms() - self.start_ms
+        profiler.add("日志文件准备(后台)", self.start_ms, duration)
+        if error is None:
+            logger.debug(f"日志文件已就绪, 耗时 {duration:.1f} ms")
+        else:
+            logger.warning(f"无法使用日志文件, 日志只输出到控制台: {error}")
+
+log_listener: BatchQueueListener | None = None
+log_preparer: LogfilePreparer | None = None
+
+def stop_logging():
+    """停止后台日志线程并写入剩余日志"""
+    global log_listener
+    if log_preparer is not None:
+        log_preparer.finish_now()
+    if log_listener is not None:
+        log_listener.stop()
+        log_listener = None
+
+atexit.register(stop_logging)
+
 def getlogger():
     global logger
     # 创建日志记录器
@@ -58,25 +259,20 @@ def getlogger():
     print(logfile)
 
     print(2.1)
-    set_logfile()
-    try:
-        handler = MyHandler(
-             logfile
-            ,maxBytes=5*1024*1024
-            ,backupCount=3
-            ,encoding='utf-8'
-        )
-    except Exception:
-        # 无法使用日志文件时使用一般的日志记录器
-        handler = logging.StreamHandler()
-    handler.setLevel(logging.DEBUG)
-    print(2.2)
-
     formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
-    if isinstance(handler, MyHandler):
-        handler.doRollover()
+
+    # 调用方只负责入队, 格式化后的写入和日志轮换都在后台线程中进行
+    # 日志文件在后台准备, 完成前的日志先暂存
+    global log_listener, log_preparer
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    qhandler = BoundedQueueHandler(log_queue, LOG_OVERFLOW)
+    qhandler.setLevel(logging.DEBUG)
+    logger.addHandler(qhandler)
+    log_listener = BatchQueueListener(log_queue, PendingLogHandler(), qhandler=qhandler)
+    log_listener.start()
+    log_preparer = LogfilePreparer(logfile, log_listener, formatter)
+    log_preparer.start()
+    print(2.2)
     return logger
 
 def upmod_logger():
@@ -95,24 +291,30 @@ def upmod_logger():
     logger.addHandler(handler)
     return logger
 
+def console_logger(level: int = logging.INFO):
+    """无界面模式的日志: 只输出到标准错误, 不占用日志文件"""
+    global logger
+    logger = logging.getLogger('__main__')
+    logger.setLevel(level)
+    # 重复调用时不重复输出
+    for h in [h for h in logger.handlers if getattr(h, "console_logger", False)]:
+        logger.removeHandler(h)
+    handler = logging.StreamHandler(sys.stderr)
+    handler.console_logger = True
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logger.addHandler(handler)
+    return logger
+
 def set_logfile():
-    """设置日志文件"""
-    rt = 0
-    while rt < 20:
-        try:
-            if not os.path.exists('log'):
-                os.mkdir('log')
-            if os.path.exists('log/loger1.log'):
-                print("正在删除旧日志文件1...")
-                os.remove('log/loger1.log')
-            if os.path.exists('log/loger2.log'):
-                print("正在删除旧日志文件2...")
-                os.remove('log/loger2.log')
-            return
-        except Exception as e:
-            print(f"错误: {e}")
-            time.sleep(5)
-            rt += 1
+    """创建日志目录并删除旧日志文件(文件被占用时抛出异常, 由 LogfilePreparer 重试)"""
+    logdir = os.path.join(basefile, 'log')
+    if not os.path.exists(logdir):
+        os.mkdir(logdir)
+    for name in ('loger1.log', 'loger2.log'):
+        path = os.path.join(logdir, name)
+        if os.path.exists(path):
+            print(f"正在删除旧日志文件 {name}...")
+            os.remove(path)
 
 # --------错误输出处理函数--------
 
@@ -176,9 +378,16 @@ from configparser import ConfigParser
 
 SETTINGTYPE = dict[str, Any]
 config_file = os.path.join(basefile, 'config.ini')
-print(config_file)
 
 config = ConfigParser()
+config_lock = threading.RLock()
+# 修改配置后延迟写入文件的时间(秒), 期间的修改合并为一次写入
+SAVE_DELAY = 1.0
+_save_lock = threading.Lock()
+_save_timer: threading.Timer | None = None
+_dirty = False
+# (section, option) -> {type_: 值}
+_gs_cache: dict[tuple[str, str], dict] = {}
 
 def init_config():
     global config
@@ -186,7 +395,9 @@ def init_config():
         if not os.path.exists(config_file):
             logger.warning("未找到配置文件 config.ini, 尝试创建默认配置文件")
             save_settings()
-        config.read(config_file, encoding='utf-8')
+        with config_lock:
+            config.read(config_file, encoding='utf-8')
+            _gs_cache.clear()
         check_sections()
     except Exception as e:
         logger.error(f"无法加载配置文件: {e}", exc_info=True)
@@ -194,48 +405,112 @@ def init_config():
 def check_sections():
     sectionlist = ['GUI', 'FloatingWindow', 'Device']
     s_ = False
-    for section in sectionlist:
+    with config_lock:
+        for section in sectionlist:
+            if not config.has_section(section):
+                config.add_section(section)
+                s_ = True
+    if s_: schedule_save()
+
+def _set(section, option: str, value):
+    with config_lock:
         if not config.has_section(section):
             config.add_section(section)
-            s_ = True
-    if s_: save_settings()
+        config.set(section, option, str(value))
+        _gs_cache.pop((section, option), None)
 
 @try_except("修改配置")
 def update_settings(**kwargs: SETTINGTYPE):
-    global config
     logger.info(f"{kwargs}")
     for section in kwargs.keys():
-        if not config.has_section(section):
-            config.add_section(section)
         data = kwargs[section]
         for key in data.keys():
-            config.set(section, key, str(data[key]))
-    save_settings()
+            _set(section, key, data[key])
+    schedule_save()
 
 def save_settings():
-    global config
-    with open(config_file, 'w', encoding='utf-8') as configfile:
-        config.write(configfile)
+    """立即把配置写入文件(先写临时文件再替换, 避免写入中断时损坏配置文件)"""
+    global _dirty
+    with _save_lock:
+        with config_lock:
+            buf = io.StringIO()
+            config.write(buf)
+            _dirty = False
+        tmpfile = config_file + ".tmp"
+        with open(tmpfile, 'w', encoding='utf-8') as configfile:
+            configfile.write(buf.getvalue())
+            configfile.flush()
+            os.fsync(configfile.fileno())
+        os.replace(tmpfile, config_file)
+
+def schedule_save():
+    """标记配置已修改, 在后台线程中延迟写入"""
+    global _dirty, _save_timer
+    with config_lock:
+        _dirty = True
+        if _save_timer is None:
+            _save_timer = threading.Timer(SAVE_DELAY, _delayed_save)
+            _save_timer.daemon = True
+            _save_timer.start()
+
+def _delayed_save():
+    global _save_timer
+    with config_lock:
+        _save_timer = None
+    try:
+        save_settings()
+    except Exception as e:
+        logger.error(f"保存配置文件失败: {e}", exc_info=True)
+
+def flush_settings():
+    """立即写入尚未保存的配置(退出程序时调用)"""
+    global _save_timer
+    with config_lock:
+        if _save_timer is not None:
+            _save_timer.cancel()
+            _save_timer = None
+        dirty = _dirty
+    if dirty:
+        save_settings()
+
+atexit.register(flush_settings)
 
 def gs(section, option, default, type_:type = None, debugn = ""):
-    if type_ == bool:
-        data = config.getboolean(section, option, fallback=default)
-    else :
-        data = config.get(section, option, fallback=default)
-    logger.debug(f' [{debugn}] -获取配置项 {option} 的值: {data}')
+    key = (section, option)
+    with config_lock:
+        cached = _gs_cache.get(key)
+        if cached is not None and type_ in cached:
+            return cached[type_]
+        present = config.has_option(section, option)
+        if type_ == bool:
+            data = config.getboolean(section, option, fallback=default)
+        else :
+            data = config.get(section, option, fallback=default)
+    if present:
+        # 只在首次读取时记录
+        logger.debug(f' [{debugn}] -获取配置项 {option} 的值: {data}')
     if data is None or data == "None":
         return default
-    if type_ is None:
-        return data
-    else:return type_(data)
+    if type_ is not None:
+        data = type_(data)
+    if present:
+        with config_lock:
+            _gs_cache.setdefault(key, {})[type_] = data
+    return data
 
 def ups(section, option: str, value, debugn = ""):
-    config.set(section, option, str(value))
+    _set(section, option, value)
     logger.debug(f'[{debugn}] 更新配置项 {option} 的值: {value}')
-    save_settings()
+    schedule_save()
 
 # --------下载前置--------
 
+def require_module(name: str):
+    """检查模块是否已安装(不导入模块), 未安装时抛出 ModuleNotFoundError"""
+    from importlib.util import find_spec
+    if find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+
 def pip_install_models(import_models_func: callable, pip_modelname: str):
     try:
         import_models_func()
@@ -267,7 +542,7 @@ def pip_install_package(package_name: str):
 
 # --------启动管理--------
 
-import winreg as reg
+# winreg 只在 Windows 上可用, 在用到时才导入
 APPNAME = "Zero_linofe-HRMlink"
 KEYPATH = r"Software\Microsoft\Windows\CurrentVersion\Run"
 
@@ -298,6 +573,7 @@ def add_to_startup():
     logger.info(f"正在添加到启动项 {value}")
     
     # 打开注册表中的启动项键
+    import winreg as reg
     key = reg.HKEY_CURRENT_USER
 
     try:
@@ -310,6 +586,7 @@ def add_to_startup():
         return "启动项"
 
 def remove_from_startup():
+    import winreg as reg
     key = reg.HKEY_CURRENT_USER
 
     try:
@@ -323,6 +600,7 @@ def remove_from_startup():
     
 def check_startup():
     # 检查启动项状态
+    import winreg as reg
     key = reg.HKEY_CURRENT_USER
     if IS_FROZEN:
         # 如果是打包后的exe
@@ -419,6 +697,7 @@ def start_update_program():
         sys.exit(1)
 
 def checkupdate() :
+    import urllib.error
     logger.info("检查更新中...")
     dtime = time.time() - gs("GUI","upstime",0,float,"检查更新")
     if dtime<200:
@@ -447,6 +726,7 @@ def checkupdate() :
                 return False, '失败', '', '', ''
 
 def check_with_raw(url: str):
+    import urllib.request
     with urllib.request.urlopen(url) as response: 
         # 读取json格式
         data = json.loads(response.read().decode('utf-8'))
@@ -454,6 +734,7 @@ def check_with_raw(url: str):
 
 def check_with_githubapi(url: str):
     import base64
+    import urllib.request
     with urllib.request.urlopen(url) as response:
         data = json.loads(response.read().decode('utf-8'))
         if data['content']:
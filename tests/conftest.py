@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+@pytest.fixture(scope="session")
+def logger():
+    """只输出到控制台的日志(导入依赖 system_utils.logger 的模块前需要)"""
+    from system_utils import console_logger
+    return console_logger()
@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+T0 = 1_700_000_000_000
+
+@pytest.fixture
+def catalog(logger):
+    import catalog
+    return catalog
+
+def _write_csv(path, seconds, start_hr=60):
+    import datetime
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        f.write("时间,心率(BPM)\n")
+        for i, s in enumerate(seconds):
+            text = datetime.datetime.fromtimestamp(T0 // 1000 + s).strftime("%Y-%m-%d %H:%M:%S")
+            f.write(f"{text},{start_hr + i}\n")
+
+def _sessions(db):
+    conn = sqlite3.connect(db)
+    try:
+        return {os.path.basename(row[0]): row[1:] for row in conn.execute("SELECT source, device, count FROM sessions")}
+    finally:
+        conn.close()
+
+def test_blocks_reject_time_going_backwards(catalog):
+    with pytest.raises(ValueError):
+        list(catalog._blocks([(T0, 60), (T0 + 1000, 61), (T0 + 500, 62)], block_size=2))
+
+def test_device_from_name(catalog):
+    assert catalog.device_from_name("rec_AABBCCDDEEFF.csv") == "AA:BB:CC:DD:EE:FF"
+    assert catalog.device_from_name("202401010800.csv") == ""
+
+def test_import_under_spawn_from_main(tmp_path):
+    """spawn 方式的子进程会重新执行主模块, 从 __main__.py 启动导入时不能进入界面程序"""
+    data = tmp_path / "csv"
+    data.mkdir()
+    _write_csv(data / "a.csv", range(100))
+    _write_csv(data / "rec_AABBCCDDEEFF.csv", range(50))
+    # 时间倒退的文件只影响它自己
+    _write_csv(data / "bad.csv", [0, 10, 5])
+    db = str(tmp_path / "sessions.db")
+    result = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "__main__.py"), "catalog", "--db", db, "import", str(data), "--workers", "2"],
+        cwd=str(tmp_path), capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert "bad.csv" in result.stderr
+    assert _sessions(db) == {"a.csv": ("", 100), "rec_AABBCCDDEEFF.csv": ("AA:BB:CC:DD:EE:FF", 50)}
+
+def test_import_with_explicit_device(catalog, tmp_path):
+    _write_csv(tmp_path / "a.csv", range(10))
+    db = str(tmp_path / "sessions.db")
+    assert catalog.import_csv([str(tmp_path)], db, workers=1, device="11:22:33:44:55:66") == 1
+    # 已导入的文件被跳过
+    assert catalog.import_csv([str(tmp_path)], db, workers=1) == 0
+    assert _sessions(db) == {"a.csv": ("11:22:33:44:55:66", 10)}
+
+def test_catalog_sink(catalog, tmp_path):
+    db = str(tmp_path / "sessions.db")
+    sink = catalog.CatalogSink(db, "AA:BB:CC:DD:EE:FF")
+    for i in range(20):
+        sink.write(T0 + i * 1000, 70 + i)
+    sink.close()
+    with catalog.SessionCatalog(db) as c:
+        (session,) = c.find_sessions()
+        assert session["device"] == "AA:BB:CC:DD:EE:FF"
+        assert (session["count"], session["hr_min"], session["hr_max"]) == (20, 70, 89)
+
+def test_add_session_replace(catalog, tmp_path):
+    with catalog.SessionCatalog(str(tmp_path / "sessions.db")) as c:
+        c.add_session([(T0, 60)], source="x.csv")
+        with pytest.raises(sqlite3.IntegrityError):
+            c.add_session([(T0, 61)], source="x.csv")
+        c.add_session([(T0, 62), (T0 + 1000, 63)], source="x.csv", replace=True)
+        (session,) = c.find_sessions()
+        assert session["count"] == 2
+
+def test_saved_data_is_catalogued(catalog, tmp_path):
+    from hrdata import HeartRateStore
+    from UI.HRExport import ExportThread
+    store = HeartRateStore(100)
+    for i in range(30):
+        store.append(60 + i, store._t0_mono + i * 1_000_000_000)
+    db = str(tmp_path / "sessions.db")
+    path = str(tmp_path / "saved.csv")
+    for _ in range(2):
+        # 覆盖同一文件时替换之前的会话
+        thread = ExportThread(store, path, device="AA:BB:CC:DD:EE:FF", catalog=db)
+        thread.run()
+        assert thread.count == 30
+    assert _sessions(db) == {"saved.csv": ("AA:BB:CC:DD:EE:FF", 30)}
+
+@pytest.mark.parametrize("name", ["saved.hrs", "saved.csv", "rollup.csv"])
+def test_catalogue_matches_file_while_recording(catalog, tmp_path, name):
+    from hrdata import HeartRateStore
+    from sessionfile import SessionFile
+    from UI.HRExport import ExportThread
+    store = HeartRateStore(200)
+    t0 = store._t0_mono
+    added = 0
+
+    def record(n):
+        nonlocal added
+        for _ in range(n):
+            store.append(60 + added % 50, t0 + added * 1_000_000_000)
+            added += 1
+
+    record(500)
+    exported = list(store.samples())
+    db = str(tmp_path / "sessions.db")
+    path = str(tmp_path / name)
+    thread = ExportThread(store, path, resolution_ms=60_000 if name == "rollup.csv" else None,
+                          device="AA:BB:CC:DD:EE:FF", catalog=db)
+    # 记录线程在导出期间继续写入, 环形缓冲覆盖最旧的样本
+    thread._progress = lambda done, total: record(120)
+    thread.run()
+    with catalog.SessionCatalog(db) as c:
+        (session,) = c.find_sessions()
+        samples = list(c.samples(session["id"]))
+    # 只包含导出开始时已有的样本(被覆盖的样本不在文件中, 也不在目录中)
+    assert samples and set(samples) <= set(exported) and samples == sorted(samples)
+    if name == "saved.hrs":
+        with SessionFile(path) as session_file:
+            assert list(session_file.samples()) == samples
+    elif name == "saved.csv":
+        assert thread.count == len(samples)
+    else:
+        assert samples == exported
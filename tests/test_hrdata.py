@@ -0,0 +1,135 @@
+import math
+import random
+import statistics
+
+import pytest
+
+from hrdata import HeartRateStore, HeartRateRollups, HeartRateStats, WindowStats, SPILL_DROP, SPILL_GROW
+from hrexport import export_store, ROLLUP_CSV_HEADER
+
+def _fill(store, n, interval_ms=1000):
+    t0 = store._t0_mono
+    for i in range(n):
+        store.append(60 + i % 40, t0 + i * interval_ms * 1_000_000)
+
+def test_dropped_samples_are_not_rolled_up():
+    store = HeartRateStore(100, SPILL_DROP, rollup_spans=(10_000,))
+    _fill(store, 300)
+    assert len(store) == 100 and store.dropped == 200
+    (tier,) = store.rollups.tiers
+    assert sum(row[4] for row in tier.rows()) == 100
+
+def test_tiers_cover_the_same_time_as_raw_samples():
+    store = HeartRateStore(600)
+    # 1 Hz 时 1 秒级别每桶只有一个样本, 不保留
+    assert [tier.span_ms for tier in store.rollups.tiers] == [10_000, 60_000, 600_000]
+    assert [tier.capacity for tier in store.rollups.tiers] == [61, 11, 2]
+    _fill(store, 6000)
+    oldest_ms = store.segments()[0][0][0]
+    for tier in store.rollups.tiers:
+        first_bucket_ms = next(tier.rows())[0]
+        # 最旧的桶不早于最旧的原始样本所在的桶
+        assert first_bucket_ms >= oldest_ms - tier.span_ms
+
+def test_rollup_sizing_without_interval():
+    rollups = HeartRateRollups((1000, 10_000), capacity=50)
+    assert [(t.span_ms, t.capacity) for t in rollups.tiers] == [(1000, 50), (10_000, 50)]
+    assert [t.capacity for t in HeartRateStore(50, SPILL_GROW).rollups.tiers] == [0, 0, 0]
+
+def test_export_at_resolution(tmp_path):
+    store = HeartRateStore(1000)
+    _fill(store, 120)
+    path = tmp_path / "out.csv"
+    assert export_store(store, str(path), resolution_ms=60_000) == 2
+    lines = path.read_text(encoding="utf-8-sig").splitlines()
+    assert lines[0] == ROLLUP_CSV_HEADER
+    assert [line.rsplit(",", 1)[1] for line in lines[1:]] == ["60", "60"]
+
+def _offsets(store):
+    return [t - store.start_ms for t, _ in store.samples()]
+
+def test_spill_overwrite_keeps_newest():
+    store = HeartRateStore(5, chunk=2)
+    _fill(store, 12)
+    assert len(store) == 5 and store.dropped == 7
+    assert store.nbytes == 5 * 6
+    assert _offsets(store) == [i * 1000 for i in range(7, 12)]
+    assert [hr for _, hr in store.samples()] == [60 + i for i in range(7, 12)]
+    assert store.last() == (11_000, 71)
+
+def test_spill_drop_keeps_oldest():
+    store = HeartRateStore(5, SPILL_DROP, chunk=2)
+    t0 = store._t0_mono
+    accepted = [store.append(60 + i, t0 + i * 1_000_000_000) for i in range(8)]
+    assert accepted == [True] * 5 + [False] * 3
+    assert len(store) == 5 and store.dropped == 3
+    assert _offsets(store) == [i * 1000 for i in range(5)]
+    assert store.last() == (4000, 64)
+
+def test_spill_grow_doubles_capacity():
+    store = HeartRateStore(4, SPILL_GROW, chunk=1)
+    _fill(store, 10)
+    assert len(store) == 10 and store.dropped == 0
+    assert store.capacity == 16
+    assert _offsets(store) == [i * 1000 for i in range(10)]
+    assert store.last() == (9000, 69)
+
+def test_reserve_keeps_old_views_valid():
+    store = HeartRateStore(100, chunk=2)
+    t0 = store._t0_mono
+    for i in range(2):
+        store.append(60 + i, t0 + i * 1_000_000_000)
+    ((ts, hr),) = store.segments()
+    # 扩容时换用新数组, 之前的视图不变
+    for i in range(2, 20):
+        store.append(60 + i, t0 + i * 1_000_000_000)
+    assert list(ts) == [0, 1000] and list(hr) == [60, 61]
+    assert len(store) == 20 and store.nbytes == 32 * 6
+    assert _offsets(store) == [i * 1000 for i in range(20)]
+
+def _brute_window(samples, span, now):
+    values = [hr for t, hr in samples if now - span < t <= now]
+    if not values:
+        return None
+    n = len(values)
+    mean = sum(values) / n
+    return min(values), max(values), mean, math.sqrt(sum((v - mean) ** 2 for v in values) / n), n
+
+def test_window_stats_match_brute_force():
+    rng = random.Random(1)
+    window = WindowStats(10_000)
+    samples = []
+    t = 0
+    for _ in range(2000):
+        # 间隔不均匀, 偶尔有长时间的断连, 同一时间也可能有多个样本
+        t += rng.choice((0, 250, 1000, 1000, 3000, 15_000))
+        hr = rng.randint(40, 200)
+        samples.append((t, hr))
+        window.push(t, hr)
+        got = window.result()
+        lo, hi, mean, std, n = _brute_window(samples, 10_000, t)
+        assert (got['min'], got['max'], got['count']) == (lo, hi, n)
+        assert got['avg'] == round(mean, 1)
+        assert got['std'] == pytest.approx(std, abs=0.01)
+    # 之后没有新样本时按查询时间过期
+    assert window.result(t + 5_000)['count'] == _brute_window(samples, 10_000, t + 5_000)[4]
+    assert window.result(t + 10_000) is None
+
+def test_session_stats_match_brute_force():
+    rng = random.Random(2)
+    stats = HeartRateStats({'10s': 10_000}, max_gap_ms=5000)
+    samples = []
+    t = 0
+    for _ in range(1000):
+        t += rng.choice((500, 1000, 2000, 20_000))
+        hr = rng.randint(40, 200)
+        samples.append((t, hr))
+        stats.push(t, hr)
+    values = [hr for _, hr in samples]
+    result = stats.result()
+    assert (result['min'], result['max'], result['count']) == (min(values), max(values), len(values))
+    assert result['avg'] == round(statistics.fmean(values), 1)
+    assert result['std'] == pytest.approx(statistics.stdev(values), abs=0.01)
+    weighted = [(hr, min(t2 - t1, 5000)) for (t1, hr), (t2, _) in zip(samples, samples[1:])]
+    assert result['tw_avg'] == pytest.approx(sum(h * d for h, d in weighted) / sum(d for _, d in weighted), abs=0.05)
+    assert result['windows']['10s']['count'] == _brute_window(samples, 10_000, t)[4]
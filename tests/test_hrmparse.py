@@ -0,0 +1,61 @@
+import random
+import struct
+
+import pytest
+
+import hrmparse
+from hrmparse import parse_batch, parse_measurement, _parse_batch_py
+
+np = pytest.importorskip("numpy")
+from hrmparse import _parse_batch_numpy
+
+def _packet(rng: random.Random) -> bytes:
+    flags = rng.randrange(32)
+    data = bytearray([flags])
+    if flags & hrmparse.FLAG_HR_UINT16:
+        data += struct.pack("<H", rng.randrange(300))
+    else:
+        data.append(rng.randrange(256))
+    if flags & hrmparse.FLAG_ENERGY:
+        data += struct.pack("<H", rng.randrange(65536))
+    if flags & hrmparse.FLAG_RR:
+        for _ in range(rng.randrange(4)):
+            data += struct.pack("<H", rng.randrange(65536))
+    return bytes(data)
+
+def _columns(batch):
+    return [list(map(int, getattr(batch, name))) for name in batch.__slots__]
+
+def test_parity_random():
+    rng = random.Random(0)
+    packets = [_packet(rng) for _ in range(500)]
+    buffer = b"".join(packets)
+    lengths = [len(p) for p in packets]
+    assert _columns(_parse_batch_numpy(buffer, lengths)) == _columns(_parse_batch_py(buffer, lengths))
+
+def test_matches_single_parse():
+    rng = random.Random(1)
+    packets = [_packet(rng) for _ in range(50)]
+    batch = parse_batch(b"".join(packets), [len(p) for p in packets])
+    rr = list(map(int, batch.rr))
+    pos = 0
+    for i, p in enumerate(packets):
+        m = parse_measurement(p)
+        assert int(batch.heart_rate[i]) == m.heart_rate
+        n = int(batch.rr_count[i])
+        assert tuple(rr[pos:pos + n]) == m.rr
+        pos += n
+
+@pytest.mark.parametrize("buffer, lengths", [
+    (bytes([0, 70]), [2, 0]),                   # 末尾的空数据包
+    (bytes([0, 70, 0]), [2, 1]),                # 末尾只有标志位
+    (bytes([0]), [1]),
+    (bytes([hrmparse.FLAG_HR_UINT16, 70]), [2]), # uint16心率缺少高字节
+    (bytes([hrmparse.FLAG_ENERGY, 70, 1]), [3]), # 能量消耗字段不完整
+    (bytes([0, 70]), [2, 2]),                   # 长度之和超过缓冲区
+])
+def test_short_packets_raise_value_error(buffer, lengths):
+    with pytest.raises(ValueError):
+        _parse_batch_numpy(buffer, lengths)
+    with pytest.raises(ValueError):
+        _parse_batch_py(buffer, lengths)
@@ -0,0 +1,117 @@
+import os
+import stat
+import sys
+import threading
+
+import pytest
+
+from instance import SingleInstance, CMD_SHOW
+
+@pytest.fixture
+def instances(tmp_path):
+    created = []
+
+    def make():
+        inst = SingleInstance("test", str(tmp_path))
+        created.append(inst)
+        return inst
+
+    yield make
+    for inst in created:
+        inst.release()
+
+def test_acquire_and_second_instance(instances):
+    first, second = instances(), instances()
+    assert first.acquire()
+    # 重复调用不会再次取锁
+    assert first.acquire()
+    assert not second.acquire()
+    assert not second.primary
+
+def test_release_allows_reacquire(instances):
+    first, second = instances(), instances()
+    assert first.acquire()
+    first.release()
+    assert not first.primary
+    assert second.acquire()
+
+def test_send_reaches_primary(instances):
+    first, second = instances(), instances()
+    assert first.acquire()
+    received = []
+    done = threading.Event()
+    first.serve(lambda command: (received.append(command), done.set()))
+    assert not second.acquire()
+    assert second.send(f"{CMD_SHOW} extra")
+    assert done.wait(2)
+    assert received == [f"{CMD_SHOW} extra"]
+
+def test_send_with_wrong_token_is_rejected(instances):
+    first, second = instances(), instances()
+    assert first.acquire()
+    received = []
+    first.serve(received.append)
+    with open(first.addr_path, encoding="utf-8") as f:
+        port, _ = f.read().split()
+    with open(first.addr_path, "w", encoding="utf-8") as f:
+        f.write(f"{port} {'0' * 32}")
+    assert not second.send(CMD_SHOW, timeout=0.2)
+    assert received == []
+
+def test_send_without_primary_fails(instances):
+    assert not instances().send(CMD_SHOW, timeout=0.1)
+
+def test_stale_files_are_ignored(instances, tmp_path):
+    first = instances()
+    # 之前的实例崩溃后留下的锁文件和地址文件
+    with open(first.lock_path, "w") as f:
+        f.write("stale")
+    with open(first.addr_path, "w", encoding="utf-8") as f:
+        f.write("1 deadbeef")
+    with open(first.addr_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write("1 deadbeef")
+    assert first.acquire()
+    received = []
+    done = threading.Event()
+    first.serve(lambda command: (received.append(command), done.set()))
+    assert instances().send(CMD_SHOW)
+    assert done.wait(2)
+    assert received == [CMD_SHOW]
+
+def test_release_removes_addr_file(instances):
+    first = instances()
+    assert first.acquire()
+    first.serve(lambda command: None)
+    assert os.path.exists(first.addr_path)
+    first.release()
+    assert not os.path.exists(first.addr_path)
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Windows 不使用 POSIX 权限位")
+def test_files_are_private(instances):
+    first = instances()
+    assert first.acquire()
+    first.serve(lambda command: None)
+    for path in (first.lock_path, first.addr_path):
+        assert stat.S_IMODE(os.stat(path).st_mode) & 0o077 == 0
+
+def test_handler_errors_are_logged(instances, logger, caplog):
+    first, second = instances(), instances()
+    assert first.acquire()
+    received = []
+    done = threading.Event()
+
+    def handler(command):
+        if command == "bad":
+            raise RuntimeError("boom")
+        received.append(command)
+        done.set()
+
+    first.serve(handler)
+    with caplog.at_level("ERROR"):
+        assert second.send("bad")
+        # 出错后继续接收命令
+        assert second.send(CMD_SHOW)
+        assert done.wait(2)
+    assert received == [CMD_SHOW]
+    (record,) = [r for r in caplog.records if "bad" in r.getMessage()]
+    assert record.exc_info[0] is RuntimeError
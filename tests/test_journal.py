@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+@pytest.fixture
+def journal(logger):
+    import journal
+    return journal
+
+def _write(journal, directory, samples, clean=True, segment_records=65536):
+    writer = journal.SessionJournal(str(directory), segment_records=segment_records, keep_days=0)
+    writer.start()
+    for sample in samples:
+        writer.append(*sample)
+    writer.close(clean)
+    return writer
+
+SAMPLES = [
+     (1_700_000_000_000, 70, [850, 860, 870])
+    ,(1_700_000_001_000, 71, [])
+    ,(1_700_000_002_000, 72, [840])
+]
+
+def test_every_rr_is_journaled(journal, tmp_path):
+    writer = _write(journal, tmp_path, SAMPLES)
+    assert writer.records == 5
+    samples = list(journal.read_samples(s.path for s in journal.list_segments(str(tmp_path))))
+    assert samples == [(t, hr, tuple(rr)) for t, hr, rr in SAMPLES]
+
+def test_sample_split_across_segments(journal, tmp_path):
+    _write(journal, tmp_path, SAMPLES * 3, segment_records=2)
+    segments = journal.list_segments(str(tmp_path))
+    assert len(segments) > 1
+    samples = list(journal.read_samples(s.path for s in segments))
+    assert samples == [(t, hr, tuple(rr)) for t, hr, rr in SAMPLES * 3]
+
+def test_only_unclosed_sessions_are_recovered(journal, tmp_path):
+    _write(journal, tmp_path, SAMPLES, clean=True)
+    assert journal.recover(str(tmp_path)) == []
+    crashed = _write(journal, tmp_path / "crashed", SAMPLES, clean=False)
+    recovered = journal.recover(str(tmp_path / "crashed"))
+    assert [s.session for s in recovered] == [crashed.session]
+    assert recovered[0].records == 5
+
+def test_recovered_callback(journal, tmp_path):
+    _write(journal, tmp_path, SAMPLES, clean=False)
+    found = []
+    writer = journal.SessionJournal(str(tmp_path), keep_days=0)
+    writer.session = "later"
+    writer.recovered_callback = found.append
+    writer.start()
+    writer.close()
+    assert len(found) == 1 and found[0][0].records == 5
+
+def test_export_and_discard(journal, tmp_path):
+    from sessionfile import read_csv
+    _write(journal, tmp_path, SAMPLES, clean=False)
+    segments = journal.recover(str(tmp_path))
+    path = str(tmp_path / "out.csv")
+    assert journal.export_csv(segments, path) == len(SAMPLES)
+    timestamps, heart_rates = read_csv(path)
+    assert timestamps == [t for t, _, _ in SAMPLES]
+    assert list(heart_rates) == [hr for _, hr, _ in SAMPLES]
+    journal.discard(segments)
+    assert not any(os.path.exists(s.path) for s in segments)
@@ -0,0 +1,24 @@
+import time
+
+import pytest
+
+from hrdata import SPILL_DROP
+
+@pytest.fixture
+def ble(logger):
+    import Blegetheartbeat
+    return Blegetheartbeat
+
+def test_dropped_samples_keep_their_own_time(ble, monkeypatch):
+    monitor = ble.MultiDeviceMonitor(capacity=2, spill=SPILL_DROP)
+    received = []
+    monitor.subscribe(lambda address, epoch_ms, hr: received.append((epoch_ms, hr)))
+    session = monitor.session("AA:BB:CC:DD:EE:FF")
+    t0 = session.heart_rate_data._t0_mono
+    for i in range(4):
+        monkeypatch.setattr(time, "monotonic_ns", lambda i=i: t0 + i * 1_000_000_000)
+        session._notification_handler("", bytearray([0, 70 + i]))
+    start = session.heart_rate_data.start_ms
+    # 存储只保留了前两个样本, 订阅者仍然收到每个样本自己的时间
+    assert len(session.heart_rate_data) == 2
+    assert received == [(start + i * 1000, 70 + i) for i in range(4)]
@@ -0,0 +1,102 @@
+import os
+from array import array
+
+import pytest
+
+from hrdata import HeartRateStore
+from hrexport import export_store, store_chunks
+from sessionfile import SessionFile, SessionWriter, write_columns
+
+def _store(n, capacity=None):
+    store = HeartRateStore(capacity or n, chunk=64)
+    t0 = store._t0_mono
+    for i in range(n):
+        store.append(60 + i % 50, t0 + i * 250_000_000)
+    return store
+
+def test_chunked_export_matches_store(tmp_path):
+    store = _store(10_000, capacity=8_000)
+    path = str(tmp_path / "out.hrs")
+    assert export_store(store, path, chunk=777) == len(store)
+    with SessionFile(path) as session:
+        assert list(session.samples()) == list(store.samples())
+        assert session.rollup_spans() == [tier.span_ms for tier in store.rollups.tiers]
+    assert not os.path.exists(path + ".tmp")
+
+def test_cancelled_export_leaves_no_file(tmp_path):
+    store = _store(5_000)
+    path = str(tmp_path / "out.hrs")
+    assert export_store(store, path, chunk=1000, cancelled=lambda: True) is None
+    assert os.listdir(tmp_path) == []
+
+def test_writer_rejects_decreasing_time_across_chunks(tmp_path):
+    path = str(tmp_path / "out.hrs")
+    with pytest.raises(ValueError):
+        with SessionWriter(path, 0) as writer:
+            writer.write(array('I', [0, 10]), array('H', [60, 61]))
+            writer.write(array('I', [5]), array('H', [62]))
+    assert os.listdir(tmp_path) == []
+
+def test_write_columns_with_different_chunking(tmp_path):
+    path = str(tmp_path / "out.hrs")
+    offsets = [array('I', range(0, 3000, 10)), array('I', range(3000, 9000, 10))]
+    heart_rates = [array('H', [70] * 500), array('H', [80] * 400)]
+    rr = [array('H', range(900))]
+    assert write_columns(path, 1_000, offsets, heart_rates, rr, block_size=64) == 900
+    with SessionFile(path) as session:
+        assert list(session.timestamps_ms()) == list(range(1_000, 10_000, 10))
+        assert list(session.heart_rates()) == [70] * 500 + [80] * 400
+        assert list(session.rr()) == list(range(900))
+        assert session.find_range(1_000 + 3000, 1_000 + 3100) == (300, 310)
+
+class _RacingView:
+    """在复制数据前让记录线程写入新样本, 模拟检查和复制之间的环形覆盖"""
+    def __init__(self, view, on_copy):
+        self.view = view
+        self.on_copy = on_copy
+
+    def __len__(self):
+        return len(self.view)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            self.on_copy()
+        return self.view[key]
+
+class _RacingStore(HeartRateStore):
+    def __init__(self, *args, burst, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.burst = burst
+        self.next = 0
+
+    def add(self, n):
+        for _ in range(n):
+            self.append(60 + self.next % 50, self._t0_mono + self.next * 250_000_000)
+            self.next += 1
+
+    def segments(self):
+        burst = lambda: self.add(self.burst)
+        return [(_RacingView(ts, burst), hr) for ts, hr in super().segments()]
+
+@pytest.mark.parametrize("burst", [1, 37, 150, 1000])
+def test_chunks_skip_samples_overwritten_during_copy(burst):
+    store = _RacingStore(1000, chunk=1000, burst=burst)
+    store.add(2500)
+    before = {t: h for t, h in store.samples()}
+    offsets = []
+    for ts, hr in store_chunks(store, chunk=100):
+        offsets.extend(ts)
+        # 导出的样本都是截取视图时已有的样本, 没有被新数据替换
+        assert all(before.get(store.start_ms + t) == h for t, h in zip(ts, hr))
+    assert offsets == sorted(offsets)
+    assert len(set(offsets)) == len(offsets)
+
+def test_hrs_export_while_ring_overwrites(tmp_path):
+    store = _RacingStore(1000, chunk=1000, burst=60)
+    store.add(1500)
+    path = str(tmp_path / "out.hrs")
+    count = export_store(store, path, chunk=100)
+    with SessionFile(path) as session:
+        assert len(session) == count
+        offsets = list(session.offsets())
+        assert offsets == sorted(offsets)
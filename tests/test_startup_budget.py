@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+from metrics import StartupProfiler, FIRST_PAINT, BUDGET_EXIT_CODE
+
+def test_budget_exceeded_returns_exit_code_3():
+    profiler = StartupProfiler()
+    time.sleep(0.02)
+    profiler.mark(FIRST_PAINT)
+    assert BUDGET_EXIT_CODE == 3
+    assert profiler.check_budget(1) == BUDGET_EXIT_CODE
+    assert profiler.check_budget(60_000) == 0
+
+def test_budget_without_mark_uses_current_time():
+    profiler = StartupProfiler()
+    time.sleep(0.02)
+    assert profiler.check_budget(1) == BUDGET_EXIT_CODE
+
+def test_budget_uses_mark_time_not_check_time():
+    profiler = StartupProfiler()
+    profiler.mark(FIRST_PAINT)
+    time.sleep(0.05)
+    assert profiler.check_budget(40) == 0
+
+def test_first_paint_marked_from_paint_event(logger):
+    QtWidgets = pytest.importorskip("PyQt5.QtWidgets")
+    from UI.basicwidgets import FirstPaintMarker
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    window = QtWidgets.QWidget()
+    other = QtWidgets.QWidget()
+    profiler = StartupProfiler()
+    marker = FirstPaintMarker((window,), lambda: profiler.mark(FIRST_PAINT))
+
+    # 其它窗口的绘制不计入
+    other.show()
+    app.processEvents()
+    assert not marker.done
+
+    window.show()
+    deadline = time.monotonic() + 5
+    while not marker.done and time.monotonic() < deadline:
+        app.processEvents()
+    assert marker.done
+    marks = [r for r in profiler.records if r[0] == FIRST_PAINT]
+    assert len(marks) == 1
+
+    window.update()
+    app.processEvents()
+    assert len([r for r in profiler.records if r[0] == FIRST_PAINT]) == 1
+    window.close()
+    other.close()